@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from django.conf import settings
+
+from core.health import Check, check_mongodb, check_rabbitmq, check_redis
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель зависимости (состояние в памяти процесса).
+
+    closed: вызовы идут, ошибки и вызовы дольше BREAKER_SLOW_CALL_SECONDS считаются отказами;
+    после BREAKER_FAILURE_THRESHOLD отказов подряд выключатель размыкается.
+    open: вызовы сразу отклоняются. Через BREAKER_RESET_TIMEOUT секунд один поток выполняет
+    пробу - ту же проверку, что HealthCheckView; успех замыкает выключатель, отказ продлевает open.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, name: str, check: Check):
+        self.name = name
+        self.check = check
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        """Секунды до следующей пробы"""
+        remaining = self.opened_at + settings.BREAKER_RESET_TIMEOUT - time.monotonic()
+        return max(int(remaining + 0.999), 1)
+
+    def allow(self) -> bool:
+        """Можно ли обращаться к зависимости; в open по истечении таймаута выполняет пробу"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self._probing or time.monotonic() - self.opened_at < settings.BREAKER_RESET_TIMEOUT:
+                return False
+            self._probing = True
+
+        result = self.check()
+        with self._lock:
+            self._probing = False
+            if result.get("status") == "ok":
+                logger.info(f"Circuit breaker {self.name} closed")
+                self.state = self.CLOSED
+                self.failures = 0
+                return True
+            self.opened_at = time.monotonic()
+            logger.warning(f"Circuit breaker {self.name} probe failed: {result.get('status')}")
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self, reason: str) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.CLOSED and self.failures >= settings.BREAKER_FAILURE_THRESHOLD:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.error(f"Circuit breaker {self.name} opened after {self.failures} failures: {reason}")
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """Учитывает исход и длительность обращения к зависимости; исключения пробрасываются"""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            self.record_failure(repr(exc))
+            raise
+        elapsed = time.monotonic() - started
+        if elapsed > settings.BREAKER_SLOW_CALL_SECONDS:
+            self.record_failure(f"slow call {elapsed:.2f}s")
+        else:
+            self.record_success()
+
+    def info(self) -> Dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+class IntakeBackpressure:
+    """
+    Защита приема заявок: ограничение одновременно обрабатываемых запросов (INTAKE_MAX_IN_FLIGHT
+    на процесс) и выключатели Mongo, Redis и брокера.
+    """
+    MONGODB = "mongodb"
+    REDIS = "redis"
+    BROKER = "rabbitmq"
+
+    _slots: Optional[threading.BoundedSemaphore] = None
+    _breakers: Dict[str, CircuitBreaker] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def breaker(cls, name: str) -> CircuitBreaker:
+        if name not in cls._breakers:
+            with cls._lock:
+                checks = {cls.MONGODB: check_mongodb, cls.REDIS: check_redis, cls.BROKER: check_rabbitmq}
+                cls._breakers.setdefault(name, CircuitBreaker(name, checks[name]))
+        return cls._breakers[name]
+
+    @classmethod
+    @contextmanager
+    def slot(cls) -> Iterator[bool]:
+        """Занимает место в лимите одновременных запросов; False - лимит исчерпан"""
+        if cls._slots is None:
+            with cls._lock:
+                if cls._slots is None:
+                    cls._slots = threading.BoundedSemaphore(settings.INTAKE_MAX_IN_FLIGHT)
+        acquired = cls._slots.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cls._slots.release()
+
+    @classmethod
+    def states(cls) -> Dict[str, Dict]:
+        return {name: breaker.info() for name, breaker in cls._breakers.items()}
@@ -0,0 +1,214 @@
+import datetime
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+
+import bson
+from bson import json_util
+from django.conf import settings
+from django_redis import get_redis_connection
+from pymongo.errors import OperationFailure
+
+from core.events import ChangeEvents
+from core.models import Request, User
+from core.response_cache import ResponseCache, KEY_DATA_TYPES, USERS
+
+logger = logging.getLogger(__name__)
+
+NOT_REPLICA_SET_ERRORS = (40573, 20)
+
+
+class PollCursor:
+    """
+    Позиция опроса коллекции по updated_at. Выборка идет по $gte: документ, записанный в ту же
+    миллисекунду, что и последний виденный, но уже после опроса, по $gt терялся бы. Документы,
+    уже отданные на этой границе, отсеиваются по паре (_id, updated_at).
+    """
+
+    def __init__(self, collection):
+        latest = collection.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        self.seen_at = latest["updated_at"] if latest and latest.get("updated_at") else datetime.datetime.min
+        self.seen_ids: Set[Any] = {doc["_id"] for doc in collection.find({"updated_at": self.seen_at}, {"_id": 1})}
+
+    def query(self) -> Dict[str, Any]:
+        return {"updated_at": {"$gte": self.seen_at}}
+
+    def advance(self, doc: Dict[str, Any]) -> bool:
+        """Сдвигает позицию на документ; False - документ уже отдан прошлым опросом"""
+        if doc["updated_at"] != self.seen_at:
+            self.seen_at = doc["updated_at"]
+            self.seen_ids = set()
+        elif doc["_id"] in self.seen_ids:
+            return False
+        self.seen_ids.add(doc["_id"])
+        return True
+
+
+class ChangeListener:
+    """
+    Слушатель изменений коллекций user, request и key_data_types.
+    На replica set читает change stream (resume token хранится в Redis), на одиночном mongod
+    опрашивает коллекции раз в CHANGE_POLL_INTERVAL секунд.
+
+    Общие для всех процессов реакции выполняются здесь же, один раз: изменение исполнителя
+    публикуется дельтой снимка (повтор уже опубликованной API дельты отбрасывается), версии кэша
+    ответов увеличиваются, смена статуса заявки в обход API (её не учли счетчики в Redis) или удаление
+    заявки ускоряет пересчет дневных счетчиков и счетчиков заявок в работе по Mongo.
+    Затем событие уходит в ChangeEvents для локальных кэшей.
+    """
+    COLLECTIONS = ("user", "request", "key_data_types")
+    RESUME_TOKEN_KEY = "change_listener:resume_token"
+    # Сколько последних статусов заявок помнит опрос, чтобы отличать смену статуса от других правок
+    MAX_KNOWN_STATUSES = 100000
+    # Удаления исполнителей опрос ищет сравнением id раз в столько опросов
+    USER_DELETE_CHECK_EVERY = 12
+
+    def __init__(self):
+        self.db = User._get_db()
+        self._snapshots: Dict[str, Dict[Any, str]] = {}
+        self._requests_cursor: Optional[PollCursor] = None
+        self._request_statuses: "OrderedDict[Any, str]" = OrderedDict()
+        self._users_cursor: Optional[PollCursor] = None
+        self._user_ids: Optional[Set[Any]] = None
+        self._user_polls = 0
+
+    def handle(self, collection: str, op: str, doc_id: Any, fields: Optional[Iterable[str]] = None) -> None:
+        from dispatcher.capacity import ExecutorCapacity
+        from dispatcher.locks import RequestCounter
+        from dispatcher.snapshot import ExecutorSnapshot
+
+        fields = list(fields) if fields is not None else None
+        if collection == "user":
+            user = User.objects(id=doc_id).first() if op != "delete" else None
+            ExecutorSnapshot.publish_delta(user or User(id=doc_id), deleted=user is None)
+            ResponseCache.bump(USERS)
+        elif collection == "key_data_types":
+            ResponseCache.bump(KEY_DATA_TYPES)
+        elif collection == "request" and self._untracked_status_change(op, doc_id, fields):
+            RequestCounter.schedule_resync()
+            ExecutorCapacity.schedule_resync()
+        ChangeEvents.publish(collection, op, str(doc_id), fields)
+
+    @staticmethod
+    def _untracked_status_change(op: str, doc_id: Any, fields: Optional[Iterable[str]]) -> bool:
+        """
+        Меняет ли событие то, что не учтено счетчиками в Redis. Новая заявка ещё не назначена,
+        назначение (commit_assignment) статус не трогает, а смену статуса через API отмечает
+        ExecutorCapacity.mark_tracked.
+        """
+        from dispatcher.capacity import ExecutorCapacity
+
+        if op == "insert":
+            return False
+        if op == "delete":
+            return True
+        if fields is not None and "status" not in fields:
+            return False
+        return not ExecutorCapacity.consume_tracked(str(doc_id))
+
+    def supports_change_streams(self) -> bool:
+        hello = self.db.client.admin.command("hello")
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    def run(self, force_polling: bool = False) -> None:
+        if not force_polling and self.supports_change_streams():
+            try:
+                self.run_change_stream()
+                return
+            except OperationFailure as exc:
+                if exc.code not in NOT_REPLICA_SET_ERRORS:
+                    raise
+        logger.info("Change streams are unavailable, polling collections")
+        self.run_polling()
+
+    def run_change_stream(self) -> None:
+        client = get_redis_connection("default")
+        token = client.get(self.RESUME_TOKEN_KEY)
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.COLLECTIONS)}}}]
+        with self.db.watch(pipeline, resume_after=json_util.loads(token) if token else None) as stream:
+            logger.info("Listening to change stream")
+            for change in stream:
+                op = change["operationType"]
+                if op in ("insert", "update", "replace", "delete"):
+                    description = change.get("updateDescription") or {}
+                    fields = None
+                    if op == "update":
+                        fields = list(description.get("updatedFields", {})) + description.get("removedFields", [])
+                    self.handle(change["ns"]["coll"], op, change["documentKey"]["_id"], fields)
+                client.set(self.RESUME_TOKEN_KEY, json_util.dumps(change["_id"]))
+
+    @staticmethod
+    def _fingerprint(doc: Dict[str, Any]) -> str:
+        return hashlib.md5(bson.encode(doc)).hexdigest()
+
+    def poll_small(self, collection: str) -> None:
+        """Сравнивает отпечатки документов небольшой коллекции с прошлым опросом"""
+        current = {doc["_id"]: self._fingerprint(doc) for doc in self.db[collection].find()}
+        previous = self._snapshots.get(collection)
+        self._snapshots[collection] = current
+        if previous is None:
+            return
+        for doc_id, fingerprint in current.items():
+            if doc_id not in previous:
+                self.handle(collection, "insert", doc_id)
+            elif previous[doc_id] != fingerprint:
+                self.handle(collection, "update", doc_id)
+        for doc_id in previous.keys() - current.keys():
+            self.handle(collection, "delete", doc_id)
+
+    def poll_users(self) -> None:
+        """
+        Исполнители, измененные с прошлого опроса (по updated_at, который ставит User.save);
+        удаления ищутся сравнением множества id раз в USER_DELETE_CHECK_EVERY опросов
+        """
+        collection = User._get_collection()
+        if self._users_cursor is None:
+            self._users_cursor = PollCursor(collection)
+            self._user_ids = {doc["_id"] for doc in collection.find({}, {"_id": 1})}
+            return
+        for doc in collection.find(self._users_cursor.query(), {"updated_at": 1}).sort("updated_at", 1):
+            if not self._users_cursor.advance(doc):
+                continue
+            op = "update" if doc["_id"] in self._user_ids else "insert"
+            self._user_ids.add(doc["_id"])
+            self.handle("user", op, doc["_id"])
+
+        self._user_polls += 1
+        if self._user_polls % self.USER_DELETE_CHECK_EVERY == 0:
+            current = {doc["_id"] for doc in collection.find({}, {"_id": 1})}
+            for doc_id in self._user_ids - current:
+                self.handle("user", "delete", doc_id)
+            self._user_ids = current
+
+    def poll_requests(self) -> None:
+        """
+        Заявки, измененные с прошлого опроса (удаления опросом не видны). Смена статуса
+        определяется по последним виденным статусам; новая заявка считается созданной в processed.
+        """
+        collection = Request._get_collection()
+        if self._requests_cursor is None:
+            self._requests_cursor = PollCursor(collection)
+            return
+        for doc in collection.find(
+            self._requests_cursor.query(), {"updated_at": 1, "status": 1}
+        ).sort("updated_at", 1):
+            if not self._requests_cursor.advance(doc):
+                continue
+            previous = self._request_statuses.pop(doc["_id"], "processed")
+            self._request_statuses[doc["_id"]] = doc.get("status")
+            if len(self._request_statuses) > self.MAX_KNOWN_STATUSES:
+                self._request_statuses.popitem(last=False)
+            fields = ["status", "updated_at"] if doc.get("status") != previous else ["updated_at"]
+            self.handle("request", "update", doc["_id"], fields)
+
+    def run_polling(self) -> None:
+        while True:
+            try:
+                self.poll_users()
+                self.poll_small("key_data_types")
+                self.poll_requests()
+            except Exception:
+                logger.exception("Change polling failed")
+            time.sleep(settings.CHANGE_POLL_INTERVAL)
@@ -0,0 +1,66 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class ChangeEvents:
+    """
+    Шина событий об изменениях коллекций Mongo поверх Redis pub/sub.
+    Событие - компактный JSON: коллекция, операция, id документа и измененные поля
+    ({"c": "user", "op": "update", "id": "...", "f": ["params"]}; "f": null - поля неизвестны).
+    Публикует слушатель listen_changes; web- и Celery-процессы подписываются фоновым потоком
+    и сбрасывают свои in-process кэши.
+    """
+    CHANNEL = "mongo_changes"
+    RECONNECT_DELAY = 5
+
+    _handlers: Dict[str, List[Handler]] = {}
+    _lock = threading.Lock()
+    _subscriber: Optional[threading.Thread] = None
+
+    @classmethod
+    def subscribe(cls, collection: str, handler: Handler) -> None:
+        """Регистрирует обработчик событий коллекции в текущем процессе"""
+        cls._handlers.setdefault(collection, []).append(handler)
+
+    @classmethod
+    def publish(cls, collection: str, op: str, doc_id: str, fields: Optional[Iterable[str]] = None) -> None:
+        event = {"c": collection, "op": op, "id": doc_id, "f": sorted(fields) if fields is not None else None}
+        get_redis_connection("default").publish(cls.CHANNEL, json.dumps(event, separators=(",", ":")))
+
+    @classmethod
+    def dispatch(cls, event: Dict[str, Any]) -> None:
+        for handler in cls._handlers.get(event.get("c"), []):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception(f"Change handler {handler.__qualname__} failed")
+
+    @classmethod
+    def _listen(cls) -> None:
+        while True:
+            try:
+                pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(cls.CHANNEL)
+                for message in pubsub.listen():
+                    cls.dispatch(json.loads(message["data"]))
+            except Exception:
+                logger.exception("Change events subscription lost, reconnecting")
+                time.sleep(cls.RECONNECT_DELAY)
+
+    @classmethod
+    def start_subscriber(cls) -> None:
+        """Запускает фоновый поток подписки (один на процесс)"""
+        with cls._lock:
+            if cls._subscriber is not None and cls._subscriber.is_alive():
+                return
+            cls._subscriber = threading.Thread(target=cls._listen, name="change-events", daemon=True)
+            cls._subscriber.start()
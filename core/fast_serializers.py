@@ -0,0 +1,78 @@
+import datetime
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+def _identity(value):
+    return value
+
+
+FAST_CONVERTERS = {
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.BooleanField: bool,
+    serializers.DictField: _identity,
+    serializers.JSONField: _identity,
+}
+
+
+def _utc_isoformat(value):
+    """Как DateTimeField.to_representation при TIME_ZONE=UTC: наивное время из Mongo считается UTC"""
+    if value.tzinfo is None:
+        return value.isoformat() + "Z"
+    value = value.astimezone(datetime.UTC)
+    return value.replace(tzinfo=None).isoformat() + "Z"
+
+
+def _converter(field) -> Callable[[Any], Any]:
+    converter = FAST_CONVERTERS.get(type(field))
+    if converter is not None:
+        return converter
+    if (
+        type(field) is serializers.DateTimeField
+        and getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601
+        and settings.USE_TZ and settings.TIME_ZONE == "UTC"
+        and not hasattr(field, "timezone")
+    ):
+        return _utc_isoformat
+    return field.to_representation
+
+
+class CompiledSerializer:
+    """
+    Предкомпилированный путь вывода для read-only списков.
+    Из полей DRF-сериализатора один раз строится список (имя, конвертер), после чего dict из Mongo
+    отображается в выходной dict без get_attribute/SkipField на каждое поле каждой строки.
+    Вывод совпадает с serializer_class(rows, many=True).data для dict-строк.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._fields: List[Tuple[str, str, bool, Callable[[Any], Any]]] = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            converter = _converter(field)
+            skip_missing = field.default is serializers.empty and not field.allow_null and not field.required
+            self._fields.append((name, field.source, skip_missing, converter))
+
+    def one(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        result = {}
+        for name, source, skip_missing, converter in self._fields:
+            if source not in row:
+                if skip_missing:
+                    continue
+                result[name] = None
+                continue
+            value = row[source]
+            result[name] = None if value is None else converter(value)
+        return result
+
+    def many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        one = self.one
+        return [one(row) for row in rows]
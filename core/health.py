@@ -0,0 +1,90 @@
+"""
+Проверки зависимостей: используются HealthCheckView и пробами автоматических выключателей интейка.
+Каждая проверка возвращает {"status": "ok", ...} либо {"status": <описание ошибки>}.
+"""
+import time
+from typing import Callable, Dict
+
+import redis
+from django.conf import settings
+from pymongo import MongoClient
+
+Check = Callable[[], Dict]
+
+
+def _latency(start: float) -> float:
+    return round((time.time() - start) * 1000, 2)
+
+
+def check_mongodb() -> Dict:
+    try:
+        start = time.time()
+        mongo_uri = (
+            f"mongodb://{settings.MONGO_USER}:{settings.MONGO_PASS}@"
+            f"{settings.MONGO_HOST}:{settings.MONGO_PORT}/"
+            f"{settings.MONGO_DB}"
+        )
+        client = MongoClient(
+            mongo_uri,
+            serverSelectionTimeoutMS=2000,
+            authSource="admin",
+        )
+        client.admin.command("ping")
+        latency = _latency(start)
+        client.close()
+        return {"status": "ok", "latency_ms": latency}
+    except Exception as e:
+        return {"status": f"error: {e}"}
+
+
+def check_redis() -> Dict:
+    try:
+        start = time.time()
+        redis_url = settings.CACHES["default"]["LOCATION"]
+        client = redis.StrictRedis.from_url(redis_url)
+        client.ping()
+        return {"status": "ok", "latency_ms": _latency(start)}
+    except Exception as e:
+        return {"status": f"error: {e}"}
+
+
+def check_rabbitmq() -> Dict:
+    from executor_balancer.celery import app
+
+    try:
+        start = time.time()
+        with app.connection_for_read() as conn:
+            conn.ensure_connection(max_retries=1)
+        return {"status": "ok", "latency_ms": _latency(start)}
+    except Exception as e:
+        return {"status": f"error: {e}"}
+
+
+def check_celery() -> Dict:
+    from executor_balancer.celery import app
+
+    try:
+        start = time.time()
+        if app.control.ping():
+            return {"status": "ok", "latency_ms": _latency(start)}
+        return {"status": "no response"}
+    except Exception as e:
+        return {"status": f"error: {e}"}
+
+
+def check_local_dispatch() -> Dict:
+    from dispatcher.local_queue import LocalDispatchQueue
+
+    local = LocalDispatchQueue.stats()
+    return {"status": "ok" if local["running"] else "stopped", "queued": local["queued"]}
+
+
+def dependency_checks() -> Dict[str, Check]:
+    """Проверки зависимостей текущего режима распределения"""
+    checks = {"mongodb": check_mongodb, "redis": check_redis}
+    if settings.DISPATCH_MODE == "local":
+        checks["local_dispatch"] = check_local_dispatch
+    else:
+        checks["rabbitmq"] = check_rabbitmq
+        checks["celery"] = check_celery
+    return checks
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from core.models import Request, User, to_attribute_pattern
+from core.readers import find_raw
+
+
+class Command(BaseCommand):
+    help = "Заполняет params_kv (attribute pattern) у существующих пользователей и заявок"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Размер пачки bulk_write")
+
+    def handle(self, *args, **options):
+        for document in (User, Request):
+            updated = 0
+            batch = []
+            for raw in find_raw(document, None, ["params"]):
+                batch.append(
+                    UpdateOne({"_id": raw["_id"]}, {"$set": {"params_kv": to_attribute_pattern(raw.get("params"))}})
+                )
+                if len(batch) >= options["batch_size"]:
+                    updated += document._get_collection().bulk_write(batch, ordered=False).modified_count
+                    batch = []
+            if batch:
+                updated += document._get_collection().bulk_write(batch, ordered=False).modified_count
+            self.stdout.write(f"{document._get_collection_name()}: обновлено {updated}")
@@ -0,0 +1,67 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core import readers
+from core.models import Request, User
+from core.serializers import RequestSerializer, UserSerializer
+from dispatcher.models import DispatchLogs
+from dispatcher.snapshot import ExecutorSnapshot
+
+
+class Command(BaseCommand):
+    help = "Сравнивает CPU и память чтения через mongoengine Document и через raw PyMongo слой"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Число прогонов каждого варианта")
+
+    def handle(self, *args, **options):
+        cases = [
+            (
+                "executors",
+                lambda: [(str(u.id), u.max_daily_requests, u.params)
+                         for u in User.objects.only('id', 'username', 'max_daily_requests', 'params')],
+                lambda: ExecutorSnapshot.load_from_db(),
+            ),
+            (
+                "users list",
+                lambda: UserSerializer(User.objects.all(), many=True).data,
+                lambda: UserSerializer(readers.list_users(), many=True).data,
+            ),
+            (
+                "requests list",
+                lambda: RequestSerializer(Request.objects.all(), many=True).data,
+                lambda: RequestSerializer(readers.list_requests(), many=True).data,
+            ),
+            (
+                "export logs",
+                lambda: [(log.request_id, log.user_id, log.request_created_at)
+                         for log in DispatchLogs.objects.order_by("request_created_at")],
+                lambda: list(readers.iter_dispatch_log_rows()),
+            ),
+        ]
+
+        self.stdout.write(f"{'case':>15} | {'variant':>9} | {'rows':>8} | {'cpu ms':>10} | {'peak KiB':>10}")
+        for name, document_path, raw_path in cases:
+            for variant, func in (("document", document_path), ("raw", raw_path)):
+                rows, cpu_ms, peak_kib = self._measure(func, options["repeat"])
+                self.stdout.write(
+                    f"{name:>15} | {variant:>9} | {rows:>8} | {cpu_ms:>10.2f} | {peak_kib:>10.1f}"
+                )
+
+    @staticmethod
+    def _measure(func, repeat):
+        """Минимальное процессорное время за repeat прогонов и пиковая память одного прогона"""
+        best = float("inf")
+        rows = 0
+        for _ in range(repeat):
+            started = time.process_time()
+            rows = len(func())
+            best = min(best, time.process_time() - started)
+
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return rows, best * 1000, peak / 1024
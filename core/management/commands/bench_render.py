@@ -0,0 +1,77 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.fast_serializers import CompiledSerializer
+from core.renderers import ORJSONRenderer
+from core.serializers import RequestSerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    help = "Сравнивает сериализацию и рендеринг списков: DRF + JSONRenderer против CompiledSerializer + orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Число синтетических строк")
+        parser.add_argument("--repeat", type=int, default=5, help="Число прогонов каждого варианта")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        now = datetime.datetime.now(datetime.UTC)
+        users = [
+            {
+                "id": f"{i:024x}",
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "first_name": "Иван",
+                "last_name": "Иванов",
+                "params": {"region": f"r{i % 10}", "level": i % 5, "active": bool(i % 2)},
+                "max_daily_requests": 100 if i % 3 else None,
+            }
+            for i in range(rows)
+        ]
+        requests = [
+            {
+                "id": f"{i:024x}",
+                "user": f"user{i % 50}" if i % 4 else None,
+                "parent": None,
+                "params": {"region": {"value": f"r{i % 10}", "mandatory": True}},
+                "text": "Текст заявки",
+                "status": "await",
+                "priority": i % 10,
+                "deadline": now if i % 2 else None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(rows)
+        ]
+
+        renderers = [("json", JSONRenderer()), ("orjson", ORJSONRenderer())]
+
+        self.stdout.write(f"{'case':>9} | {'serializer':>10} | {'renderer':>8} | {'serialize ms':>12} | {'render ms':>10}")
+        for name, serializer_class, data in (("users", UserSerializer, users),
+                                             ("requests", RequestSerializer, requests)):
+            compiled = CompiledSerializer(serializer_class)
+            variants = (
+                ("drf", lambda: serializer_class(data, many=True).data),
+                ("compiled", lambda: compiled.many(data)),
+            )
+            for variant, serialize in variants:
+                serialize_ms, output = self._measure(serialize, options["repeat"])
+                for renderer_name, renderer in renderers:
+                    render_ms, _ = self._measure(lambda: renderer.render(output), options["repeat"])
+                    self.stdout.write(
+                        f"{name:>9} | {variant:>10} | {renderer_name:>8} | {serialize_ms:>12.2f} | {render_ms:>10.2f}"
+                    )
+
+    @staticmethod
+    def _measure(func, repeat):
+        """Минимальное процессорное время за repeat прогонов и результат последнего"""
+        best = float("inf")
+        result = None
+        for _ in range(repeat):
+            started = time.process_time()
+            result = func()
+            best = min(best, time.process_time() - started)
+        return best * 1000, result
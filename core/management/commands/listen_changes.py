@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.change_listener import ChangeListener
+
+
+class Command(BaseCommand):
+    help = (
+        "Слушает изменения коллекций user, request и key_data_types (change stream или опрос "
+        "на одиночном mongod) и публикует события инвалидации в Redis"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", action="store_true", help="Принудительно использовать опрос коллекций")
+
+    def handle(self, *args, **options):
+        ChangeListener().run(force_polling=options["poll"])
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from mongoengine import NotUniqueError
+
+from core.models import Request
+from core.serializers import RequestSerializer
+from core.spool import IntakeSpool
+from dispatcher.tasks import enqueue_dispatch
+
+
+class Command(BaseCommand):
+    help = "Проигрывает заявки из спула интейка (INTAKE_SPOOL_PATH) в MongoDB и ставит их на распределение"
+
+    def handle(self, *args, **options):
+        if not IntakeSpool.enabled():
+            raise CommandError("INTAKE_SPOOL_PATH не задан")
+
+        path = IntakeSpool.claim()
+        if path is None:
+            self.stdout.write("Спул пуст")
+            return
+
+        created = duplicates = invalid = 0
+        with open(f"{path}.failed", "a", encoding="utf-8") as failed:
+            for entry in IntakeSpool.read(path):
+                key = entry["idempotency_key"]
+                serializer = RequestSerializer(data=entry["data"])
+                if not serializer.is_valid():
+                    failed.write(json.dumps({**entry, "errors": serializer.errors}, ensure_ascii=False) + "\n")
+                    invalid += 1
+                    continue
+                if Request.objects(idempotency_key=key).first() is not None:
+                    duplicates += 1
+                    continue
+                try:
+                    obj = serializer.save(idempotency_key=key)
+                except NotUniqueError:
+                    duplicates += 1
+                    continue
+                enqueue_dispatch(str(obj.id), obj.params or {}, obj.priority)
+                created += 1
+
+        IntakeSpool.finish(path)
+        self.stdout.write(f"Создано {created}, уже существовало {duplicates}, с ошибками {invalid} ({path}.failed)")
@@ -1,16 +1,22 @@
 import datetime
 
+from django.conf import settings
 from mongoengine import (
     Document,
     StringField,
     DictField,
     IntField,
+    ListField,
     ReferenceField,
     DateTimeField,
     CASCADE,
 )
 
 
+def utc_now():
+    return datetime.datetime.now(datetime.UTC)
+
+
 class KeyDataTypes(Document):
     """
     Типы данных полей
@@ -37,29 +43,57 @@ class User(Document):
     last_name = StringField(required=False, verbose_name="Фамилия")
 
     params = DictField(default=dict, verbose_name="Параметры")
+    params_kv = ListField(DictField(), verbose_name="Параметры (attribute pattern)")
     max_daily_requests = IntField(default=None, null=True, verbose_name="Максимальное количество заявок")
+    max_hourly_requests = IntField(default=None, null=True, verbose_name="Максимальное количество заявок в час")
+    max_in_flight = IntField(default=None, null=True, verbose_name="Максимальное количество заявок в работе")
+    # [{"days": [0..6], "start": "09:00", "end": "18:00"}], время в CAPACITY_TIMEZONE; пусто - всегда на смене
+    shifts = ListField(DictField(), verbose_name="Смены")
+
+    updated_at = DateTimeField(default=utc_now, verbose_name="Обновлено")
 
     meta = {
         "collection": "user",
         "ordering": ["username"],
+        "indexes": [("params_kv.k", "params_kv.v"), "updated_at"],
         "verbose_name": "Пользователь",
         "verbose_name_plural": "Пользователи",
     }
 
+    def save(self, *args, **kwargs):
+        """Обновляем время модификации и поддерживаем params_kv в режиме PARAMS_ATTRIBUTE_PATTERN."""
+        self.updated_at = datetime.datetime.now(datetime.UTC)
+        if settings.PARAMS_ATTRIBUTE_PATTERN:
+            self.params_kv = to_attribute_pattern(self.params)
+        return super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
 
 
+def to_attribute_pattern(params: dict) -> list:
+    """
+    params -> [{"k": ключ, "v": значение}] для мультиключевого индекса.
+    Для условий заявки ({"value": ..., "operator": ...}) берется value.
+    """
+    return [
+        {"k": key, "v": value.get("value") if isinstance(value, dict) else value}
+        for key, value in (params or {}).items()
+    ]
+
+
 class Request(Document):
     """
     Модель заявки.
     """
     STATUS_CHOICES = ("processed", "await", "accept", "reject")
+    MAX_PRIORITY = 9
 
     parent = ReferenceField("self", reverse_delete_rule=CASCADE, null=True, verbose_name="Родитель")
     user = ReferenceField(User, null=True, verbose_name="Пользователь")
 
     params = DictField(default=dict, verbose_name="Параметры")
+    params_kv = ListField(DictField(), verbose_name="Параметры (attribute pattern)")
     text = StringField(null=True, verbose_name="Описание")
 
     status = StringField(
@@ -68,20 +102,43 @@ class Request(Document):
         required=True,
         verbose_name="Статус",
     )
+    priority = IntField(default=0, min_value=0, max_value=MAX_PRIORITY, verbose_name="Приоритет")
+    deadline = DateTimeField(null=True, verbose_name="Дедлайн")
+    escalated_at = DateTimeField(null=True, verbose_name="Эскалировано")
+    redispatched_at = DateTimeField(null=True, verbose_name="Переназначено")
+    excluded_users = ListField(StringField(), verbose_name="Исключенные исполнители")
+    idempotency_key = StringField(verbose_name="Ключ идемпотентности")
 
-    created_at = DateTimeField(default=datetime.datetime.now(datetime.UTC), verbose_name="Создано")
-    updated_at = DateTimeField(default=datetime.datetime.now(datetime.UTC), verbose_name="Обновлено")
+    created_at = DateTimeField(default=utc_now, verbose_name="Создано")
+    updated_at = DateTimeField(default=utc_now, verbose_name="Обновлено")
 
     meta = {
         "collection": "request",
         "ordering": ["-created_at"],
+        "indexes": [
+            ("user", "status", "deadline", "-priority"),
+            ("user", "status", "-priority", "created_at"),
+            ("status", "redispatched_at", "updated_at"),
+            "updated_at",
+            ("params_kv.k", "params_kv.v"),
+            {"fields": ["idempotency_key"], "unique": True, "sparse": True},
+        ],
         "verbose_name": "Заявка",
         "verbose_name_plural": "Заявки",
     }
 
-    def save(self, *args, **kwargs):
-        """Обновляем время модификации при сохранении."""
+    def prepare(self) -> "Request":
+        """
+        Производные поля перед записью: время модификации и params_kv (PARAMS_ATTRIBUTE_PATTERN).
+        Вызывается из save() и вручную перед пакетной вставкой, которая save() не вызывает.
+        """
         self.updated_at = datetime.datetime.now(datetime.UTC)
+        if settings.PARAMS_ATTRIBUTE_PATTERN:
+            self.params_kv = to_attribute_pattern(self.params)
+        return self
+
+    def save(self, *args, **kwargs):
+        self.prepare()
         return super().save(*args, **kwargs)
 
     def __str__(self):
@@ -0,0 +1,142 @@
+"""
+Слой чтения в обход гидратации mongoengine-документов.
+Запросы идут с проекцией через PyMongo, результат - обычные dict/tuple с типизированными декодерами.
+"""
+import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from core.models import Request, User
+
+USER_FIELDS = (
+    "username", "email", "first_name", "last_name", "params",
+    "max_daily_requests", "max_hourly_requests", "max_in_flight", "shifts",
+)
+REQUEST_FIELDS = (
+    "user", "parent", "params", "text", "status", "priority", "deadline", "created_at", "updated_at",
+)
+
+
+def _str_or_none(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def decode_shift(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Поддокумент смены -> dict в формате ShiftSerializer"""
+    return {
+        "days": [int(day) for day in raw.get("days") or []],
+        "start": raw.get("start"),
+        "end": raw.get("end"),
+    }
+
+
+def decode_user(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Документ user -> dict в формате UserSerializer"""
+    return {
+        "id": str(raw["_id"]),
+        "username": raw.get("username"),
+        "email": raw.get("email"),
+        "first_name": raw.get("first_name"),
+        "last_name": raw.get("last_name"),
+        "params": raw.get("params") or {},
+        "max_daily_requests": raw.get("max_daily_requests"),
+        "max_hourly_requests": raw.get("max_hourly_requests"),
+        "max_in_flight": raw.get("max_in_flight"),
+        "shifts": [decode_shift(shift) for shift in raw.get("shifts") or []],
+    }
+
+
+def decode_request(
+    raw: Dict[str, Any],
+    usernames: Dict[ObjectId, str],
+    parent_statuses: Dict[ObjectId, str],
+) -> Dict[str, Any]:
+    """
+    Документ request -> dict в формате RequestSerializer.
+    user и parent отдаются так же, как их строковое представление в документах:
+    username исполнителя и "#id | status" родителя.
+    """
+    user_id = raw.get("user")
+    parent_id = raw.get("parent")
+    return {
+        "id": str(raw["_id"]),
+        "user": usernames.get(user_id) if user_id is not None else None,
+        "parent": f"#{parent_id} | {parent_statuses.get(parent_id)}" if parent_id is not None else None,
+        "params": raw.get("params") or {},
+        "text": raw.get("text"),
+        "status": raw.get("status"),
+        "priority": raw.get("priority", 0),
+        "deadline": raw.get("deadline"),
+        "created_at": raw.get("created_at"),
+        "updated_at": raw.get("updated_at"),
+    }
+
+
+def find_raw(document, query: Optional[Dict] = None, fields: Iterable[str] = (),
+             sort: Optional[List[Tuple[str, int]]] = None) -> Iterator[Dict[str, Any]]:
+    """find по коллекции документа с проекцией, без гидратации"""
+    projection = {field: 1 for field in fields} or None
+    cursor = document._get_collection().find(query or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor
+
+
+def usernames_by_id(user_ids: Iterable[ObjectId]) -> Dict[ObjectId, str]:
+    ids = list({uid for uid in user_ids if uid is not None})
+    if not ids:
+        return {}
+    return {raw["_id"]: raw.get("username") for raw in find_raw(User, {"_id": {"$in": ids}}, ["username"])}
+
+
+def statuses_by_id(request_ids: Iterable[ObjectId]) -> Dict[ObjectId, str]:
+    """Статусы заявок по id, включая перенесенные в архив"""
+    from dispatcher.archive import HistoryArchive
+
+    ids = {rid for rid in request_ids if rid is not None}
+    if not ids:
+        return {}
+    return {raw["_id"]: raw.get("status") for raw in HistoryArchive.find_requests(ids, ["status"])}
+
+
+def list_users(query: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    """Пользователи в порядке meta.ordering модели (username)"""
+    return [decode_user(raw) for raw in find_raw(User, query, USER_FIELDS, [("username", 1)])]
+
+
+def list_requests(query: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    """Заявки в порядке meta.ordering модели (-created_at); связи разрешаются двумя пакетными запросами"""
+    raws = list(find_raw(Request, query, REQUEST_FIELDS, [("created_at", -1)]))
+    usernames = usernames_by_id(raw.get("user") for raw in raws)
+    parent_statuses = statuses_by_id(raw.get("parent") for raw in raws)
+    return [decode_request(raw, usernames, parent_statuses) for raw in raws]
+
+
+def get_archived_request(request_id: str) -> Optional[Dict[str, Any]]:
+    """Заявка из архива в формате RequestSerializer; None, если её там нет"""
+    from dispatcher.archive import HistoryArchive
+
+    if not ObjectId.is_valid(request_id):
+        return None
+    raw = next(iter(HistoryArchive.find_requests([ObjectId(request_id)], REQUEST_FIELDS)), None)
+    if raw is None:
+        return None
+    return decode_request(raw, usernames_by_id([raw.get("user")]), statuses_by_id([raw.get("parent")]))
+
+
+def iter_dispatch_log_rows(
+    start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None
+) -> Iterator[Tuple[str, str, datetime.datetime]]:
+    """Строки логов (request_id, user_id, request_created_at) по возрастанию времени, включая архив"""
+    from dispatcher.archive import HistoryArchive
+
+    created_range: Dict[str, datetime.datetime] = {}
+    if start:
+        created_range["$gte"] = start
+    if end:
+        created_range["$lte"] = end
+    query = {"request_created_at": created_range} if created_range else {}
+
+    for raw in HistoryArchive.iter_logs(query, ("request_id", "user_id", "request_created_at"), start, end):
+        yield raw.get("request_id"), raw.get("user_id"), raw.get("request_created_at")
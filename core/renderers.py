@@ -0,0 +1,40 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils import encoders
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _default(value):
+    """Типы, которые orjson не сериализует сам (Decimal, lazy-строки и т.п.) - как в DRF"""
+    return _drf_encoder.default(value)
+
+
+def dumps(data) -> str:
+    """JSON-строка через orjson"""
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Рендерер JSON на orjson"""
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONParser(BaseParser):
+    """Парсер JSON на orjson"""
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,73 @@
+import hashlib
+import time
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+KEY_DATA_TYPES = "key_data_types"
+USERS = "users"
+DAILY_SUMMARY = "daily_summary"
+
+
+class ResponseCache:
+    """
+    Кэш ответов read-эндпоинтов в Redis с ETag.
+    У каждого ресурса своя версия; обработчики изменений увеличивают её (bump), после чего
+    старые записи кэша и ETag'и клиентов перестают совпадать. ETag строится из версии и ключа
+    запроса, поэтому If-None-Match проверяется без чтения из Mongo и без сборки ответа.
+    """
+    VERSION_KEY = "response_version:{}"
+    RESPONSE_KEY = "response_cache:{}:{}:{}"
+
+    @classmethod
+    def get_version(cls, resource: str) -> int:
+        key = cls.VERSION_KEY.format(resource)
+        version = cache.get(key)
+        if version is None:
+            # Начальная версия от времени: после потери ключа ETag'и клиентов не совпадут со старыми
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+        return version
+
+    @classmethod
+    def bump(cls, *resources: str) -> None:
+        for resource in resources:
+            key = cls.VERSION_KEY.format(resource)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time.time() * 1000), None)
+
+    @staticmethod
+    def _digest(parts: Iterable) -> str:
+        return hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+    @classmethod
+    def respond(cls, request, resource: str, parts: Iterable, build: Callable[[], Response]) -> Response:
+        """
+        Отвечает 304 по совпавшему If-None-Match, иначе данными из кэша или из build().
+        Кэшируются только ответы 200.
+        """
+        version = cls.get_version(resource)
+        digest = cls._digest(parts)
+        etag = f'"{resource}-{version}-{digest}"'
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            client_etags = [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+            if etag in client_etags:
+                return Response(status=304, headers={"ETag": etag})
+
+        cache_key = cls.RESPONSE_KEY.format(resource, version, digest)
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data, headers={"ETag": etag})
+
+        response = build()
+        if response.status_code == 200:
+            cache.set(cache_key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            response["ETag"] = etag
+        return response
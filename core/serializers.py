@@ -5,6 +5,15 @@ from core.models import User, Request, KeyDataTypes
 from core.utils import validate_and_cast_params, cast_params
 
 
+class ShiftSerializer(serializers.Serializer):
+    """Смена исполнителя: дни недели (0 - понедельник, пусто - каждый день) и время HH:MM"""
+    days = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False, default=list
+    )
+    start = serializers.RegexField(r"^([01]\d|2[0-3]):[0-5]\d$")
+    end = serializers.RegexField(r"^([01]\d|2[0-3]):[0-5]\d$|^24:00$")
+
+
 class UserSerializer(serializers.Serializer):
     id = serializers.CharField(read_only=True)
     username = serializers.CharField()
@@ -14,6 +23,12 @@ class UserSerializer(serializers.Serializer):
     last_name = serializers.CharField(required=False, allow_blank=True)
     params = serializers.DictField(required=False)
     max_daily_requests = serializers.IntegerField(required=False, allow_null=True)
+    max_hourly_requests = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    max_in_flight = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    shifts = ShiftSerializer(many=True, required=False)
+
+    def validate_shifts(self, value):
+        return [dict(shift) for shift in value]
 
     def validate_params(self, value):
         """Автоматически привести типы из KeyDataTypes"""
@@ -49,6 +64,8 @@ class RequestSerializer(serializers.Serializer):
             ("reject", "Reject"),
         ],
     )
+    priority = serializers.IntegerField(required=False, min_value=0, max_value=Request.MAX_PRIORITY)
+    deadline = serializers.DateTimeField(required=False, allow_null=True)
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
 
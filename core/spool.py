@@ -0,0 +1,72 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class IntakeSpool:
+    """
+    Локальный append-only файл заявок, принятых, пока Mongo недоступна (INTAKE_SPOOL_PATH).
+    Строка - JSON {"spooled_at", "idempotency_key", "data"}; data - тело запроса как пришло.
+    У каждой записи есть ключ идемпотентности (клиентский или сгенерированный), поэтому повторное
+    проигрывание командой replay_intake_spool не создает дублей.
+    """
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(settings.INTAKE_SPOOL_PATH)
+
+    @classmethod
+    def append(cls, data: Dict[str, Any], idempotency_key: str) -> None:
+        line = json.dumps(
+            {
+                "spooled_at": datetime.datetime.now(datetime.UTC).isoformat(),
+                "idempotency_key": idempotency_key,
+                "data": data,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+        with cls._lock, open(settings.INTAKE_SPOOL_PATH, "a", encoding="utf-8") as spool:
+            spool.write(line + "\n")
+            spool.flush()
+            os.fsync(spool.fileno())
+
+    @staticmethod
+    def claim() -> Optional[str]:
+        """
+        Переименовывает спул для проигрывания, чтобы новые записи шли в свежий файл.
+        Незавершенное прошлое проигрывание продолжается.
+        """
+        path = settings.INTAKE_SPOOL_PATH
+        replaying = f"{path}.replaying"
+        if os.path.exists(replaying):
+            return replaying
+        if not os.path.exists(path):
+            return None
+        os.replace(path, replaying)
+        return replaying
+
+    @staticmethod
+    def read(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, encoding="utf-8") as spool:
+            for number, line in enumerate(spool, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная при падении процесса последняя строка
+                    logger.error(f"Skipping malformed spool line {number} in {path}")
+
+    @staticmethod
+    def finish(path: str) -> None:
+        """Удаляет полностью проигранный спул"""
+        os.remove(path)
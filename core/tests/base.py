@@ -0,0 +1,56 @@
+from unittest import mock
+
+import mongomock
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django_redis import get_redis_connection
+from fakeredis import FakeConnection
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+from mongomock.collection import BulkOperationBuilder
+
+TEST_CACHES = {
+    "default": {
+        **settings.CACHES["default"],
+        "OPTIONS": {
+            **settings.CACHES["default"].get("OPTIONS", {}),
+            "CONNECTION_POOL_KWARGS": {"connection_class": FakeConnection},
+        },
+    }
+}
+
+_add_update = BulkOperationBuilder.add_update
+
+
+def _add_update_with_sort(self, selector, doc, multi=False, upsert=False, sort=None, **kwargs):
+    """pymongo >= 4.11 передает в bulk-операцию sort, которого mongomock 4.3 не знает"""
+    return _add_update(self, selector, doc, multi, upsert, **kwargs)
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class ServicesTestCase(SimpleTestCase):
+    """
+    Тест с Redis и MongoDB: django-redis ходит в fakeredis, mongoengine - в mongomock.
+    Перед каждым тестом обе базы очищаются.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(mock.patch.object(BulkOperationBuilder, "add_update", _add_update_with_sort))
+        disconnect()
+        connect(db=settings.MONGO_DB, host="mongodb://localhost", mongo_client_class=mongomock.MongoClient)
+
+    @classmethod
+    def tearDownClass(cls):
+        disconnect()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.redis = get_redis_connection("default")
+        self.redis.flushall()
+        get_db().client.drop_database(settings.MONGO_DB)
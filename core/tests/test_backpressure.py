@@ -0,0 +1,186 @@
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from pymongo.errors import PyMongoError
+from rest_framework.test import APIClient
+
+from core.backpressure import CircuitBreaker, IntakeBackpressure
+from core.models import Request
+from core.spool import IntakeSpool
+from .base import ServicesTestCase
+
+
+@override_settings(BREAKER_FAILURE_THRESHOLD=3, BREAKER_RESET_TIMEOUT=10, BREAKER_SLOW_CALL_SECONDS=2.0)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch("core.backpressure.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.check = mock.Mock(return_value={"status": "ok"})
+        self.breaker = CircuitBreaker("mongodb", self.check)
+
+    def fail(self, times=1):
+        for _ in range(times):
+            with self.assertRaises(RuntimeError), self.breaker.call():
+                raise RuntimeError("down")
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        with self.breaker.call():
+            pass
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.info(), {"state": CircuitBreaker.OPEN, "failures": 3})
+        self.assertFalse(self.breaker.allow())
+        self.check.assert_not_called()
+
+    def test_slow_call_counts_as_failure(self):
+        for _ in range(3):
+            with self.breaker.call():
+                self.now += 2.5
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_probe_after_reset_timeout(self):
+        self.fail(3)
+        self.now += 4
+        self.assertEqual(self.breaker.retry_after(), 6)
+
+        self.now += 6
+        self.check.return_value = {"status": "error"}
+        self.assertFalse(self.breaker.allow())
+        # Неудачная проба продлевает open на полный таймаут
+        self.assertEqual(self.breaker.retry_after(), 10)
+        self.now += 9
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.check.call_count, 1)
+
+        self.now += 1
+        self.check.return_value = {"status": "ok"}
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.info(), {"state": CircuitBreaker.CLOSED, "failures": 0})
+
+    def test_single_probe_at_a_time(self):
+        self.fail(3)
+        self.now += 10
+        concurrent = []
+
+        def probe():
+            concurrent.append(self.breaker.allow())
+            return {"status": "ok"}
+
+        self.check.side_effect = probe
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(concurrent, [False])
+
+
+class IntakeSlotTests(SimpleTestCase):
+    @override_settings(INTAKE_MAX_IN_FLIGHT=1)
+    def test_slot_limit(self):
+        with mock.patch.object(IntakeBackpressure, "_slots", None):
+            with IntakeBackpressure.slot() as first:
+                with IntakeBackpressure.slot() as second:
+                    self.assertEqual((first, second), (True, False))
+            with IntakeBackpressure.slot() as again:
+                self.assertTrue(again)
+
+
+@override_settings(BREAKER_FAILURE_THRESHOLD=5, BREAKER_RESET_TIMEOUT=10)
+@mock.patch("core.views.enqueue_dispatch")
+class IntakeSpoolApiTests(ServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(IntakeBackpressure, "_breakers", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_path = os.path.join(directory.name, "intake.spool")
+        self.client = APIClient()
+
+    def post(self, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post("/api/requests/", {"text": "work"}, format="json", **headers)
+
+    def open_mongodb_breaker(self):
+        breaker = IntakeBackpressure.breaker(IntakeBackpressure.MONGODB)
+        for _ in range(5):
+            breaker.record_failure("down")
+        return breaker
+
+    def spooled(self):
+        return list(IntakeSpool.read(self.spool_path))
+
+    def test_open_breaker_spools_request(self, enqueue):
+        self.open_mongodb_breaker()
+        with self.settings(INTAKE_SPOOL_PATH=self.spool_path):
+            response = self.post("k1")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {"spooled": True, "idempotency_key": "k1"})
+        [entry] = self.spooled()
+        self.assertEqual((entry["idempotency_key"], entry["data"]), ("k1", {"text": "work"}))
+        self.assertEqual(Request.objects.count(), 0)
+        enqueue.assert_not_called()
+
+    def test_open_breaker_without_spool_is_rejected(self, enqueue):
+        self.open_mongodb_breaker()
+        with self.settings(INTAKE_SPOOL_PATH=None):
+            response = self.post()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "10")
+
+    def test_mongodb_error_spools_with_generated_key(self, enqueue):
+        with self.settings(INTAKE_SPOOL_PATH=self.spool_path), \
+                mock.patch("core.views.RequestSerializer.save", side_effect=PyMongoError("down")):
+            response = self.post()
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.data["idempotency_key"].startswith("spool:"))
+        self.assertEqual(IntakeBackpressure.breaker(IntakeBackpressure.MONGODB).failures, 1)
+
+    @mock.patch("core.management.commands.replay_intake_spool.enqueue_dispatch")
+    def test_replay_creates_requests_once(self, replay_enqueue, enqueue):
+        with self.settings(INTAKE_SPOOL_PATH=self.spool_path):
+            IntakeSpool.append({"text": "first"}, "k1")
+            IntakeSpool.append({"text": "again"}, "k1")
+            IntakeSpool.append({"priority": 100}, "k2")
+            with open(self.spool_path, "a", encoding="utf-8") as spool:
+                spool.write('{"spooled_at": "2026-10-')
+
+            out = StringIO()
+            call_command("replay_intake_spool", stdout=out)
+
+        self.assertEqual([r.text for r in Request.objects], ["first"])
+        replay_enqueue.assert_called_once()
+        self.assertIn("Создано 1, уже существовало 1, с ошибками 1", out.getvalue())
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(os.path.exists(f"{self.spool_path}.replaying"))
+        with open(f"{self.spool_path}.replaying.failed", encoding="utf-8") as failed:
+            [entry] = [json.loads(line) for line in failed]
+        self.assertEqual(entry["idempotency_key"], "k2")
+        self.assertIn("priority", entry["errors"])
+
+
+class IntakeSpoolTests(SimpleTestCase):
+    def test_claim_resumes_unfinished_replay(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                self.settings(INTAKE_SPOOL_PATH=os.path.join(directory, "intake.spool")):
+            self.assertIsNone(IntakeSpool.claim())
+            IntakeSpool.append({"text": "a"}, "k1")
+            replaying = IntakeSpool.claim()
+            # Новые записи идут в свежий файл, пока старый не проигран
+            threads = [threading.Thread(target=IntakeSpool.append, args=({"text": "b"}, f"n{i}")) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(IntakeSpool.claim(), replaying)
+            self.assertEqual([e["idempotency_key"] for e in IntakeSpool.read(replaying)], ["k1"])
+            IntakeSpool.finish(replaying)
+            self.assertEqual(len(list(IntakeSpool.read(IntakeSpool.claim()))), 3)
@@ -0,0 +1,51 @@
+import datetime
+from unittest import mock
+
+from core.change_listener import ChangeListener
+from core.models import Request, User
+from .base import ServicesTestCase
+
+T0 = datetime.datetime(2026, 10, 19, 12)
+
+
+@mock.patch.object(ChangeListener, "handle")
+class ChangePollingTests(ServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.listener = ChangeListener()
+
+    @staticmethod
+    def touch(document, updated_at, **fields):
+        document._get_collection().update_one(
+            {"_id": document.id}, {"$set": {"updated_at": updated_at, **fields}}
+        )
+
+    def test_same_millisecond_request_is_not_lost(self, handle):
+        first = Request().save()
+        self.touch(first, T0)
+        self.listener.poll_requests()
+
+        # Записана в ту же миллисекунду, что и последняя виденная, но уже после опроса
+        second = Request().save()
+        self.touch(second, T0)
+        self.listener.poll_requests()
+        handle.assert_called_once_with("request", "update", second.id, ["updated_at"])
+
+        handle.reset_mock()
+        self.listener.poll_requests()
+        handle.assert_not_called()
+
+        self.touch(first, T0 + datetime.timedelta(milliseconds=1), status="accept")
+        self.listener.poll_requests()
+        handle.assert_called_once_with("request", "update", first.id, ["status", "updated_at"])
+
+    def test_same_millisecond_user_is_not_lost(self, handle):
+        alice = User(username="alice", password="x").save()
+        self.touch(alice, T0)
+        self.listener.poll_users()
+
+        bob = User(username="bob", password="x").save()
+        self.touch(bob, T0)
+        self.listener.poll_users()
+        self.listener.poll_users()
+        handle.assert_called_once_with("user", "insert", bob.id)
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from rest_framework.test import APIClient
+
+from core.models import Request
+from core.views import RequestViewSet
+from dispatcher.idempotency import IntakeIdempotency
+from .base import ServicesTestCase
+
+
+@mock.patch("core.views.enqueue_dispatch")
+class IntakeIdempotencyTests(ServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def post(self, key=None, text="work"):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post("/api/requests/", {"text": text}, format="json", **headers)
+
+    def test_repeated_key_returns_existing_request(self, enqueue):
+        created = self.post("k1")
+        repeated = self.post("k1", text="other")
+        self.assertEqual((created.status_code, repeated.status_code), (201, 200))
+        self.assertEqual(created.data["id"], repeated.data["id"])
+        self.assertEqual(repeated.data["text"], "work")
+        self.assertEqual(Request.objects.count(), 1)
+        enqueue.assert_called_once()
+        self.assertEqual(IntakeIdempotency.get_request_id("k1"), created.data["id"])
+
+    def test_key_missing_in_redis_is_found_in_mongo(self, enqueue):
+        created = self.post("k1")
+        self.redis.flushall()
+
+        repeated = self.post("k1")
+        self.assertEqual((repeated.status_code, repeated.data["id"]), (200, created.data["id"]))
+        self.assertEqual(IntakeIdempotency.get_request_id("k1"), created.data["id"])
+
+    def test_concurrent_create_with_same_key(self, enqueue):
+        created = self.post("k1")
+        # Параллельный запрос не нашел ключ и упирается в уникальный индекс при вставке
+        with mock.patch.object(RequestViewSet, "_get_by_idempotency_key", return_value=None):
+            raced = self.post("k1")
+        self.assertEqual((raced.status_code, raced.data["id"]), (200, created.data["id"]))
+        self.assertEqual(Request.objects.count(), 1)
+        enqueue.assert_called_once()
+
+    def test_requests_without_key_are_independent(self, enqueue):
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(Request.objects.count(), 2)
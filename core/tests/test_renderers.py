@@ -0,0 +1,25 @@
+import datetime
+import decimal
+import io
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSONParser, ORJSONRenderer, dumps
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_matches_drf_renderer(self):
+        data = {"text": "заявка", "priority": 3, "params": {"level": {"value": 2.5}}, "tags": [None, True]}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_types_outside_json(self):
+        data = {1: decimal.Decimal("1.50"), "at": datetime.datetime(2026, 1, 2, 3, 4, 5)}
+        self.assertEqual(dumps(data), '{"1":1.5,"at":"2026-01-02T03:04:05"}')
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO('{"a": [1, "б"]}'.encode())), {"a": [1, "б"]})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b"{broken"))
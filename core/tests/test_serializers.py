@@ -0,0 +1,46 @@
+import datetime
+
+from bson import ObjectId
+from django.test import SimpleTestCase
+
+from core.fast_serializers import CompiledSerializer
+from core.models import Request, User
+from core.readers import decode_request, decode_user
+from core.serializers import RequestSerializer, UserSerializer
+
+
+class CompiledSerializerTests(SimpleTestCase):
+    """Быстрый путь чтения должен отдавать ровно то же, что DRF-сериализатор документа"""
+
+    def assert_same_user(self, user):
+        compiled = CompiledSerializer(UserSerializer).one(decode_user(user.to_mongo().to_dict()))
+        self.assertEqual(compiled, dict(UserSerializer(user).data))
+
+    def test_user_with_caps_and_shifts(self):
+        self.assert_same_user(User(
+            id=ObjectId(), username="alice", password="x", email="a@example.com", first_name="Alice",
+            params={"region": "r1", "level": 3}, max_daily_requests=10, max_hourly_requests=2,
+            max_in_flight=1, shifts=[{"days": [0, 6], "start": "22:00", "end": "06:00"}],
+        ))
+
+    def test_user_without_optional_fields(self):
+        self.assert_same_user(User(id=ObjectId(), username="bob", password="x"))
+
+    def test_request(self):
+        user = User(id=ObjectId(), username="alice", password="x")
+        parent = Request(id=ObjectId(), status="accept")
+        request = Request(
+            id=ObjectId(), user=user, parent=parent, params={"region": "r1"}, text="text",
+            status="await", priority=3,
+            deadline=datetime.datetime(2026, 10, 20, 12, 30, tzinfo=datetime.UTC),
+        )
+        raw = request.to_mongo().to_dict()
+        compiled = CompiledSerializer(RequestSerializer).one(
+            decode_request(raw, {user.id: user.username}, {parent.id: parent.status})
+        )
+        self.assertEqual(compiled, dict(RequestSerializer(request).data))
+
+    def test_request_without_user_and_parent(self):
+        request = Request(id=ObjectId(), params={}, status="processed")
+        compiled = CompiledSerializer(RequestSerializer).one(decode_request(request.to_mongo().to_dict(), {}, {}))
+        self.assertEqual(compiled, dict(RequestSerializer(request).data))
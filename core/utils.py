@@ -1,10 +1,37 @@
 from mongoengine import Document, StringField
 from django.core.exceptions import ValidationError
 import datetime
+import time
 
+from core.events import ChangeEvents
 from core.models import KeyDataTypes
 
 
+class KeyTypesCache:
+    """
+    Типы ключей параметров в памяти процесса.
+    Сбрасывается событием изменения key_data_types (ChangeEvents) и при правках через API;
+    TTL - страховка на случай, когда слушатель изменений не запущен.
+    """
+    TTL = 60
+    _types = None
+    _loaded_at = 0.0
+
+    @classmethod
+    def get(cls) -> dict:
+        if cls._types is None or time.monotonic() - cls._loaded_at > cls.TTL:
+            cls._types = {k["name"]: k.get("type_of", "string") for k in KeyDataTypes.objects.only("name", "type_of").as_pymongo()}
+            cls._loaded_at = time.monotonic()
+        return cls._types
+
+    @classmethod
+    def invalidate(cls, event=None) -> None:
+        cls._types = None
+
+
+ChangeEvents.subscribe("key_data_types", KeyTypesCache.invalidate)
+
+
 def cast_param_value(value, type_name: str):
     """Преобразует значение по типу."""
     if type_name == "string":
@@ -42,7 +69,7 @@ def validate_and_cast_params(params: dict) -> dict:
     { "value": ..., "operator": "...", "height": ... }
     Неизвестные ключи — считаются string.
     """
-    key_types = {k.name: k.type_of for k in KeyDataTypes.objects.all()}
+    key_types = KeyTypesCache.get()
     validated = {}
 
     for key, param in params.items():
@@ -69,7 +96,7 @@ def validate_and_cast_params(params: dict) -> dict:
 
 
 def cast_params(params: dict) -> dict:
-    key_types = {k.name: k.type_of for k in KeyDataTypes.objects.all()}
+    key_types = KeyTypesCache.get()
     validated = {}
 
     for key, value in params.items():
@@ -1,25 +1,40 @@
 import datetime
-import time
+import logging
+import uuid
 
-import redis
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
-from mongoengine import DoesNotExist
-from pymongo import MongoClient
+from mongoengine import DoesNotExist, NotUniqueError
+from pymongo.errors import PyMongoError
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core import readers
+from core.backpressure import IntakeBackpressure
+from core.fast_serializers import CompiledSerializer
+from core.health import dependency_checks
+from core.response_cache import ResponseCache, KEY_DATA_TYPES, USERS
 from core.models import User, Request, KeyDataTypes
 from core.serializers import UserSerializer, RequestSerializer, KeyDataTypesSerializer
-from dispatcher.tasks import dispatch_request
-from executor_balancer.celery import app
+from core.spool import IntakeSpool
+from core.utils import KeyTypesCache
+from dispatcher.capacity import ExecutorCapacity
+from dispatcher.idempotency import IntakeIdempotency
+from dispatcher.redispatch import RedispatchEngine
+from dispatcher.snapshot import ExecutorSnapshot
+from dispatcher.tasks import enqueue_dispatch
+
+logger = logging.getLogger(__name__)
 
 START_TIME = datetime.datetime.now(datetime.UTC)
 
+USER_LIST = CompiledSerializer(UserSerializer)
+REQUEST_LIST = CompiledSerializer(RequestSerializer)
+
 
 class HealthCheckView(APIView):
     """
@@ -30,6 +45,7 @@ class HealthCheckView(APIView):
     - Redis
     - RabbitMQ
     - Celery worker
+    (в режиме DISPATCH_MODE=local вместо RabbitMQ и Celery - очередь распределения процесса)
     """
 
     authentication_classes = []
@@ -42,63 +58,10 @@ class HealthCheckView(APIView):
         responses={200: {"status": "string", "message": "string"}},
     )
     def get(self, request):
-        results = {}
-
         now = datetime.datetime.now(datetime.UTC)
         uptime = now - START_TIME
 
-        try:
-            start = time.time()
-            mongo_uri = (
-                f"mongodb://{settings.MONGO_USER}:{settings.MONGO_PASS}@"
-                f"{settings.MONGO_HOST}:{settings.MONGO_PORT}/"
-                f"{settings.MONGO_DB}"
-            )
-            client = MongoClient(
-                mongo_uri,
-                serverSelectionTimeoutMS=2000,
-                authSource="admin",
-            )
-            client.admin.command("ping")
-            latency = round((time.time() - start) * 1000, 2)
-            results["mongodb"] = {"status": "ok", "latency_ms": latency}
-            client.close()
-        except Exception as e:
-            results["mongodb"] = {"status": f"error: {e}"}
-
-        try:
-            start = time.time()
-            redis_url = settings.CACHES["default"]["LOCATION"]
-            client = redis.StrictRedis.from_url(redis_url)
-            client.ping()
-            results["redis"] = {
-                "status": "ok",
-                "latency_ms": round((time.time() - start) * 1000, 2),
-            }
-        except Exception as e:
-            results["redis"] = {"status": f"error: {e}"}
-
-        try:
-            start = time.time()
-            with app.connection_for_read() as conn:
-                conn.ensure_connection(max_retries=1)
-            rabbitmq_latency = round((time.time() - start) * 1000, 2)
-            results["rabbitmq"] = {"status": "ok", "latency_ms": rabbitmq_latency}
-        except Exception as e:
-            results["rabbitmq"] = {"status": f"error: {e}"}
-
-        try:
-            start = time.time()
-            response = app.control.ping()
-            if response:
-                results["celery"] = {
-                    "status": "ok",
-                    "latency_ms": round((time.time() - start) * 1000, 2),
-                }
-            else:
-                results["celery"] = {"status": "no response"}
-        except Exception as e:
-            results["celery"] = {"status": f"error: {e}"}
+        results = {name: check() for name, check in dependency_checks().items()}
 
         all_ok = all(v.get("status") == "ok" for v in results.values())
         code = status.HTTP_200_OK if all_ok else status.HTTP_503_SERVICE_UNAVAILABLE
@@ -108,6 +71,7 @@ class HealthCheckView(APIView):
                 "status": "ok" if all_ok else "degraded",
                 "uptime": str(uptime).split(".")[0],
                 "services": results,
+                "breakers": IntakeBackpressure.states(),
             },
             status=code,
         )
@@ -123,9 +87,9 @@ class UserViewSet(viewsets.GenericViewSet):
         responses={200: UserSerializer(many=True)},
     )
     def list(self, request):
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        return ResponseCache.respond(
+            request, USERS, ("list",), lambda: Response(USER_LIST.many(readers.list_users()))
+        )
 
     @extend_schema(
         summary="Получить пользователя по ID",
@@ -136,6 +100,10 @@ class UserViewSet(viewsets.GenericViewSet):
         },
     )
     def retrieve(self, request, pk=None):
+        return ResponseCache.respond(request, USERS, ("retrieve", pk), lambda: self._retrieve(pk))
+
+    @staticmethod
+    def _retrieve(pk):
         try:
             user = User.objects.get(id=pk)
         except DoesNotExist:
@@ -155,6 +123,8 @@ class UserViewSet(viewsets.GenericViewSet):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
+            ExecutorSnapshot.publish_delta(user)
+            ResponseCache.bump(USERS)
             return Response(UserSerializer(user).data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -175,6 +145,8 @@ class UserViewSet(viewsets.GenericViewSet):
         serializer = UserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             user = serializer.save()
+            ExecutorSnapshot.publish_delta(user)
+            ResponseCache.bump(USERS)
             return Response(UserSerializer(user).data)
         return Response(serializer.errors, status=400)
 
@@ -192,6 +164,8 @@ class UserViewSet(viewsets.GenericViewSet):
         except DoesNotExist:
             return Response({"error": "Пользователь не найден"}, status=404)
         user.delete()
+        ExecutorSnapshot.publish_delta(user, deleted=True)
+        ResponseCache.bump(USERS)
         return Response(status=204)
 
     @extend_schema(
@@ -213,16 +187,16 @@ class UserViewSet(viewsets.GenericViewSet):
             }
         ]
 
-        agg_result = list(Request.objects.aggregate(*pipeline))
+        agg_result = list(Request._get_collection().aggregate(pipeline))
+        usernames = readers.usernames_by_id(entry["_id"] for entry in agg_result)
 
         user_data = []
         for entry in agg_result:
             user_id = entry["_id"]
-            user = User.objects(id=user_id).first()
-            if user:
+            if user_id in usernames:
                 user_data.append({
-                    "id": str(user.id),
-                    "username": user.username,
+                    "id": str(user_id),
+                    "username": usernames[user_id],
                     "request_count": entry["request_count"]
                 })
 
@@ -246,15 +220,15 @@ class UserViewSet(viewsets.GenericViewSet):
         except DoesNotExist:
             return Response({"error": "Пользователь не найден"}, status=404)
 
-        user_requests = Request.objects(user=user).only("id", "status")
         requests_list = [
-            {"id": str(r.id), "status": r.status} for r in user_requests
+            {"id": str(r["_id"]), "status": r.get("status")}
+            for r in readers.find_raw(Request, {"user": user.id}, ["status"], [("created_at", -1)])
         ]
 
         data = {
             "id": str(user.id),
             "username": user.username,
-            "request_count": user_requests.count(),
+            "request_count": len(requests_list),
             "requests": requests_list
         }
 
@@ -271,9 +245,7 @@ class RequestViewSet(viewsets.ViewSet):
         responses={200: RequestSerializer(many=True)},
     )
     def list(self, request):
-        items = Request.objects.all()
-        serializer = RequestSerializer(items, many=True)
-        return Response(serializer.data)
+        return Response(REQUEST_LIST.many(readers.list_requests()))
 
     @extend_schema(
         summary="Получить заявку по ID",
@@ -287,38 +259,153 @@ class RequestViewSet(viewsets.ViewSet):
         try:
             item = Request.objects.get(id=pk)
         except DoesNotExist:
-            return Response({"error": "Заявка не найдена"}, status=404)
+            archived = readers.get_archived_request(pk)
+            if archived is None:
+                return Response({"error": "Заявка не найдена"}, status=404)
+            return Response(REQUEST_LIST.one(archived))
         return Response(RequestSerializer(item).data)
 
     @extend_schema(
         summary="Создать заявку",
-        description="Создаёт новую заявку в системе.",
+        description="Создаёт новую заявку в системе. Повторный запрос с тем же заголовком "
+                    "Idempotency-Key возвращает уже созданную заявку (200) без повторного распределения.",
         request=RequestSerializer,
+        parameters=[
+            OpenApiParameter(
+                name="Idempotency-Key",
+                location=OpenApiParameter.HEADER,
+                description="Ключ идемпотентности (опционально)",
+                required=False,
+                type=str,
+            ),
+        ],
         responses={
+            200: RequestSerializer,
             201: RequestSerializer,
+            202: OpenApiResponse(description="MongoDB недоступна, заявка записана в спул"),
             400: OpenApiResponse(description="Ошибка валидации"),
+            429: OpenApiResponse(description="Превышен лимит одновременных запросов (Retry-After)"),
+            503: OpenApiResponse(description="MongoDB недоступна (Retry-After)"),
         },
     )
     def create(self, request):
-        serializer = RequestSerializer(data=request.data)
-        if serializer.is_valid():
-            obj = serializer.save()
+        with IntakeBackpressure.slot() as admitted:
+            if not admitted:
+                return Response(
+                    {"error": "Слишком много одновременных запросов"},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(settings.INTAKE_RETRY_AFTER)},
+                )
+            return self._create(request)
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "new_requests",
-                {
-                    "type": "new_request",
-                    "id": str(obj.id),
-                    "status": obj.status,
-                    "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
-                },
-            )
+    def _create(self, request):
+        idempotency_key = request.headers.get("Idempotency-Key")
+        mongodb = IntakeBackpressure.breaker(IntakeBackpressure.MONGODB)
+        if not mongodb.allow():
+            return self._spool_or_reject(request, idempotency_key, mongodb)
 
-            _ = dispatch_request.delay(str(obj.id))
+        try:
+            if idempotency_key:
+                with mongodb.call():
+                    existing = self._get_by_idempotency_key(idempotency_key)
+                if existing is not None:
+                    return Response(RequestSerializer(existing).data, status=200)
+
+            serializer = RequestSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=400)
+            try:
+                with mongodb.call():
+                    obj = serializer.save(idempotency_key=idempotency_key)
+            except NotUniqueError:
+                existing = Request.objects.get(idempotency_key=idempotency_key)
+                return Response(RequestSerializer(existing).data, status=200)
+        except PyMongoError:
+            logger.exception("Request intake failed on MongoDB")
+            return self._spool_or_reject(request, idempotency_key, mongodb)
+
+        self._announce(obj, idempotency_key)
+        return Response(RequestSerializer(obj).data, status=201)
+
+    @staticmethod
+    def _announce(obj, idempotency_key):
+        """
+        Запоминает ключ идемпотентности, оповещает клиентов и ставит заявку на распределение.
+        Заявка уже сохранена, поэтому отказ Redis или брокера не роняет ответ: без задачи её
+        подберет dispatch_pending.
+        """
+        redis_breaker = IntakeBackpressure.breaker(IntakeBackpressure.REDIS)
+        if redis_breaker.allow():
+            try:
+                with redis_breaker.call():
+                    if idempotency_key:
+                        IntakeIdempotency.remember(idempotency_key, str(obj.id))
+                    async_to_sync(get_channel_layer().group_send)(
+                        "new_requests",
+                        {
+                            "type": "new_request",
+                            "id": str(obj.id),
+                            "status": obj.status,
+                            "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+                        },
+                    )
+            except Exception:
+                logger.exception(f"Failed to announce request {obj.id}")
+
+        broker = IntakeBackpressure.breaker(IntakeBackpressure.BROKER)
+        if settings.DISPATCH_MODE == "local":
+            enqueue_dispatch(str(obj.id), obj.params or {}, obj.priority)
+        elif broker.allow():
+            try:
+                with broker.call():
+                    enqueue_dispatch(str(obj.id), obj.params or {}, obj.priority)
+            except Exception:
+                logger.exception(f"Failed to enqueue request {obj.id}, leaving it to dispatch_pending")
+
+    @staticmethod
+    def _spool_or_reject(request, idempotency_key, breaker):
+        """
+        Mongo недоступна: заявка пишется в спул (202) либо запрос отклоняется (503).
+        Валидация params читает типы ключей из Mongo, поэтому спул проверяется при проигрывании.
+        """
+        if IntakeSpool.enabled():
+            key = idempotency_key or f"spool:{uuid.uuid4()}"
+            try:
+                IntakeSpool.append(request.data, key)
+                return Response({"spooled": True, "idempotency_key": key}, status=status.HTTP_202_ACCEPTED)
+            except OSError:
+                logger.exception("Failed to spool request")
+        return Response(
+            {"error": "Хранилище заявок временно недоступно"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(breaker.retry_after() if breaker.state == breaker.OPEN
+                                        else settings.INTAKE_RETRY_AFTER)},
+        )
 
-            return Response(RequestSerializer(obj).data, status=201)
-        return Response(serializer.errors, status=400)
+    @staticmethod
+    def _get_by_idempotency_key(key):
+        """Ищет ранее созданную заявку по ключу идемпотентности: сначала в Redis, затем в Mongo"""
+        redis_breaker = IntakeBackpressure.breaker(IntakeBackpressure.REDIS)
+        redis_available = redis_breaker.allow()
+        request_id = None
+        if redis_available:
+            try:
+                with redis_breaker.call():
+                    request_id = IntakeIdempotency.get_request_id(key)
+            except Exception:
+                logger.exception("Idempotency lookup in Redis failed, falling back to MongoDB")
+                redis_available = False
+        if request_id is not None:
+            existing = Request.objects(id=request_id).first()
+        else:
+            existing = Request.objects(idempotency_key=key).first()
+        if existing is not None and request_id is None and redis_available:
+            try:
+                with redis_breaker.call():
+                    IntakeIdempotency.remember(key, str(existing.id))
+            except Exception:
+                logger.exception("Failed to remember idempotency key")
+        return existing
 
     @extend_schema(
         summary="Обновить заявку",
@@ -327,6 +414,7 @@ class RequestViewSet(viewsets.ViewSet):
         responses={
             200: RequestSerializer,
             404: OpenApiResponse(description="Заявка не найдена"),
+            409: OpenApiResponse(description="Заявка уже переназначена"),
         },
     )
     def update(self, request, pk=None):
@@ -334,9 +422,17 @@ class RequestViewSet(viewsets.ViewSet):
             item = Request.objects.get(id=pk)
         except DoesNotExist:
             return Response({"error": "Заявка не найдена"}, status=404)
+        previous_status = item.status
         serializer = RequestSerializer(item, data=request.data, partial=True)
         if serializer.is_valid():
+            new_status = serializer.validated_data.get("status", previous_status)
+            if new_status != previous_status:
+                ExecutorCapacity.mark_tracked(str(item.id))
+                # Условная смена статуса: заявку, которую уже переназначил sweep_redispatch, принять нельзя
+                if not Request.objects(id=item.id, redispatched_at=None).update_one(set__status=new_status):
+                    return Response({"error": "Заявка уже переназначена"}, status=409)
             obj = serializer.save()
+            RedispatchEngine.on_status_change(obj, previous_status)
             return Response(RequestSerializer(obj).data)
         return Response(serializer.errors, status=400)
 
@@ -369,9 +465,10 @@ class KeyDataTypesViewSet(viewsets.ViewSet):
         responses={200: KeyDataTypesSerializer(many=True)},
     )
     def list(self, request):
-        objs = KeyDataTypes.objects.all()
-        serializer = KeyDataTypesSerializer(objs, many=True)
-        return Response(serializer.data)
+        return ResponseCache.respond(
+            request, KEY_DATA_TYPES, ("list",),
+            lambda: Response(KeyDataTypesSerializer(KeyDataTypes.objects.all(), many=True).data),
+        )
 
     @extend_schema(
         summary="Получить конкретный тип данных",
@@ -402,6 +499,8 @@ class KeyDataTypesViewSet(viewsets.ViewSet):
         serializer = KeyDataTypesSerializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
+            ResponseCache.bump(KEY_DATA_TYPES)
+            KeyTypesCache.invalidate()
             return Response(KeyDataTypesSerializer(obj).data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -423,6 +522,8 @@ class KeyDataTypesViewSet(viewsets.ViewSet):
         serializer = KeyDataTypesSerializer(item, data=request.data, partial=True)
         if serializer.is_valid():
             obj = serializer.save()
+            ResponseCache.bump(KEY_DATA_TYPES)
+            KeyTypesCache.invalidate()
             return Response(KeyDataTypesSerializer(obj).data)
         return Response(serializer.errors, status=400)
 
@@ -440,6 +541,8 @@ class KeyDataTypesViewSet(viewsets.ViewSet):
         except KeyDataTypes.DoesNotExist:
             return Response({"detail": "Not found"}, status=404)
         obj.delete()
+        ResponseCache.bump(KEY_DATA_TYPES)
+        KeyTypesCache.invalidate()
         return Response(status=204)
 
 
@@ -0,0 +1,123 @@
+import logging
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .candidate_info import CandidateInfo
+from .snapshot import ExecutorSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorAffinity:
+    """
+    Привязка дочерних заявок к исполнителю родителя.
+
+    Для каждой распределенной заявки в Redis запоминается исполнитель (hash заявка -> исполнитель),
+    время последнего обращения хранится в zset и определяет вытеснение: записей не больше
+    AFFINITY_MAX_ENTRIES, лишние давно не использованные удаляются. Дочерняя заявка уходит
+    исполнителю родителя без скоринга, если он есть в снимке шарда, не исключен и у него есть емкость;
+    иначе заявка распределяется обычным образом. Исходы поиска считаются в AFFINITY_STATS_KEY.
+    """
+    MAP_KEY = "affinity:executor"
+    LRU_KEY = "affinity:lru"
+    STATS_KEY = "affinity:stats"
+    TRIM_LOCK_KEY = "affinity:trim"
+    TRIM_LOCK_TIMEOUT = 10
+    OUTCOMES = ("hits", "misses", "unavailable")
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection("default")
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.AFFINITY_ENABLED
+
+    @staticmethod
+    def parent_of(request) -> Optional[str]:
+        """id родителя без разыменования ReferenceField (лишнего чтения из Mongo)"""
+        parent = request._data.get("parent")
+        return str(getattr(parent, "id", parent)) if parent is not None else None
+
+    @classmethod
+    def _resolve(cls, user_id: Optional[bytes], excluded: Set[str], daily_counts: Dict[str, int],
+                 shard: Optional[str]) -> Tuple[Optional[CandidateInfo], str]:
+        """Кандидат по найденному исполнителю родителя и исход поиска"""
+        if user_id is None:
+            return None, "misses"
+        user_id = user_id.decode()
+        record = ExecutorSnapshot.get_record(user_id, shard)
+        if record is None or user_id in excluded:
+            return None, "unavailable"
+        candidate = CandidateInfo(
+            user_id, 0.0, 0.0, daily_counts.get(user_id, 0), record.max_daily_requests,
+            username=record.username,
+        )
+        return candidate, "hits"
+
+    @classmethod
+    def lookup(cls, parent_id: str, excluded: Set[str], daily_counts: Dict[str, int],
+               shard: Optional[str] = None) -> Optional[CandidateInfo]:
+        """
+        Исполнитель родителя как кандидат или None. excluded - исполнители, которых нельзя выбирать
+        (исключенные заявкой, без емкости и вне смены).
+        """
+        pipe = cls._redis().pipeline(transaction=False)
+        pipe.hget(cls.MAP_KEY, parent_id)
+        pipe.zadd(cls.LRU_KEY, {parent_id: time.time()}, xx=True)
+        user_id, _ = pipe.execute()
+
+        candidate, outcome = cls._resolve(user_id, excluded, daily_counts, shard)
+        cls._redis().hincrby(cls.STATS_KEY, outcome, 1)
+        return candidate
+
+    @classmethod
+    def peek(cls, parent_id: str, excluded: Set[str], daily_counts: Dict[str, int],
+             shard: Optional[str] = None) -> Optional[CandidateInfo]:
+        """Как lookup, но только читает: время обращения и статистика исходов не меняются (dry-run)"""
+        candidate, _ = cls._resolve(cls._redis().hget(cls.MAP_KEY, parent_id), excluded, daily_counts, shard)
+        return candidate
+
+    @classmethod
+    def remember(cls, request_id: str, user_id: str, pipe) -> None:
+        """
+        Запоминает исполнителя заявки. Команды добавляются в pipe, ZCARD - последней;
+        её результат вызывающий передает в trim.
+        """
+        pipe.hset(cls.MAP_KEY, request_id, user_id)
+        pipe.zadd(cls.LRU_KEY, {request_id: time.time()})
+        pipe.zcard(cls.LRU_KEY)
+
+    @classmethod
+    def trim(cls, size: int) -> None:
+        """Вытесняет давно не использованные записи, когда их на 10% больше AFFINITY_MAX_ENTRIES"""
+        limit = settings.AFFINITY_MAX_ENTRIES
+        if size <= limit + limit // 10:
+            return
+        client = cls._redis()
+        if not client.set(cls.TRIM_LOCK_KEY, 1, nx=True, ex=cls.TRIM_LOCK_TIMEOUT):
+            return
+        try:
+            evicted = [member for member, _ in client.zpopmin(cls.LRU_KEY, size - limit)]
+            if evicted:
+                client.hdel(cls.MAP_KEY, *evicted)
+                logger.info(f"Evicted {len(evicted)} affinity entries")
+        finally:
+            client.delete(cls.TRIM_LOCK_KEY)
+
+    @classmethod
+    def stats(cls) -> Dict:
+        pipe = cls._redis().pipeline(transaction=False)
+        pipe.hgetall(cls.STATS_KEY)
+        pipe.zcard(cls.LRU_KEY)
+        raw, entries = pipe.execute()
+        counts = {outcome: int(raw.get(outcome.encode(), 0)) for outcome in cls.OUTCOMES}
+        lookups = sum(counts.values())
+        return {
+            **counts,
+            "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,205 @@
+import datetime
+import heapq
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from core.models import Request
+from .models import DispatchLogs
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _insert_ignoring_duplicates(collection, docs: List[Dict[str, Any]]) -> None:
+    """insert_many, переживающий повторный запуск: уже перенесенные документы пропускаются"""
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in exc.details["writeErrors"]):
+            raise
+
+
+def _day_start(moment: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime.combine(moment.date(), datetime.time.min)
+
+
+class HistoryArchive:
+    """
+    Архив логов распределения и закрытых заявок в помесячных коллекциях.
+
+    Логи старше ARCHIVE_LOGS_AFTER_DAYS переносятся в dispatch_logs_archive_YYYY_MM по месяцу
+    request_created_at; по каждому перенесенному дню в dispatch_logs_daily хранится число логов,
+    поэтому daily_summary складывает горячую коллекцию с дневными итогами архива.
+    Закрытые заявки (accept, а также reject с уже созданной дочерней) старше ARCHIVE_REQUESTS_AFTER_DAYS
+    по updated_at переносятся в request_archive_YYYY_MM по месяцу создания ObjectId,
+    что позволяет искать архивную заявку по id в одной коллекции.
+
+    Каждая пачка сначала вставляется в архив, затем обновляется итог дня и только после этого
+    удаляется из горячей коллекции, так что прерванный перенос безопасно повторяется.
+    """
+    LOGS_ARCHIVE = "dispatch_logs_archive_{:%Y_%m}"
+    LOGS_ROLLUP = "dispatch_logs_daily"
+    REQUESTS_ARCHIVE = "request_archive_{:%Y_%m}"
+    # Статистика заявок строится не более чем за 30 дней и читает только горячую коллекцию
+    MIN_REQUEST_AGE_DAYS = 31
+
+    @staticmethod
+    def _db():
+        return DispatchLogs._get_db()
+
+    @classmethod
+    def _archive_names(cls, pattern: str, start: Optional[datetime.datetime],
+                       end: Optional[datetime.datetime]) -> List[str]:
+        """Существующие архивные коллекции, пересекающиеся с периодом"""
+        prefix = pattern.split("{")[0]
+        names = sorted(name for name in cls._db().list_collection_names() if name.startswith(prefix))
+        low = pattern.format(start) if start else None
+        high = pattern.format(end) if end else None
+        return [name for name in names if (low is None or name >= low) and (high is None or name <= high)]
+
+    @classmethod
+    def archive_logs(cls, older_than: datetime.datetime, batch_size: int) -> int:
+        """Переносит логи целых дней раньше older_than в архив; возвращает число перенесенных"""
+        hot = DispatchLogs._get_collection()
+        rollup = cls._db()[cls.LOGS_ROLLUP]
+        query = {"request_created_at": {"$lt": _day_start(older_than)}}
+        moved = 0
+
+        # Перенесенные логи удаляются, поэтому каждый проход берет следующую пачку с начала;
+        # сортировка по времени идет по индексу и в обычной, и в time-series коллекции
+        while True:
+            docs = list(hot.find(query).sort("request_created_at", ASCENDING).limit(batch_size))
+            if not docs:
+                break
+
+            by_month: Dict[str, List[Dict[str, Any]]] = {}
+            for doc in docs:
+                by_month.setdefault(cls.LOGS_ARCHIVE.format(doc["request_created_at"]), []).append(doc)
+            for name, month_docs in by_month.items():
+                archive = cls._db()[name]
+                archive.create_index("request_created_at")
+                _insert_ignoring_duplicates(archive, month_docs)
+
+            days = {_day_start(doc["request_created_at"]) for doc in docs}
+            rollup.bulk_write([
+                UpdateOne(
+                    {"_id": day.strftime("%Y-%m-%d")},
+                    {"$set": {"count": cls._db()[cls.LOGS_ARCHIVE.format(day)].count_documents(
+                        {"request_created_at": {"$gte": day, "$lt": day + datetime.timedelta(days=1)}}
+                    )}},
+                    upsert=True,
+                )
+                for day in days
+            ])
+
+            hot.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            moved += len(docs)
+        return moved
+
+    @classmethod
+    def archive_requests(cls, older_than: datetime.datetime, batch_size: int) -> int:
+        """
+        Переносит закрытые заявки в архив; возвращает число перенесенных.
+        Заявка, на которую ссылается оставшаяся в горячей коллекции дочерняя, не переносится.
+        """
+        hot = Request._get_collection()
+        query = {
+            "updated_at": {"$lt": older_than},
+            "$or": [{"status": "accept"}, {"status": "reject", "redispatched_at": {"$ne": None}}],
+        }
+        moved = 0
+        last_id = None
+
+        while True:
+            batch_query = dict(query, **({"_id": {"$gt": last_id}} if last_id else {}))
+            docs = list(hot.find(batch_query).sort("_id", ASCENDING).limit(batch_size))
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+
+            ids = {doc["_id"] for doc in docs}
+            referenced = {
+                child["parent"]
+                for child in hot.find({"parent": {"$in": list(ids)}}, {"parent": 1})
+                if child["_id"] not in ids
+            }
+            docs = [doc for doc in docs if doc["_id"] not in referenced]
+            if not docs:
+                continue
+
+            by_month: Dict[str, List[Dict[str, Any]]] = {}
+            for doc in docs:
+                by_month.setdefault(cls.REQUESTS_ARCHIVE.format(doc["_id"].generation_time), []).append(doc)
+            for name, month_docs in by_month.items():
+                _insert_ignoring_duplicates(cls._db()[name], month_docs)
+
+            hot.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            moved += len(docs)
+        return moved
+
+    @classmethod
+    def run(cls) -> Dict[str, int]:
+        """Один проход архивации по настройкам; возраст 0 отключает соответствующую часть"""
+        now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        batch_size = settings.ARCHIVE_BATCH_SIZE
+        result = {"logs": 0, "requests": 0}
+        if settings.ARCHIVE_LOGS_AFTER_DAYS:
+            result["logs"] = cls.archive_logs(
+                now - datetime.timedelta(days=settings.ARCHIVE_LOGS_AFTER_DAYS), batch_size
+            )
+        if settings.ARCHIVE_REQUESTS_AFTER_DAYS:
+            days = max(settings.ARCHIVE_REQUESTS_AFTER_DAYS, cls.MIN_REQUEST_AGE_DAYS)
+            result["requests"] = cls.archive_requests(now - datetime.timedelta(days=days), batch_size)
+        logger.info(f"Archived {result['logs']} dispatch logs and {result['requests']} requests")
+        return result
+
+    @classmethod
+    def daily_rollups(cls, start: Optional[datetime.date] = None,
+                      end: Optional[datetime.date] = None) -> Dict[str, int]:
+        """Дневные итоги архивных логов за период: {'YYYY-MM-DD': count}"""
+        day_range = {}
+        if start:
+            day_range["$gte"] = start.strftime("%Y-%m-%d")
+        if end:
+            day_range["$lte"] = end.strftime("%Y-%m-%d")
+        query = {"_id": day_range} if day_range else {}
+        return {raw["_id"]: raw["count"] for raw in cls._db()[cls.LOGS_ROLLUP].find(query)}
+
+    @classmethod
+    def iter_logs(cls, query: Dict[str, Any], fields: Iterable[str],
+                  start: Optional[datetime.datetime] = None,
+                  end: Optional[datetime.datetime] = None) -> Iterator[Dict[str, Any]]:
+        """Логи из горячей коллекции и архивов периода одним потоком по возрастанию request_created_at"""
+        projection = {field: 1 for field in fields} or None
+        sort = [("request_created_at", ASCENDING)]
+        cursors = [DispatchLogs._get_collection().find(query, projection).sort(sort)]
+        for name in cls._archive_names(cls.LOGS_ARCHIVE, start, end):
+            cursors.append(cls._db()[name].find(query, projection).sort(sort))
+        if len(cursors) == 1:
+            return cursors[0]
+        return heapq.merge(*cursors, key=lambda raw: raw["request_created_at"])
+
+    @classmethod
+    def find_requests(cls, ids: Iterable[ObjectId], fields: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Заявки по id из горячей коллекции, недостающие - из архивов по месяцу ObjectId"""
+        projection = {field: 1 for field in fields} or None
+        missing = set(ids)
+        for raw in Request._get_collection().find({"_id": {"$in": list(missing)}}, projection):
+            missing.discard(raw["_id"])
+            yield raw
+        if not missing:
+            return
+
+        by_month: Dict[str, List[ObjectId]] = {}
+        for request_id in missing:
+            by_month.setdefault(cls.REQUESTS_ARCHIVE.format(request_id.generation_time), []).append(request_id)
+        existing = set(cls._db().list_collection_names())
+        for name, month_ids in by_month.items():
+            if name in existing:
+                yield from cls._db()[name].find({"_id": {"$in": month_ids}}, projection)
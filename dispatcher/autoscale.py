@@ -0,0 +1,201 @@
+import datetime
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+from celery import current_app
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .metrics import QueueWaitHistogram
+from .sharding import FALLBACK_QUEUE, queue_for_shard
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchAutoscaler:
+    """
+    Контроллер пула воркеров распределения, запускается Celery beat раз в AUTOSCALE_INTERVAL секунд.
+
+    Входы: глубина очередей распределения (RabbitMQ management API или пассивный queue_declare),
+    среднее время ожидания заявок за интервал (по QueueWaitHistogram) и загрузка CPU (loadavg).
+    Пул меняется на один процесс за тик командами pool_grow/pool_shrink в пределах
+    AUTOSCALE_MIN_CONCURRENCY..AUTOSCALE_MAX_CONCURRENCY.
+
+    При очереди от AUTOSCALE_BATCH_DEPTH включается пакетный режим: enqueue_dispatch перестает
+    публиковать задачи, а заявки разбираются пачками dispatch_pending; режим выключается, когда
+    очередь опускается ниже половины порога, и сам истекает, если контроллер остановлен.
+    """
+    BATCH_MODE_KEY = "autoscale:batch_mode"
+    WAIT_KEY = "autoscale:wait"
+    STATE_KEY = "autoscale:state"
+    INSPECT_TIMEOUT = 1.0
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection("default")
+
+    @staticmethod
+    def queues() -> List[str]:
+        return [queue_for_shard(None)] + [queue_for_shard(shard) for shard in settings.DISPATCH_SHARDS]
+
+    @staticmethod
+    def _management_depth(queue: str) -> int:
+        response = requests.get(
+            f"{settings.RABBITMQ_MANAGEMENT_URL.rstrip('/')}/api/queues/{quote('/', safe='')}/{quote(queue, safe='')}",
+            auth=(settings.RABBITMQ_USER, settings.RABBITMQ_PASS),
+            timeout=5,
+        )
+        if response.status_code == 404:
+            return 0
+        response.raise_for_status()
+        return int(response.json().get("messages", 0))
+
+    @classmethod
+    def queue_depth(cls) -> int:
+        """Число сообщений в очередях распределения"""
+        if settings.RABBITMQ_MANAGEMENT_URL:
+            return sum(cls._management_depth(queue) for queue in cls.queues())
+
+        total = 0
+        with current_app.connection_for_read() as connection:
+            channel = connection.channel()
+            for queue in cls.queues():
+                try:
+                    total += channel.queue_declare(queue=queue, passive=True).message_count
+                except connection.channel_errors:
+                    # Очереди ещё нет; брокер закрывает канал после ошибки passive declare
+                    channel = connection.channel()
+            channel.close()
+        return total
+
+    @classmethod
+    def queue_latency(cls) -> float:
+        """Среднее время ожидания заявок, распределенных с прошлого тика, в секундах"""
+        histograms = QueueWaitHistogram.snapshot().values()
+        count = sum(h["count"] for h in histograms)
+        total = sum(h["avg_seconds"] * h["count"] for h in histograms)
+
+        client = cls._redis()
+        previous = {k.decode(): float(v) for k, v in client.hgetall(cls.WAIT_KEY).items()}
+        client.hset(cls.WAIT_KEY, mapping={"count": count, "sum": total})
+        observed = count - previous.get("count", count)
+        if observed <= 0:
+            return 0.0
+        return max(total - previous.get("sum", total), 0.0) / observed
+
+    @staticmethod
+    def cpu_load() -> float:
+        """Загрузка CPU: loadavg за минуту на одно ядро"""
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+    @classmethod
+    def dispatch_workers(cls) -> Dict[str, int]:
+        """Воркеры, слушающие очереди распределения, и текущий размер их пулов"""
+        inspect = current_app.control.inspect(timeout=cls.INSPECT_TIMEOUT)
+        active_queues = inspect.active_queues() or {}
+        workers = [
+            worker for worker, queues in active_queues.items()
+            if any(q["name"].split(".")[0] == FALLBACK_QUEUE for q in queues)
+        ]
+        if not workers:
+            return {}
+        stats = current_app.control.inspect(destination=workers, timeout=cls.INSPECT_TIMEOUT).stats() or {}
+        sizes = {}
+        for worker in workers:
+            pool = stats.get(worker, {}).get("pool", {})
+            sizes[worker] = len(pool.get("processes", [])) or pool.get("max-concurrency", 1)
+        return sizes
+
+    @staticmethod
+    def decide(depth: int, latency: float, load: float, concurrency: int) -> int:
+        """Изменение размера пула (+1, -1 или 0) для одного воркера"""
+        if load > settings.AUTOSCALE_MAX_LOAD:
+            # CPU уже занят: новые процессы только отнимут его у текущих
+            return -1 if concurrency > settings.AUTOSCALE_MIN_CONCURRENCY else 0
+        backlogged = depth > settings.AUTOSCALE_DEPTH_PER_PROCESS * concurrency
+        if (backlogged or latency > settings.AUTOSCALE_LATENCY_TARGET) \
+                and concurrency < settings.AUTOSCALE_MAX_CONCURRENCY:
+            return 1
+        if depth == 0 and latency < settings.AUTOSCALE_LATENCY_TARGET / 2 \
+                and concurrency > settings.AUTOSCALE_MIN_CONCURRENCY:
+            return -1
+        return 0
+
+    @classmethod
+    def batch_mode(cls) -> bool:
+        return settings.AUTOSCALE_ENABLED and bool(cls._redis().exists(cls.BATCH_MODE_KEY))
+
+    @classmethod
+    def update_batch_mode(cls, depth: int) -> bool:
+        """Включает пакетный режим по порогу очереди и выключает с гистерезисом"""
+        client = cls._redis()
+        enabled = bool(client.exists(cls.BATCH_MODE_KEY))
+        if depth >= settings.AUTOSCALE_BATCH_DEPTH or (enabled and depth >= settings.AUTOSCALE_BATCH_DEPTH // 2):
+            client.set(cls.BATCH_MODE_KEY, 1, ex=settings.AUTOSCALE_INTERVAL * 3)
+            if not enabled:
+                logger.warning(f"Dispatch backlog is {depth} messages, switching to batch mode")
+            return True
+        if enabled:
+            client.delete(cls.BATCH_MODE_KEY)
+            logger.info(f"Dispatch backlog is {depth} messages, leaving batch mode")
+        return False
+
+    @classmethod
+    def resize(cls, workers: Dict[str, int], delta: int) -> List[Tuple[str, int]]:
+        changed = []
+        for worker, concurrency in workers.items():
+            if delta > 0:
+                current_app.control.pool_grow(delta, destination=[worker])
+            else:
+                current_app.control.pool_shrink(-delta, destination=[worker])
+            changed.append((worker, concurrency + delta))
+            logger.info(f"Dispatch worker {worker} pool resized from {concurrency} to {concurrency + delta}")
+        return changed
+
+    @classmethod
+    def run(cls) -> Dict[str, Any]:
+        """Один тик контроллера; состояние сохраняется для DispatchMetricsView"""
+        from .tasks import dispatch_pending
+
+        depth = cls.queue_depth()
+        latency = cls.queue_latency()
+        load = cls.cpu_load()
+        workers = cls.dispatch_workers()
+        concurrency = min(workers.values()) if workers else 0
+
+        delta = cls.decide(depth, latency, load, concurrency) if workers else 0
+        resizable = {
+            worker: size for worker, size in workers.items()
+            if settings.AUTOSCALE_MIN_CONCURRENCY <= size + delta <= settings.AUTOSCALE_MAX_CONCURRENCY
+        }
+        if delta and resizable:
+            cls.resize(resizable, delta)
+
+        batch_mode = cls.update_batch_mode(depth)
+        if batch_mode:
+            dispatch_pending.apply_async(
+                kwargs={"batch_size": settings.AUTOSCALE_BATCH_SIZE, "min_age": 0}, priority=9
+            )
+
+        state = {
+            "queue_depth": depth,
+            "latency_seconds": round(latency, 3),
+            "cpu_load": round(load, 3),
+            "workers": len(workers),
+            "concurrency": concurrency + delta if resizable else concurrency,
+            "action": {1: "grow", -1: "shrink"}.get(delta, "none") if resizable else "none",
+            "batch_mode": batch_mode,
+            "updated_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        }
+        cls._redis().hset(cls.STATE_KEY, mapping={k: str(v) for k, v in state.items()})
+        return state
+
+    @classmethod
+    def state(cls) -> Optional[Dict[str, str]]:
+        if not settings.AUTOSCALE_ENABLED:
+            return None
+        raw = cls._redis().hgetall(cls.STATE_KEY)
+        return {k.decode(): v.decode() for k, v in raw.items()} or None
@@ -5,8 +5,9 @@ from .scoring import LoadBalancer
 class CandidateInfo:
     def __init__(self, user_id: str, total_score: float, max_score: float, 
                  daily_requests: int, max_daily_requests: Optional[int], 
-                 is_fallback: bool = False):
+                 is_fallback: bool = False, username: Optional[str] = None):
         self.user_id = user_id
+        self.username = username
         self.total_score = total_score
         self.max_score = max_score
         self.daily_requests = daily_requests
@@ -0,0 +1,211 @@
+import datetime
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .columnar import ExecutorRecord
+from .locks import RequestCounter
+from .snapshot import ExecutorSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def _decode_counts(raw: Dict[bytes, bytes]) -> Dict[str, int]:
+    return {k.decode(): int(v) for k, v in raw.items() if k.decode() != RequestCounter.SENTINEL}
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def in_shift(shifts: Sequence[Dict[str, Any]], now: datetime.datetime) -> bool:
+    """
+    На смене ли исполнитель в момент now (локальное время CAPACITY_TIMEZONE).
+    Смена с end <= start переходит через полночь; пустой список - всегда на смене.
+    """
+    if not shifts:
+        return True
+    weekday = now.weekday()
+    minute = now.hour * 60 + now.minute
+    for shift in shifts:
+        days = shift.get("days") or range(7)
+        start, end = _minutes(shift["start"]), _minutes(shift["end"])
+        if start < end:
+            if weekday in days and start <= minute < end:
+                return True
+        elif (weekday in days and minute >= start) or ((weekday - 1) % 7 in days and minute < end):
+            return True
+    return False
+
+
+@dataclass
+class CapacityState:
+    """Использованная емкость исполнителей: за день, за текущий час и заявки в работе"""
+    daily: Dict[str, int] = field(default_factory=dict)
+    hourly: Dict[str, int] = field(default_factory=dict)
+    in_flight: Dict[str, int] = field(default_factory=dict)
+
+    def exhausted(self, index: Dict[str, ExecutorRecord]) -> Set[str]:
+        """Исполнители, у которых закончился дневной, часовой лимит или лимит заявок в работе"""
+        exhausted = set()
+        for counts, cap_of in (
+            (self.daily, lambda r: r.max_daily_requests),
+            (self.hourly, lambda r: r.max_hourly_requests),
+            (self.in_flight, lambda r: r.max_in_flight),
+        ):
+            for user_id, count in counts.items():
+                record = index.get(user_id)
+                cap = cap_of(record) if record is not None else None
+                if cap is not None and count >= cap:
+                    exhausted.add(user_id)
+        return exhausted
+
+
+class ExecutorCapacity:
+    """
+    Емкость исполнителей в Redis: часовые окна (hash на час, сбрасывается началом следующего окна),
+    счетчики заявок в работе и дневные счетчики RequestCounter.
+
+    fetch читает всё одним pipeline, а unavailable возвращает исполнителей без емкости и вне смены,
+    которые исключаются из кандидатов до скоринга. Перебираются только исполнители со счетчиками
+    (по индексу снимка) и исполнители со сменами (список строится один раз на версию снимка).
+    Счетчики в работе раз в UPDATE_INTERVAL пересчитываются по Mongo, как и дневные.
+
+    Токен-бакетов с пополнением здесь нет: лимиты - целые числа назначений за календарный час
+    и день, и счетчик в окне выражает их точно без фонового пополнения, а дневные счетчики уже
+    устроены так же. Исполнители без емкости не удаляются из индекса кандидатов (он строится
+    по версии снимка и общий для процесса), а попадают в множество исключений.
+    """
+    HOURLY_KEY = "capacity:hourly:{:%Y%m%d%H}"
+    HOURLY_TIMEOUT = 2 * 60 * 60
+    IN_FLIGHT_KEY = "capacity:in_flight"
+    IN_FLIGHT_SYNC_KEY = "capacity:in_flight:synced"
+    IN_FLIGHT_TIMEOUT = 24 * 60 * 60
+    UPDATE_INTERVAL = 60
+    FAST_RESYNC_INTERVAL = 5
+    TRACKED_KEY = "capacity:tracked:{}"
+    TRACKED_TIMEOUT = 10 * 60
+    ACTIVE_STATUSES = ("processed", "await")
+
+    # shard -> (снимок, исполнители со сменами)
+    _scheduled: Dict[Optional[str], Tuple[List[ExecutorRecord], List[ExecutorRecord]]] = {}
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection("default")
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.UTC)
+
+    @classmethod
+    def hourly_key(cls, now: Optional[datetime.datetime] = None) -> str:
+        return cls.HOURLY_KEY.format(now or cls._now())
+
+    @classmethod
+    def fetch(cls) -> CapacityState:
+        """Дневные, часовые счетчики и заявки в работе одним pipeline"""
+        pipe = cls._redis().pipeline(transaction=False)
+        pipe.set(RequestCounter.SYNC_KEY, 1, nx=True, ex=RequestCounter.UPDATE_INTERVAL)
+        pipe.hgetall(RequestCounter.COUNTS_CACHE_KEY)
+        pipe.hgetall(cls.hourly_key())
+        pipe.set(cls.IN_FLIGHT_SYNC_KEY, 1, nx=True, ex=cls.UPDATE_INTERVAL)
+        pipe.hgetall(cls.IN_FLIGHT_KEY)
+        daily_sync, daily, hourly, in_flight_sync, in_flight = pipe.execute()
+
+        return CapacityState(
+            daily=(
+                RequestCounter.get_request_counts(force_db_read=True)
+                if daily_sync or not daily else _decode_counts(daily)
+            ),
+            hourly=_decode_counts(hourly),
+            in_flight=cls.resync_in_flight() if in_flight_sync or not in_flight else _decode_counts(in_flight),
+        )
+
+    @classmethod
+    def peek(cls) -> CapacityState:
+        """
+        Счетчики как они есть в Redis, без пересчета по Mongo (для dry-run explain):
+        пустой или истекший хеш дает пустые счетчики
+        """
+        pipe = cls._redis().pipeline(transaction=False)
+        pipe.hgetall(RequestCounter.COUNTS_CACHE_KEY)
+        pipe.hgetall(cls.hourly_key())
+        pipe.hgetall(cls.IN_FLIGHT_KEY)
+        daily, hourly, in_flight = pipe.execute()
+        return CapacityState(_decode_counts(daily), _decode_counts(hourly), _decode_counts(in_flight))
+
+    @classmethod
+    def off_shift(cls, shard: Optional[str] = None, now: Optional[datetime.datetime] = None) -> Set[str]:
+        executors = ExecutorSnapshot.get(shard)
+        cached = cls._scheduled.get(shard)
+        if cached is None or cached[0] is not executors:
+            cached = (executors, [e for e in executors if e.shifts])
+            cls._scheduled[shard] = cached
+        local_now = (now or cls._now()).astimezone(ZoneInfo(settings.CAPACITY_TIMEZONE))
+        return {e.id for e in cached[1] if not in_shift(e.shifts, local_now)}
+
+    @classmethod
+    def unavailable(cls, state: CapacityState, shard: Optional[str] = None) -> Set[str]:
+        """Исполнители шарда, которых не нужно рассматривать: нет емкости или вне смены"""
+        return state.exhausted(ExecutorSnapshot.index(shard)) | cls.off_shift(shard)
+
+    @classmethod
+    def reserve(cls, user_id: str, pipe=None) -> None:
+        """Учитывает назначение в часовом окне и в работе; с pipe команды только добавляются в него"""
+        target = pipe if pipe is not None else cls._redis().pipeline(transaction=False)
+        hourly_key = cls.hourly_key()
+        target.hincrby(hourly_key, user_id, 1)
+        target.expire(hourly_key, cls.HOURLY_TIMEOUT)
+        target.hincrby(cls.IN_FLIGHT_KEY, user_id, 1)
+        if pipe is None:
+            target.execute()
+
+    @classmethod
+    def release(cls, user_id: str) -> None:
+        """Заявка исполнителя завершена (принята или отклонена)"""
+        client = cls._redis()
+        if client.hincrby(cls.IN_FLIGHT_KEY, user_id, -1) < 0:
+            client.hset(cls.IN_FLIGHT_KEY, user_id, 0)
+
+    @classmethod
+    def resync_in_flight(cls) -> Dict[str, int]:
+        """Пересчитывает заявки в работе по Mongo"""
+        from core.models import Request
+
+        pipeline = [
+            {"$match": {"user": {"$ne": None}, "status": {"$in": list(cls.ACTIVE_STATUSES)}}},
+            {"$group": {"_id": "$user", "count": {"$sum": 1}}},
+        ]
+        counts = {str(r["_id"]): r["count"] for r in Request._get_collection().aggregate(pipeline)}
+        pipe = cls._redis().pipeline()
+        pipe.delete(cls.IN_FLIGHT_KEY)
+        pipe.hset(cls.IN_FLIGHT_KEY, mapping={RequestCounter.SENTINEL: 0, **counts})
+        pipe.expire(cls.IN_FLIGHT_KEY, cls.IN_FLIGHT_TIMEOUT)
+        pipe.execute()
+        return counts
+
+    @classmethod
+    def mark_tracked(cls, request_id: str) -> None:
+        """
+        Смена статуса заявки идет через API, и счетчики в Redis учтут её сами:
+        слушатель изменений не будет ради неё пересчитывать счетчики по Mongo
+        """
+        cls._redis().set(cls.TRACKED_KEY.format(request_id), 1, ex=cls.TRACKED_TIMEOUT)
+
+    @classmethod
+    def consume_tracked(cls, request_id: str) -> bool:
+        """Была ли смена статуса заявки отмечена mark_tracked (отметка снимается)"""
+        return bool(cls._redis().delete(cls.TRACKED_KEY.format(request_id)))
+
+    @classmethod
+    def schedule_resync(cls) -> None:
+        """Сокращает время до пересчета заявок в работе до FAST_RESYNC_INTERVAL"""
+        client = cls._redis()
+        if client.ttl(cls.IN_FLIGHT_SYNC_KEY) > cls.FAST_RESYNC_INTERVAL:
+            client.expire(cls.IN_FLIGHT_SYNC_KEY, cls.FAST_RESYNC_INTERVAL)
@@ -0,0 +1,151 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import msgpack
+
+
+@dataclass
+class ExecutorRecord:
+    """Легковесная запись исполнителя для скоринга"""
+    id: str
+    username: str
+    max_daily_requests: Optional[int] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    max_hourly_requests: Optional[int] = None
+    max_in_flight: Optional[int] = None
+    shifts: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _to_naive_utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.UTC).replace(tzinfo=None)
+    return value
+
+
+@dataclass
+class ExecutorColumns:
+    """
+    Колоночное представление снимка исполнителей.
+    Параметры хранятся типизированными колонками одинаковой длины (None - нет значения);
+    datetime хранится как timestamp в UTC, значения разных типов - колонкой "mixed".
+    """
+    FORMAT_VERSION = 2
+    TYPES = ((bool, "boolean"), (int, "integer"), (float, "float"), (str, "string"),
+             (datetime.datetime, "datetime"))
+
+    version: int
+    ids: List[str] = field(default_factory=list)
+    usernames: List[str] = field(default_factory=list)
+    caps: List[Optional[int]] = field(default_factory=list)
+    hourly_caps: List[Optional[int]] = field(default_factory=list)
+    in_flight_caps: List[Optional[int]] = field(default_factory=list)
+    shifts: List[List[Dict[str, Any]]] = field(default_factory=list)
+    columns: Dict[str, Tuple[str, List[Any]]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def _column_type(cls, values: List[Any]) -> str:
+        found = set()
+        for value in values:
+            if value is None:
+                continue
+            for python_type, type_name in cls.TYPES:
+                if isinstance(value, python_type):
+                    found.add(type_name)
+                    break
+            else:
+                return "mixed"
+        if found == {"integer", "float"}:
+            return "float"
+        return found.pop() if len(found) == 1 else "mixed"
+
+    @classmethod
+    def from_records(cls, records: List[ExecutorRecord], version: int) -> "ExecutorColumns":
+        keys = sorted({key for record in records for key in record.params})
+        columns = {}
+        for key in keys:
+            values = [record.params.get(key) for record in records]
+            type_name = cls._column_type(values)
+            if type_name == "datetime":
+                values = [
+                    _to_naive_utc(v).replace(tzinfo=datetime.UTC).timestamp() if v is not None else None
+                    for v in values
+                ]
+            elif type_name == "float":
+                values = [float(v) if v is not None else None for v in values]
+            elif type_name == "mixed":
+                values = [
+                    _to_naive_utc(v).isoformat() if isinstance(v, datetime.datetime) else v
+                    for v in values
+                ]
+            columns[key] = (type_name, values)
+
+        return cls(
+            version=version,
+            ids=[record.id for record in records],
+            usernames=[record.username for record in records],
+            caps=[record.max_daily_requests for record in records],
+            hourly_caps=[record.max_hourly_requests for record in records],
+            in_flight_caps=[record.max_in_flight for record in records],
+            shifts=[record.shifts for record in records],
+            columns=columns,
+        )
+
+    def decoded_column(self, key: str) -> List[Any]:
+        """Значения колонки в исходных python-типах"""
+        type_name, values = self.columns[key]
+        if type_name == "datetime":
+            return [
+                datetime.datetime.fromtimestamp(v, datetime.UTC).replace(tzinfo=None) if v is not None else None
+                for v in values
+            ]
+        return values
+
+    def to_records(self) -> List[ExecutorRecord]:
+        records = [
+            ExecutorRecord(executor_id, username, cap, {}, hourly_cap, in_flight_cap, shifts)
+            for executor_id, username, cap, hourly_cap, in_flight_cap, shifts in zip(
+                self.ids, self.usernames, self.caps, self.hourly_caps, self.in_flight_caps, self.shifts
+            )
+        ]
+        for key in self.columns:
+            for record, value in zip(records, self.decoded_column(key)):
+                if value is not None:
+                    record.params[key] = value
+        return records
+
+    def pack(self) -> bytes:
+        return msgpack.packb(
+            {
+                "format": self.FORMAT_VERSION,
+                "version": self.version,
+                "ids": self.ids,
+                "usernames": self.usernames,
+                "caps": self.caps,
+                "hourly_caps": self.hourly_caps,
+                "in_flight_caps": self.in_flight_caps,
+                "shifts": self.shifts,
+                "columns": {key: [type_name, values] for key, (type_name, values) in self.columns.items()},
+            },
+            use_bin_type=True,
+        )
+
+    @classmethod
+    def unpack(cls, blob: bytes) -> Optional["ExecutorColumns"]:
+        """Разбирает blob; None, если формат несовместим"""
+        data = msgpack.unpackb(blob, raw=False, strict_map_key=False)
+        if data.get("format") != cls.FORMAT_VERSION:
+            return None
+        return cls(
+            version=data["version"],
+            ids=data["ids"],
+            usernames=data["usernames"],
+            caps=data["caps"],
+            hourly_caps=data["hourly_caps"],
+            in_flight_caps=data["in_flight_caps"],
+            shifts=data["shifts"],
+            columns={key: (type_name, values) for key, (type_name, values) in data["columns"].items()},
+        )
@@ -0,0 +1,97 @@
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .capacity import ExecutorCapacity
+from .snapshot import ExecutorSnapshot
+from .strategies import WeightedScoreStrategy, get_strategy, resolve_strategy_name
+
+
+def explain_dispatch(
+    request_params: Dict[str, Dict[str, Any]],
+    top_n: int = 5,
+    min_score_fraction: float = 0.7,
+    strategy_name: Optional[str] = None,
+    shard: Optional[str] = None,
+    exclude: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """
+    Dry-run распределения: ничего не сохраняет, работает по снимку исполнителей в памяти.
+    Исполнители без емкости (дневной, часовой лимит, заявки в работе) и вне смены
+    не рассматриваются, их число возвращается в unavailable. Счетчики читаются из Redis
+    без пересчета по Mongo.
+    Возвращает выбор стратегии, top-N кандидатов с разбором оценок по параметрам
+    и время каждой фазы в миллисекундах.
+    """
+    timings: Dict[str, float] = {}
+    started = phase_started = time.perf_counter()
+
+    def phase(name: str) -> None:
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[name] = round((now - phase_started) * 1000, 3)
+        phase_started = now
+
+    executors = ExecutorSnapshot.get(shard)
+    phase("snapshot")
+
+    state = ExecutorCapacity.peek()
+    daily_counts = state.daily
+    unavailable = ExecutorCapacity.unavailable(state, shard)
+    excluded = set(exclude) | unavailable
+    if excluded:
+        executors = [e for e in executors if e.id not in excluded]
+    phase("counts")
+
+    scorer_strategy = WeightedScoreStrategy(min_score_fraction=min_score_fraction)
+    candidates = scorer_strategy.score_all(executors, request_params, daily_counts)
+    phase("scoring")
+
+    ranked = sorted(candidates)[:top_n]
+    phase("ranking")
+
+    strategy_name = strategy_name or resolve_strategy_name(request_params)
+    chosen = get_strategy(strategy_name, min_score_fraction=min_score_fraction).select(
+        executors, request_params, daily_counts
+    )
+    phase("strategy")
+
+    keys = list(request_params)
+    result = []
+    for candidate in ranked:
+        record = ExecutorSnapshot.get_record(candidate.user_id, shard)
+        user_params = record.params if record else {}
+        parameter_scores = scorer_strategy.scorer.calculate_parameter_scores(user_params, request_params)
+        result.append({
+            "user": candidate.user_id,
+            "username": record.username if record else None,
+            "load_factor": round(candidate.load_factor, 6),
+            "is_fallback": candidate.is_fallback,
+            "total_score": candidate.total_score,
+            "max_score": candidate.max_score,
+            "daily_requests": candidate.daily_requests,
+            "max_daily_requests": candidate.max_daily_requests,
+            "params": [
+                {
+                    "key": key,
+                    "user_value": user_params.get(key),
+                    "value": score.value,
+                    "weight": score.weight,
+                    "matches": score.matches,
+                    "weighted_score": score.weighted_score,
+                }
+                for key, score in zip(keys, parameter_scores)
+            ],
+        })
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+
+    return {
+        "strategy": strategy_name,
+        "shard": shard,
+        "executors_considered": len(executors),
+        "unavailable": len(unavailable),
+        "eligible": len(candidates),
+        "chosen": chosen.user_id if chosen else None,
+        "chosen_is_fallback": chosen.is_fallback if chosen else None,
+        "candidates": result,
+        "timings_ms": timings,
+    }
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+
+class DispatchDeduplicator:
+    """
+    Ключи дедупликации распределения в Redis: request_id -> выбранный исполнитель.
+    Повторная доставка задачи по уже распределенной заявке отвечает из кэша без обращения к Mongo.
+    Ключи пишутся напрямую в Redis, чтобы попадать в общий pipeline фиксации распределения.
+    """
+    RESULT_CACHE_KEY = "dispatch_result:{}"
+    RESULT_CACHE_TIMEOUT = 24 * 60 * 60
+
+    @classmethod
+    def get_result(cls, request_id: str) -> Optional[str]:
+        value = get_redis_connection("default").get(cls.RESULT_CACHE_KEY.format(request_id))
+        return value.decode() if value is not None else None
+
+    @classmethod
+    def remember(cls, request_id: str, user_id: str, pipe=None) -> None:
+        """Запоминает исполнителя; с pipe команда только добавляется в него"""
+        client = pipe if pipe is not None else get_redis_connection("default")
+        client.set(cls.RESULT_CACHE_KEY.format(request_id), user_id, ex=cls.RESULT_CACHE_TIMEOUT)
+
+
+class IntakeIdempotency:
+    """Ключи идемпотентности приема заявок: Idempotency-Key -> id созданной заявки"""
+    KEY_CACHE_KEY = "idempotency_key:{}"
+    KEY_CACHE_TIMEOUT = 24 * 60 * 60
+
+    @classmethod
+    def get_request_id(cls, key: str) -> Optional[str]:
+        return cache.get(cls.KEY_CACHE_KEY.format(key))
+
+    @classmethod
+    def remember(cls, key: str, request_id: str) -> None:
+        cache.set(cls.KEY_CACHE_KEY.format(key), request_id, cls.KEY_CACHE_TIMEOUT)
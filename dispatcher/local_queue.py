@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import itertools
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+from django.conf import settings
+
+from .sharding import shard_for_request
+
+logger = logging.getLogger(__name__)
+
+
+class LocalDispatchQueue:
+    """
+    Распределение без брокера для одноузловых установок (DISPATCH_MODE=local).
+
+    ASGI-процесс запускает поток с asyncio-циклом и очередью с приоритетами: enqueue_dispatch
+    кладет в неё id заявки, LOCAL_DISPATCH_CONCURRENCY обработчиков выбирают исполнителя теми же
+    choose_executor/commit_assignment в пуле потоков. Отдельного журнала нет: нераспределенная
+    заявка и так лежит в Mongo (user=None), поэтому при старте и затем раз в интервал dispatch-pending
+    такие заявки возвращаются в очередь. Остальные периодические задачи из beat_schedule
+    и задачи, отправленные через tasks.send_task, выполняются этим же циклом.
+    """
+    # dispatch-pending заменяет восстановление очереди, автомасштабировать нечего
+    SKIPPED_PERIODIC = ("dispatch-pending", "autoscale-dispatch")
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _queue: Optional[asyncio.PriorityQueue] = None
+    _queued: Set[str] = set()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+    _order = itertools.count()
+
+    @classmethod
+    def start(cls) -> None:
+        """Запускает поток цикла распределения (один на процесс)"""
+        with cls._lock:
+            if cls._thread is not None and cls._thread.is_alive():
+                return
+            ready = threading.Event()
+            cls._thread = threading.Thread(target=cls._run, args=(ready,), name="local-dispatch", daemon=True)
+            cls._thread.start()
+            ready.wait()
+
+    @classmethod
+    def is_running(cls) -> bool:
+        return cls._thread is not None and cls._thread.is_alive()
+
+    @classmethod
+    def size(cls) -> int:
+        return cls._queue.qsize() if cls._queue is not None else 0
+
+    @classmethod
+    def put(cls, request_id: str, priority: int = 0) -> None:
+        """Ставит заявку в очередь; потокобезопасно"""
+        if cls._loop is None:
+            logger.debug(f"Local dispatch loop is not running in this process, request {request_id} will be recovered")
+            return
+        cls._loop.call_soon_threadsafe(cls._put_nowait, request_id, priority or 0)
+
+    @classmethod
+    def submit(cls, func, *args: Any) -> None:
+        """
+        Выполняет задачу (или любую функцию) в пуле потоков цикла, не блокируя вызывающего.
+        Без цикла в этом процессе (команды manage.py) функция выполняется сразу.
+        """
+        if cls._loop is None:
+            func(*args)
+            return
+        cls._loop.call_soon_threadsafe(cls._submit_nowait, func, args)
+
+    @classmethod
+    def _submit_nowait(cls, func, args) -> None:
+        async def run():
+            try:
+                await cls._loop.run_in_executor(None, func, *args)
+            except Exception:
+                logger.exception(f"Local job {getattr(func, 'name', func.__qualname__)} failed")
+
+        cls._loop.create_task(run())
+
+    @classmethod
+    def _put_nowait(cls, request_id: str, priority: int) -> None:
+        if request_id in cls._queued:
+            return
+        cls._queued.add(request_id)
+        cls._queue.put_nowait((-priority, next(cls._order), request_id))
+
+    @classmethod
+    def _run(cls, ready: threading.Event) -> None:
+        cls._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(cls._loop)
+        cls._queue = asyncio.PriorityQueue()
+        cls._executor = ThreadPoolExecutor(
+            max_workers=settings.LOCAL_DISPATCH_CONCURRENCY, thread_name_prefix="local-dispatch"
+        )
+        ready.set()
+        cls._loop.run_until_complete(cls._main())
+
+    @classmethod
+    async def _main(cls) -> None:
+        from executor_balancer.celery import app
+        from . import tasks  # noqa: F401 - регистрирует задачи beat_schedule
+        from .snapshot import ExecutorSnapshot
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(cls._executor, ExecutorSnapshot.warm, None)
+        try:
+            await loop.run_in_executor(None, cls.recover, 0)
+        except Exception:
+            logger.exception("Local dispatch recovery failed, retrying on the next sweep")
+        logger.info(f"Local dispatch loop started, {cls.size()} requests recovered")
+
+        jobs = [cls._worker() for _ in range(settings.LOCAL_DISPATCH_CONCURRENCY)]
+        for name, entry in app.conf.beat_schedule.items():
+            if name not in cls.SKIPPED_PERIODIC:
+                jobs.append(cls._periodic(app.tasks[entry["task"]], float(entry["schedule"])))
+        recovery_interval = float(app.conf.beat_schedule["dispatch-pending"]["schedule"])
+        jobs.append(cls._periodic(cls.recover, recovery_interval, settings.DISPATCH_PENDING_MIN_AGE))
+        await asyncio.gather(*jobs)
+
+    @classmethod
+    async def _worker(cls) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, request_id = await cls._queue.get()
+            try:
+                await loop.run_in_executor(cls._executor, cls.dispatch, request_id)
+            except Exception:
+                logger.exception(f"Local dispatch of request {request_id} failed")
+            finally:
+                cls._queued.discard(request_id)
+                cls._queue.task_done()
+
+    @staticmethod
+    async def _periodic(func, interval: float, *args: Any) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, func, *args)
+            except Exception:
+                logger.exception(f"Periodic job {getattr(func, 'name', func.__qualname__)} failed")
+
+    @classmethod
+    def recover(cls, min_age: int) -> None:
+        """Возвращает в очередь нераспределенные заявки старше min_age секунд"""
+        from .tasks import get_pending_requests
+
+        older_than = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=min_age)
+        for request in get_pending_requests(settings.DISPATCH_BATCH_SIZE, older_than):
+            cls.put(str(request.id), request.priority)
+
+    @staticmethod
+    def dispatch(request_id: str) -> Optional[str]:
+        """Распределяет одну заявку так же, как dispatch_request, без перекладывания между очередями"""
+        from .affinity import ExecutorAffinity
+        from .tasks import choose_executor, commit_assignment, load_for_dispatch
+
+        request, dispatched_to = load_for_dispatch(request_id)
+        if request is None:
+            return dispatched_to
+
+        params = request.params or {}
+        shard = shard_for_request(params)
+        parent_id = ExecutorAffinity.parent_of(request)
+        candidate = choose_executor(params, shard=shard, exclude=request.excluded_users, parent_id=parent_id)
+        if candidate is None and shard is not None:
+            candidate = choose_executor(params, exclude=request.excluded_users, parent_id=parent_id)
+        if candidate is None:
+            logger.error(f"No available users found for request {request_id}")
+            return None
+        return commit_assignment(request, candidate, uuid.uuid4())
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {"running": cls.is_running(), "queued": cls.size()}
@@ -1,15 +1,17 @@
 from typing import Dict
-from django.core.cache import cache
+from django_redis import get_redis_connection
 import datetime
-import time
 
 
 class RequestCounter:
     """Класс для подсчета количества запросов"""
     COUNTS_CACHE_KEY = "daily_request_counts"
+    SYNC_KEY = "daily_request_counts:synced"
     COUNTS_CACHE_TIMEOUT = 24 * 60 * 60
     UPDATE_INTERVAL = 60
-    _last_db_update = 0
+    FAST_RESYNC_INTERVAL = 5
+    # Поле-маркер: пустой день не отличается от отсутствующего хеша без него
+    SENTINEL = "-"
 
     @classmethod
     def get_counts_from_db(cls) -> Dict[str, int]:
@@ -43,26 +45,47 @@ class RequestCounter:
         ]
 
         counts = {}
-        for result in Request.objects.aggregate(pipeline, allowDiskUse=True):
+        for result in Request._get_collection().aggregate(pipeline, allowDiskUse=True):
             counts[str(result["_id"])] = result["count"]
         return counts
 
+    @staticmethod
+    def _redis():
+        return get_redis_connection("default")
+
     @classmethod
     def get_request_counts(cls, force_db_read: bool = False) -> Dict[str, int]:
-        current_time = time.time()
-
-        if not force_db_read:
-            counts = cache.get(cls.COUNTS_CACHE_KEY)
-            if counts is not None and (current_time - cls._last_db_update) < cls.UPDATE_INTERVAL:
-                return counts
+        """
+        Счетчики за день из Redis-хеша. Раз в UPDATE_INTERVAL один из процессов
+        (захвативший ключ SYNC_KEY) пересчитывает их по базе.
+        """
+        client = cls._redis()
+        if not force_db_read and not client.set(cls.SYNC_KEY, 1, nx=True, ex=cls.UPDATE_INTERVAL):
+            raw = client.hgetall(cls.COUNTS_CACHE_KEY)
+            if raw:
+                return {k.decode(): int(v) for k, v in raw.items() if k.decode() != cls.SENTINEL}
 
         counts = cls.get_counts_from_db()
-        cache.set(cls.COUNTS_CACHE_KEY, counts, cls.COUNTS_CACHE_TIMEOUT)
-        cls._last_db_update = current_time
+        pipe = client.pipeline()
+        pipe.delete(cls.COUNTS_CACHE_KEY)
+        pipe.hset(cls.COUNTS_CACHE_KEY, mapping={cls.SENTINEL: 0, **counts})
+        pipe.expire(cls.COUNTS_CACHE_KEY, cls.COUNTS_CACHE_TIMEOUT)
+        pipe.execute()
         return counts
 
     @classmethod
-    def increment_count(cls, user_id: str) -> None:
-        counts = cls.get_request_counts()
-        counts[user_id] = counts.get(user_id, 0) + 1
-        cache.set(cls.COUNTS_CACHE_KEY, counts, cls.COUNTS_CACHE_TIMEOUT)
\ No newline at end of file
+    def schedule_resync(cls) -> None:
+        """Сокращает время до пересчета по базе до FAST_RESYNC_INTERVAL (статусы заявок изменились)"""
+        client = cls._redis()
+        ttl = client.ttl(cls.SYNC_KEY)
+        if ttl > cls.FAST_RESYNC_INTERVAL:
+            client.expire(cls.SYNC_KEY, cls.FAST_RESYNC_INTERVAL)
+
+    @classmethod
+    def increment_count(cls, user_id: str, pipe=None) -> None:
+        """HINCRBY счетчика исполнителя; с pipe команда только добавляется в него"""
+        target = pipe if pipe is not None else cls._redis().pipeline(transaction=False)
+        target.hincrby(cls.COUNTS_CACHE_KEY, user_id, 1)
+        target.expire(cls.COUNTS_CACHE_KEY, cls.COUNTS_CACHE_TIMEOUT)
+        if pipe is None:
+            target.execute()
@@ -0,0 +1,148 @@
+import datetime
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from .models import DispatchLogs
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[bytes, Dict[bytes, bytes]]
+
+
+class DispatchLogBuffer:
+    """
+    Отложенная запись логов распределения через Redis stream.
+    commit_assignment добавляет запись в stream (XADD) вместо вставки в Mongo; flush читает
+    stream через consumer group и пишет пачки insert_many. Запись подтверждается (XACK) только
+    после вставки, а зависшие у упавшего процесса записи забираются XAUTOCLAIM, поэтому доставка
+    at-least-once; повторы отсекаются по task_id предварительным запросом, т.к. в time-series
+    коллекции нельзя завести уникальный индекс.
+    """
+    STREAM_KEY = "dispatch_logs:stream"
+    GROUP = "dispatch_logs_flush"
+    FLUSH_SCHEDULED_KEY = "dispatch_logs:flush_scheduled"
+    CLAIM_IDLE_MS = 60 * 1000
+    MAX_BATCHES = 100
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection("default")
+
+    @staticmethod
+    def _consumer() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @classmethod
+    def append(cls, request_id: str, user_id: str, task_id: uuid.UUID, parent_id: Optional[str],
+               request_created_at: datetime.datetime, pipe=None) -> bool:
+        """
+        Добавляет лог в буфер; при выключенном DISPATCH_LOG_BUFFER пишет сразу в Mongo.
+        С pipe команды XADD и XLEN только добавляются в него (XLEN - последней), и после
+        выполнения вызывающий передает её результат в schedule_flush.
+        Возвращает True, если лог ушел в буфер.
+        """
+        if not settings.DISPATCH_LOG_BUFFER:
+            DispatchLogs.objects.create(
+                request_id=request_id,
+                user_id=user_id,
+                task_id=task_id,
+                parent_id=parent_id,
+                request_created_at=request_created_at,
+            )
+            return False
+
+        target = pipe if pipe is not None else cls._redis().pipeline(transaction=False)
+        target.xadd(cls.STREAM_KEY, {
+            "request_id": request_id,
+            "user_id": user_id,
+            "task_id": str(task_id),
+            "parent_id": parent_id or "",
+            "request_created_at": request_created_at.isoformat(),
+            "request_updated_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        })
+        target.xlen(cls.STREAM_KEY)
+        if pipe is None:
+            cls.schedule_flush(target.execute()[-1])
+        return True
+
+    @classmethod
+    def schedule_flush(cls, length: int) -> None:
+        """Запускает перенос буфера, если он дорос до DISPATCH_LOG_FLUSH_SIZE"""
+        if length >= settings.DISPATCH_LOG_FLUSH_SIZE and cache.add(
+            cls.FLUSH_SCHEDULED_KEY, 1, settings.DISPATCH_LOG_FLUSH_INTERVAL
+        ):
+            from .tasks import flush_dispatch_logs, send_task
+
+            send_task(flush_dispatch_logs)
+
+    @staticmethod
+    def _decode(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        data = {key.decode(): value.decode() for key, value in fields.items()}
+        return {
+            "request_id": data["request_id"],
+            "user_id": data["user_id"],
+            "task_id": data["task_id"],
+            "parent_id": data["parent_id"] or None,
+            "request_created_at": datetime.datetime.fromisoformat(data["request_created_at"]),
+            "request_updated_at": datetime.datetime.fromisoformat(data["request_updated_at"]),
+        }
+
+    @classmethod
+    def _store(cls, client, entries: List[Entry]) -> int:
+        """Вставляет ещё не записанные логи пачки и подтверждает всю пачку"""
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            return 0
+
+        docs = {}
+        for _, fields in entries:
+            doc = cls._decode(fields)
+            docs.setdefault(doc["task_id"], doc)
+        collection = DispatchLogs._get_collection()
+        for raw in collection.find({"task_id": {"$in": list(docs)}}, {"task_id": 1}):
+            docs.pop(raw["task_id"], None)
+        if docs:
+            collection.insert_many(list(docs.values()), ordered=False)
+
+        entry_ids = [entry_id for entry_id, _ in entries]
+        pipe = client.pipeline(transaction=False)
+        pipe.xack(cls.STREAM_KEY, cls.GROUP, *entry_ids)
+        pipe.xdel(cls.STREAM_KEY, *entry_ids)
+        pipe.execute()
+        return len(docs)
+
+    @classmethod
+    def flush(cls) -> int:
+        """Переносит накопленные логи в Mongo; возвращает число вставленных"""
+        client = cls._redis()
+        try:
+            client.xgroup_create(cls.STREAM_KEY, cls.GROUP, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+        consumer = cls._consumer()
+        batch_size = settings.DISPATCH_LOG_FLUSH_SIZE
+        claimed = client.xautoclaim(
+            cls.STREAM_KEY, cls.GROUP, consumer, cls.CLAIM_IDLE_MS, "0-0", count=batch_size
+        )
+        stored = cls._store(client, claimed[1])
+
+        for _ in range(cls.MAX_BATCHES):
+            response = client.xreadgroup(cls.GROUP, consumer, {cls.STREAM_KEY: ">"}, count=batch_size)
+            if not response:
+                break
+            stored += cls._store(client, response[0][1])
+
+        cache.delete(cls.FLUSH_SCHEDULED_KEY)
+        if stored:
+            logger.info(f"Flushed {stored} dispatch logs")
+        return stored
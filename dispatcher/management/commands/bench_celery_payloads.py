@@ -0,0 +1,96 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from kombu.compression import compress, decompress
+from kombu.serialization import dumps, loads, prepare_accept_content
+
+from executor_balancer.celery import app
+
+# (сериализатор, сжатие): None - без сжатия, "threshold" - как PolicyTask, по размеру аргументов
+POLICIES = (
+    ("json", "gzip"),
+    ("json", None),
+    ("json", "threshold"),
+    ("msgpack", None),
+    ("msgpack", "threshold"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает политики сериализации и сжатия сообщений Celery: размер и время кодирования "
+        "типичных сообщений, с --broker - пропускную способность публикации и чтения через брокер"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=10000, help="Число сообщений на политику")
+        parser.add_argument("--threshold", type=int, default=1024, help="Порог сжатия, байт")
+        parser.add_argument("--broker", action="store_true", help="Прогнать сообщения через брокер")
+
+    @staticmethod
+    def payloads():
+        """Тела сообщений протокола 2 (args, kwargs, embed) для типичных задач"""
+        embed = {"callbacks": None, "errbacks": None, "chain": None, "chord": None}
+        ids = [uuid.uuid4().hex[:24] for _ in range(500)]
+        return (
+            ("dispatch_request", ((ids[0],), {"shard": "eu"}, embed)),
+            ("redispatch_requests", ((ids,), {}, embed)),
+        )
+
+    @staticmethod
+    def resolve(data: bytes, compression, threshold):
+        if compression == "threshold":
+            return "gzip" if len(data) >= threshold else None
+        return compression
+
+    @classmethod
+    def roundtrip(cls, body, serializer, compression, threshold, accept) -> int:
+        """Кодирует и декодирует тело так же, как продюсер и воркер; возвращает размер сообщения"""
+        content_type, encoding, data = dumps(body, serializer)
+        compression = cls.resolve(data, compression, threshold)
+        if compression:
+            data, compressed_type = compress(data, compression)
+            size = len(data)
+            data = decompress(data, compressed_type)
+        else:
+            size = len(data)
+        loads(data, content_type, encoding, accept=accept)
+        return size
+
+    def handle(self, *args, **options):
+        n = options["messages"]
+        accept = prepare_accept_content(app.conf.accept_content)
+        self.stdout.write(f"{'payload':>20} | {'policy':>17} | {'bytes':>6} | {'encode+decode us':>16}")
+        for name, body in self.payloads():
+            for serializer, compression in POLICIES:
+                started = time.perf_counter()
+                for _ in range(n):
+                    size = self.roundtrip(body, serializer, compression, options["threshold"], accept)
+                per_message = (time.perf_counter() - started) / n * 1e6
+                policy = f"{serializer}+{compression or 'none'}"
+                self.stdout.write(f"{name:>20} | {policy:>17} | {size:>6} | {per_message:>16.1f}")
+
+        if options["broker"]:
+            self.bench_broker(n, options["threshold"])
+
+    def bench_broker(self, n, threshold):
+        """Публикация и чтение n сообщений через временную очередь брокера для каждой политики"""
+        self.stdout.write(f"\n{'payload':>20} | {'policy':>17} | {'msg/s':>8}")
+        with app.connection_for_write() as connection:
+            for name, body in self.payloads():
+                for serializer, compression in POLICIES:
+                    queue = connection.SimpleQueue(f"bench_celery_payloads_{uuid.uuid4().hex[:8]}", no_ack=True)
+                    try:
+                        used = self.resolve(dumps(body, serializer)[2], compression, threshold)
+                        started = time.perf_counter()
+                        for _ in range(n):
+                            queue.put(body, serializer=serializer, compression=used)
+                        for _ in range(n):
+                            queue.get(block=True, timeout=10).payload
+                        rate = n / (time.perf_counter() - started)
+                    finally:
+                        queue.queue.delete()
+                        queue.close()
+                    policy = f"{serializer}+{compression or 'none'}"
+                    self.stdout.write(f"{name:>20} | {policy:>17} | {rate:>8.0f}")
@@ -0,0 +1,101 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from dispatcher.columnar import ExecutorRecord
+from dispatcher.parallel import ParallelScorer
+from dispatcher.score_cache import StaticScoreCache
+from dispatcher.strategies import WeightedScoreStrategy
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает однопоточный скоринг weighted_score без кэша, с кэшем оценок (StaticScoreCache) "
+        "и ParallelScorer на синтетических снимках"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,5000,20000,50000,100000",
+                            help="Размеры снимков через запятую")
+        parser.add_argument("--workers", type=int, default=0, help="Число процессов пула (0 - по числу CPU)")
+        parser.add_argument("--repeat", type=int, default=5, help="Число прогонов каждого варианта")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+        request_params = {
+            "region": {"value": "r3", "mandatory": True, "height": 3.0},
+            "level": {"value": 2, "operator": "GTE", "height": 1.0},
+            "skill": {"value": "python", "operator": "ICONTAINS", "height": 1.0},
+        }
+
+        with override_settings(PARALLEL_SCORING_WORKERS=options["workers"]):
+            workers = ParallelScorer.workers()
+            self.stdout.write(f"Процессов пула: {workers}")
+            self.stdout.write(
+                f"{'executors':>9} | {'single ms':>10} | {'cached ms':>10} | {'parallel ms':>11} | {'speedup':>7}"
+            )
+            crossover = None
+            try:
+                for size in sizes:
+                    executors = [
+                        ExecutorRecord(
+                            f"{i:024x}",
+                            f"user{i}",
+                            rng.choice((None, 50, 100)),
+                            {"region": f"r{rng.randrange(10)}", "level": rng.randrange(5),
+                             "skill": rng.choice(("python", "go", "java, python"))},
+                        )
+                        for i in range(size)
+                    ]
+                    daily_counts = {e.id: rng.randrange(60) for e in executors[::3]}
+                    strategy = WeightedScoreStrategy()
+
+                    with override_settings(SCORE_CACHE_ENABLED=False):
+                        single_ms, expected = self._measure(
+                            lambda: strategy.select(executors, request_params, daily_counts), options["repeat"]
+                        )
+                    # Первый вызов заполняет кэш оценок - в замер не входит
+                    StaticScoreCache.clear()
+                    strategy.select(executors, request_params, daily_counts)
+                    cached_ms, cached = self._measure(
+                        lambda: strategy.select(executors, request_params, daily_counts), options["repeat"]
+                    )
+                    if (expected and expected.user_id) != (cached and cached.user_id):
+                        self.stderr.write(f"{size}: результаты с кэшем оценок различаются")
+                    # Первый вызов публикует снимок и поднимает пул - в замер не входит
+                    ParallelScorer.select(executors, request_params, daily_counts)
+                    parallel_ms, actual = self._measure(
+                        lambda: ParallelScorer.select(executors, request_params, daily_counts), options["repeat"]
+                    )
+                    if (expected and expected.user_id) != (actual and actual.user_id):
+                        self.stderr.write(f"{size}: результаты различаются")
+
+                    # Процессы пула тоже кэшируют оценки, поэтому сравнивается с однопоточным скорингом с кэшем
+                    speedup = cached_ms / parallel_ms if parallel_ms else 0.0
+                    if crossover is None and speedup > 1:
+                        crossover = size
+                    self.stdout.write(
+                        f"{size:>9} | {single_ms:>10.2f} | {cached_ms:>10.2f} | {parallel_ms:>11.2f} | {speedup:>7.2f}"
+                    )
+            finally:
+                ParallelScorer.shutdown()
+
+        if crossover is None:
+            self.stdout.write("Параллельный скоринг не быстрее ни на одном размере")
+        else:
+            self.stdout.write(f"Параллельный скоринг выгоднее с {crossover} исполнителей (PARALLEL_SCORING_MIN_EXECUTORS)")
+
+    @staticmethod
+    def _measure(func, repeat):
+        """Минимальное время (wall clock) за repeat прогонов и результат последнего"""
+        best = float("inf")
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000, result
@@ -0,0 +1,83 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import ASCENDING
+from pymongo.errors import CollectionInvalid
+
+from dispatcher.models import DispatchLogs
+
+
+class Command(BaseCommand):
+    help = (
+        "Переводит dispatch_logs в time-series коллекцию: текущая коллекция переименовывается, "
+        "создается time-series dispatch_logs и данные копируются пачками. "
+        "Перед запуском остановите воркеры распределения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Размер пачки копирования")
+        parser.add_argument(
+            "--drop-legacy", action="store_true", help="Удалить старую коллекцию после успешного копирования"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DISPATCH_LOGS_TIMESERIES:
+            raise CommandError("Включите DISPATCH_LOGS_TIMESERIES перед конвертацией")
+
+        db = DispatchLogs._get_db()
+        name = DispatchLogs._get_collection_name()
+        collection_options = db[name].options() if name in db.list_collection_names() else None
+        if collection_options and "timeseries" in collection_options:
+            self.stdout.write("dispatch_logs уже time-series коллекция")
+            return
+
+        legacy_name = None
+        if collection_options is not None:
+            legacy_name = f"{name}_legacy_{datetime.datetime.now(datetime.UTC):%Y%m%d%H%M%S}"
+            db[name].rename(legacy_name)
+            self.stdout.write(f"Коллекция {name} переименована в {legacy_name}")
+
+        try:
+            db.create_collection(
+                name,
+                timeseries={
+                    "timeField": "request_created_at",
+                    "metaField": "user_id",
+                    "granularity": settings.DISPATCH_LOGS_GRANULARITY,
+                },
+            )
+        except CollectionInvalid:
+            raise CommandError(
+                f"{name} была создана заново во время конвертации (работают воркеры?); "
+                f"данные остались в {legacy_name}"
+            )
+        DispatchLogs._collection = None
+        DispatchLogs._get_collection()
+
+        if legacy_name is None:
+            self.stdout.write("Создана пустая time-series коллекция")
+            return
+
+        copied = 0
+        batch = []
+        target = db[name]
+        # Сортировка по времени: соседние документы попадают в одни бакеты
+        for doc in db[legacy_name].find({"request_created_at": {"$type": "date"}}).sort(
+            "request_created_at", ASCENDING
+        ):
+            batch.append(doc)
+            if len(batch) >= options["batch_size"]:
+                target.insert_many(batch, ordered=False)
+                copied += len(batch)
+                batch = []
+        if batch:
+            target.insert_many(batch, ordered=False)
+            copied += len(batch)
+
+        skipped = db[legacy_name].count_documents({"request_created_at": {"$not": {"$type": "date"}}})
+        self.stdout.write(f"Скопировано логов: {copied}, пропущено без request_created_at: {skipped}")
+
+        if options["drop_legacy"] and not skipped:
+            db[legacy_name].drop()
+            self.stdout.write(f"Коллекция {legacy_name} удалена")
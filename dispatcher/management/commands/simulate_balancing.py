@@ -0,0 +1,48 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dispatcher.simulator import DispatchSimulator
+from dispatcher.strategies import STRATEGIES
+
+
+class Command(BaseCommand):
+    help = "Прогоняет историю распределений через стратегии балансировки и сравнивает их"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--strategies", nargs="+", default=sorted(STRATEGIES),
+            help="Стратегии для сравнения (по умолчанию все зарегистрированные)",
+        )
+        parser.add_argument("--start-date", help="Начальная дата в формате YYYY-MM-DD")
+        parser.add_argument("--end-date", help="Конечная дата в формате YYYY-MM-DD")
+        parser.add_argument("--min-score-fraction", type=float, default=0.7)
+
+    def handle(self, *args, **options):
+        try:
+            start_date = self._parse_date(options["start_date"])
+            end_date = self._parse_date(options["end_date"])
+        except ValueError:
+            raise CommandError("Неверный формат даты. Используйте YYYY-MM-DD.")
+
+        unknown = set(options["strategies"]) - set(STRATEGIES)
+        if unknown:
+            raise CommandError(f"Неизвестные стратегии: {', '.join(sorted(unknown))}")
+
+        simulator = DispatchSimulator(start_date, end_date, options["min_score_fraction"])
+        simulator.load_history()
+        self.stdout.write(
+            f"Заявок в истории: {len(simulator.history)}, исполнителей: {len(simulator.executors)}"
+        )
+
+        columns = ("strategy", "decisions", "unassigned", "throughput", "fairness", "agreement", "max", "min")
+        self.stdout.write(" | ".join(f"{c:>17}" for c in columns))
+        for name in options["strategies"]:
+            row = simulator.run(name).as_dict()
+            self.stdout.write(" | ".join(f"{str(row[c]):>17}" for c in columns))
+
+    @staticmethod
+    def _parse_date(value):
+        if not value:
+            return None
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
@@ -0,0 +1,62 @@
+from typing import Dict
+
+from django_redis import get_redis_connection
+
+
+class QueueWaitHistogram:
+    """Гистограммы времени ожидания заявок в очереди по классам приоритета (в Redis)"""
+    CACHE_KEY = "queue_wait:{}"
+    BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+    PRIORITY_CLASSES = ("high", "normal", "low")
+
+    @staticmethod
+    def priority_class(priority: int) -> str:
+        if priority >= 7:
+            return "high"
+        if priority >= 3:
+            return "normal"
+        return "low"
+
+    @classmethod
+    def bucket_for(cls, seconds: float) -> str:
+        for bound in cls.BUCKETS:
+            if seconds <= bound:
+                return str(bound)
+        return "+Inf"
+
+    @classmethod
+    def observe(cls, priority: int, seconds: float, pipe=None) -> None:
+        """Учитывает время ожидания одной заявки; с pipe команды только добавляются в него"""
+        key = cls.CACHE_KEY.format(cls.priority_class(priority or 0))
+        target = pipe if pipe is not None else get_redis_connection("default").pipeline(transaction=False)
+        target.hincrby(key, cls.bucket_for(seconds), 1)
+        target.hincrby(key, "count", 1)
+        target.hincrbyfloat(key, "sum", max(seconds, 0.0))
+        if pipe is None:
+            target.execute()
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict]:
+        """Кумулятивные гистограммы по всем классам приоритета"""
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for priority_class in cls.PRIORITY_CLASSES:
+            pipe.hgetall(cls.CACHE_KEY.format(priority_class))
+
+        result = {}
+        for priority_class, raw in zip(cls.PRIORITY_CLASSES, pipe.execute()):
+            data = {k.decode(): v.decode() for k, v in raw.items()}
+            count = int(data.get("count", 0))
+            total = float(data.get("sum", 0.0))
+
+            cumulative = 0
+            buckets = {}
+            for bound in [str(b) for b in cls.BUCKETS] + ["+Inf"]:
+                cumulative += int(data.get(bound, 0))
+                buckets[bound] = cumulative
+
+            result[priority_class] = {
+                "count": count,
+                "avg_seconds": round(total / count, 3) if count else 0.0,
+                "buckets": buckets,
+            }
+        return result
@@ -1,6 +1,7 @@
 import datetime
 import uuid
 
+from django.conf import settings
 from mongoengine import (
     Document,
     StringField,
@@ -9,9 +10,28 @@ from mongoengine import (
 )
 
 
+def _dispatch_logs_meta():
+    meta = {
+        "collection": "dispatch_logs",
+        "ordering": ["-request_created_at"],
+        "indexes": ["request_created_at", "task_id"],
+        "verbose_name": "Лог отправки",
+        "verbose_name_plural": "Логи отправок",
+    }
+    if settings.DISPATCH_LOGS_TIMESERIES:
+        meta["timeseries"] = {
+            "timeField": "request_created_at",
+            "metaField": "user_id",
+            "granularity": settings.DISPATCH_LOGS_GRANULARITY,
+        }
+    return meta
+
+
 class DispatchLogs(Document):
     """
-    Логи выполнения задач
+    Логи выполнения задач.
+    При DISPATCH_LOGS_TIMESERIES коллекция создается как time-series
+    (timeField - request_created_at, metaField - user_id).
     """
 
     request_id = StringField(required=True)
@@ -21,12 +41,7 @@ class DispatchLogs(Document):
     request_created_at = DateTimeField(default=datetime.datetime.now(datetime.UTC))
     request_updated_at = DateTimeField(default=datetime.datetime.now(datetime.UTC))
 
-    meta = {
-        "collection": "dispatch_logs",
-        "ordering": ["-request_created_at"],
-        "verbose_name": "Лог отправки",
-        "verbose_name_plural": "Логи отправок",
-    }
+    meta = _dispatch_logs_meta()
 
     def save(self, *args, **kwargs):
         """Обновляем время модификации при сохранении."""
@@ -40,11 +55,16 @@ class DispatchLogs(Document):
     def daily_summary(cls, start_date=None, end_date=None):
         """
         Возвращает агрегированные данные: сумму (количество) заявок по дням.
-        Группирует по request_created_at (по дням в формате YYYY-MM-DD).
+        Группирует по request_created_at, усеченному до дня ($dateTrunc); фильтр по диапазону
+        time-series коллекция отрабатывает по границам бакетов.
         Опционально фильтрует по start_date и end_date (datetime.date объекты).
 
+        Дни, перенесенные в архив, берутся из дневных итогов архива.
+
         Возвращает список словарей: [{'date': 'YYYY-MM-DD', 'count': N}, ...]
         """
+        from .archive import HistoryArchive
+
         pipeline = []
 
         match_stage = {}
@@ -61,22 +81,18 @@ class DispatchLogs(Document):
             [
                 {
                     "$group": {
-                        "_id": {
-                            "$dateToString": {
-                                "format": "%Y-%m-%d",
-                                "date": "$request_created_at",
-                            }
-                        },
+                        "_id": {"$dateTrunc": {"date": "$request_created_at", "unit": "day"}},
                         "count": {"$sum": 1},
                     }
                 },
-                {"$sort": {"_id": 1}},
             ]
         )
 
-        results = list(cls.objects.aggregate(*pipeline))
-
-        for item in results:
-            item['date'] = item.pop('_id')
+        counts = HistoryArchive.daily_rollups(start_date, end_date)
+        for item in cls._get_collection().aggregate(pipeline):
+            if item["_id"] is None:
+                continue
+            date = item["_id"].strftime("%Y-%m-%d")
+            counts[date] = counts.get(date, 0) + item["count"]
 
-        return results
\ No newline at end of file
+        return [{"date": date, "count": count} for date, count in sorted(counts.items())]
\ No newline at end of file
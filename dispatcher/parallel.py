@@ -0,0 +1,212 @@
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .candidate_info import CandidateInfo
+from .columnar import ExecutorColumns, ExecutorRecord
+
+logger = logging.getLogger(__name__)
+
+# Состояние процесса пула: подключенные сегменты и разобранный снимок текущей версии
+_worker_state: Dict[str, Any] = {}
+MAX_SNAPSHOTS = 8
+
+Published = Tuple[List[ExecutorRecord], shared_memory.SharedMemory, int, shared_memory.SharedMemory]
+
+
+def _init_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Сегментом владеет родитель: процессы пула созданы им и делят его resource tracker,
+    # поэтому подключение не добавляет своей регистрации и сегмент удаляет только родитель
+    return shared_memory.SharedMemory(name=name)
+
+
+def _worker_records(snapshot_name: str, size: int) -> List[ExecutorRecord]:
+    segments = _worker_state.setdefault("segments", {})
+    if snapshot_name not in segments:
+        segment = _attach(snapshot_name)
+        segments[snapshot_name] = ExecutorColumns.unpack(bytes(segment.buf[:size])).to_records()
+        segment.close()
+        # Держим разобранными только последние версии снимков (по одной на шард)
+        while len(segments) > MAX_SNAPSHOTS:
+            segments.pop(next(iter(segments)))
+    return segments[snapshot_name]
+
+
+def _worker_counts(counts_name: str, start: int, end: int) -> List[int]:
+    counts = _worker_state.setdefault("counts", {})
+    if counts_name not in counts:
+        counts[counts_name] = _attach(counts_name)
+        while len(counts) > MAX_SNAPSHOTS:
+            counts.pop(next(iter(counts))).close()
+    view = counts[counts_name].buf.cast("q")
+    part = view[start:end]
+    try:
+        return part.tolist()
+    finally:
+        part.release()
+        view.release()
+
+
+def score_range(snapshot_name: str, size: int, counts_name: str, start: int, end: int,
+                request_params: Dict[str, Dict[str, Any]], min_score_fraction: float,
+                excluded: Sequence[str], top_k: int) -> List[CandidateInfo]:
+    """Задача процесса пула: локальный top-K кандидатов в диапазоне [start, end) снимка"""
+    from .strategies import WeightedScoreStrategy
+
+    records = _worker_records(snapshot_name, size)[start:end]
+    daily_counts = {record.id: count for record, count in zip(records, _worker_counts(counts_name, start, end))}
+    excluded_ids = set(excluded)
+    if excluded_ids:
+        records = [record for record in records if record.id not in excluded_ids]
+    candidates = WeightedScoreStrategy(min_score_fraction).score_all(records, request_params, daily_counts)
+    return heapq.nsmallest(top_k, candidates)
+
+
+class ParallelScorer:
+    """
+    Параллельный скоринг weighted_score по снимку исполнителей в постоянном пуле процессов.
+
+    Снимок кладется в shared memory колоночным msgpack-blob'ом один раз на версию снимка,
+    дневные счетчики - массивом int64 в порядке снимка на каждый вызов, поэтому в задачи
+    передаются только имена сегментов, границы диапазона и параметры заявки. Каждый процесс
+    возвращает локальный top-K, результаты сливаются в родителе.
+
+    Используется при PARALLEL_SCORING и размере снимка от PARALLEL_SCORING_MIN_EXECUTORS;
+    внутри демонических процессов (дочерние процессы prefork-пула Celery) дочерние процессы
+    создавать нельзя, там скоринг остается однопоточным. Воркер распределения с параллельным
+    скорингом запускается с пулом solo или threads (-P solo / -P threads); на prefork воркер
+    один раз предупреждает при старте (warn_if_unusable).
+    """
+    _pool: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+    _published: Dict[Optional[str], Published] = {}
+
+    @staticmethod
+    def workers() -> int:
+        return settings.PARALLEL_SCORING_WORKERS or os.cpu_count() or 1
+
+    @classmethod
+    def available(cls) -> bool:
+        return not multiprocessing.current_process().daemon and cls.workers() > 1
+
+    @classmethod
+    def unusable_reason(cls, pool_cls=None) -> Optional[str]:
+        """Почему включенный PARALLEL_SCORING не сработает в воркере с пулом pool_cls; None - сработает"""
+        from celery.concurrency.prefork import TaskPool as PreforkPool
+
+        if not settings.PARALLEL_SCORING:
+            return None
+        if cls.workers() <= 1:
+            return "only one scoring process is configured (PARALLEL_SCORING_WORKERS or CPU count)"
+        if isinstance(pool_cls, type) and issubclass(pool_cls, PreforkPool):
+            return "prefork pool children are daemonic and cannot start processes, use -P solo or -P threads"
+        if multiprocessing.current_process().daemon:
+            return "the process is daemonic and cannot start processes"
+        return None
+
+    @classmethod
+    def warn_if_unusable(cls, pool_cls=None) -> None:
+        reason = cls.unusable_reason(pool_cls)
+        if reason is not None:
+            logger.warning(f"PARALLEL_SCORING is enabled but scoring stays single-process: {reason}")
+
+    @classmethod
+    def applies(cls, strategy, executors: Sequence) -> bool:
+        return (
+            settings.PARALLEL_SCORING
+            and strategy.name == "weighted_score"
+            and len(executors) >= settings.PARALLEL_SCORING_MIN_EXECUTORS
+            and cls.available()
+        )
+
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(
+                max_workers=cls.workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return cls._pool
+
+    @staticmethod
+    def _release(published: Published) -> None:
+        for segment in (published[1], published[3]):
+            segment.close()
+            segment.unlink()
+
+    @classmethod
+    def _publish(cls, shard: Optional[str], executors: List[ExecutorRecord]) -> Published:
+        """Кладет снимок шарда в shared memory, если он сменился с прошлого вызова"""
+        published = cls._published.get(shard)
+        if published is not None and published[0] is executors:
+            return published
+
+        blob = ExecutorColumns.from_records(executors, 0).pack()
+        snapshot = shared_memory.SharedMemory(create=True, size=len(blob))
+        snapshot.buf[:len(blob)] = blob
+        counts = shared_memory.SharedMemory(create=True, size=max(len(executors), 1) * 8)
+        if published is not None:
+            cls._release(published)
+        cls._published[shard] = (executors, snapshot, len(blob), counts)
+        logger.debug(f"Published executor snapshot ({len(executors)} executors, {len(blob)} bytes) to {snapshot.name}")
+        return cls._published[shard]
+
+    @classmethod
+    def top_k(cls, executors: List[ExecutorRecord], request_params: Dict[str, Dict[str, Any]],
+              daily_counts: Dict[str, int], min_score_fraction: float = 0.7,
+              exclude: Iterable[str] = (), k: int = 1, shard: Optional[str] = None) -> List[CandidateInfo]:
+        """Лучшие k кандидатов по всему снимку шарда"""
+        if not executors:
+            return []
+        with cls._lock:
+            _, snapshot, size, counts = cls._publish(shard, executors)
+            view = counts.buf.cast("q")
+            try:
+                for i, executor in enumerate(executors):
+                    view[i] = daily_counts.get(executor.id, 0)
+            finally:
+                view.release()
+
+            pool = cls._get_pool()
+            step = -(-len(executors) // cls.workers())
+            excluded = list(exclude)
+            futures = [
+                pool.submit(
+                    score_range, snapshot.name, size, counts.name, start, min(start + step, len(executors)),
+                    request_params, min_score_fraction, excluded, k,
+                )
+                for start in range(0, len(executors), step)
+            ]
+            # Диапазоны идут по порядку снимка, поэтому при равенстве нагрузки выбор совпадает с min()
+            return heapq.nsmallest(k, (c for future in futures for c in future.result()))
+
+    @classmethod
+    def select(cls, executors: List[ExecutorRecord], request_params: Dict[str, Dict[str, Any]],
+               daily_counts: Dict[str, int], min_score_fraction: float = 0.7,
+               exclude: Iterable[str] = (), shard: Optional[str] = None) -> Optional[CandidateInfo]:
+        best = cls.top_k(executors, request_params, daily_counts, min_score_fraction, exclude, 1, shard)
+        return best[0] if best else None
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(cancel_futures=True)
+                cls._pool = None
+            for published in cls._published.values():
+                cls._release(published)
+            cls._published.clear()
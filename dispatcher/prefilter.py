@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from .scoring import ParameterMatcher
+
+# Ни один исполнитель не может пройти порог - запрос в Mongo не нужен
+NO_MATCH: Dict[str, Any] = {"_id": {"$exists": False}}
+
+MONGO_OPERATORS = {"NE": "$ne", "GT": "$gt", "LT": "$lt", "GTE": "$gte", "LTE": "$lte"}
+
+
+def _eq_values(value: Any) -> List[Any]:
+    """
+    Значения, равные value в python-сравнении: в Mongo bool и числа - разные типы,
+    а в python True == 1 == 1.0.
+    """
+    values = [value]
+    if isinstance(value, bool):
+        values.append(int(value))
+    elif isinstance(value, (int, float)) and value in (0, 1):
+        values.append(bool(value))
+    return values
+
+
+def condition_filter(key: str, condition: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """$elemMatch по params_kv для одного условия; None - условие не может совпасть (ICONTAINS и т.п.)"""
+    value = ParameterMatcher.normalize_value(condition.get("value"))
+    operator = condition.get("operator", "EQ")
+    if value is None:
+        return None
+    if operator == "EQ":
+        match = {"$in": _eq_values(value)}
+    elif operator in MONGO_OPERATORS:
+        match = {MONGO_OPERATORS[operator]: value}
+    else:
+        return None
+    return {"params_kv": {"$elemMatch": {"k": key, "v": match}}}
+
+
+def build_prefilter(request_params: Dict[str, Dict[str, Any]], min_score_fraction: float) -> Optional[Dict[str, Any]]:
+    """
+    Серверный фильтр исполнителей, которые могут пройти порог min_score_fraction.
+    Исполнитель без совпадения условия с весом больше (1 - порог) доли суммы весов
+    не может стать подходящим, поэтому такие условия обязательны ($and); если обязательных нет,
+    достаточно совпадения хотя бы одного условия ($or).
+    None - фильтр не нужен (нет условий, нулевые веса), NO_MATCH - подходящих быть не может.
+    """
+    conditions = [(key, c) for key, c in request_params.items() if isinstance(c, dict)]
+    weights = {key: float(c.get("height", 1.0)) for key, c in conditions}
+    total = sum(weights.values())
+    if not conditions or total <= 0 or min_score_fraction <= 0:
+        return None
+
+    mandatory = [key for key, _ in conditions if total - weights[key] < min_score_fraction * total]
+    filters = {key: condition_filter(key, c) for key, c in conditions if weights[key] > 0}
+    if mandatory:
+        required = [filters.get(key) for key in mandatory]
+        if any(f is None for f in required):
+            return NO_MATCH
+        return {"$and": required}
+
+    options = [f for f in filters.values() if f is not None]
+    if not options:
+        return NO_MATCH
+    return {"$or": options}
+
+
+def is_enabled() -> bool:
+    return settings.PARAMS_ATTRIBUTE_PATTERN
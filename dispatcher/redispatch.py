@@ -0,0 +1,125 @@
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from django.conf import settings
+
+from core.models import Request
+
+logger = logging.getLogger(__name__)
+
+
+class RedispatchEngine:
+    """
+    Переназначение отклоненных и зависших в статусе await заявок.
+    Вместо исходной заявки создается дочерняя (parent - исходная), в excluded_users которой
+    накапливаются исполнители, уже получавшие эту работу по всей цепочке.
+    Исходная заявка при захвате закрывается как reject: исполнитель зависшей заявки уже не может
+    её принять, и одна работа не выполняется дважды.
+    """
+    FIELDS = ("_id", "user", "status", "params", "text", "priority", "deadline", "excluded_users")
+    CLAIMABLE_STATUSES = ("reject", "await")
+
+    @classmethod
+    def on_status_change(cls, request: Request, previous_status: Optional[str]) -> None:
+        """
+        Вызывается при смене статуса заявки: завершенная заявка освобождает место исполнителя
+        в лимите заявок в работе, отклоненная заявка переназначается сразу
+        """
+        from .capacity import ExecutorCapacity
+        from .tasks import redispatch_requests, send_task
+
+        user = request._data.get("user")
+        if (
+            user is not None
+            and previous_status in ExecutorCapacity.ACTIVE_STATUSES
+            and request.status not in ExecutorCapacity.ACTIVE_STATUSES
+        ):
+            ExecutorCapacity.release(str(getattr(user, "id", user)))
+        if request.status == "reject" and previous_status != "reject":
+            send_task(redispatch_requests, [str(request.id)])
+
+    @classmethod
+    def find_stale(cls, limit: int) -> List[str]:
+        """Отклоненные и зависшие заявки, ещё не переназначенные (по индексу status/redispatched_at/updated_at)"""
+        cutoff = datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+            seconds=settings.REDISPATCH_AWAIT_TIMEOUT
+        )
+        rejected = Request.objects(status="reject", redispatched_at=None).only("id").limit(limit)
+        ids = [str(r["_id"]) for r in rejected.as_pymongo()]
+        if len(ids) < limit:
+            stale = Request.objects(
+                status="await", redispatched_at=None, updated_at__lt=cutoff
+            ).only("id").limit(limit - len(ids))
+            ids += [str(r["_id"]) for r in stale.as_pymongo()]
+        return ids
+
+    @classmethod
+    def claim(cls, request_ids: List[str]) -> List[Dict]:
+        """
+        Атомарно помечает заявки переназначенными и возвращает те,
+        что были захвачены этим вызовом (параллельный захват той же заявки вернет None,
+        как и заявка, которую исполнитель успел принять).
+        Зависшая в await заявка переводится в reject, место исполнителя в лимите заявок
+        в работе освобождается.
+        """
+        from .capacity import ExecutorCapacity
+
+        now = datetime.datetime.now(datetime.UTC)
+        collection = Request._get_collection()
+        claimed = []
+        for request_id in request_ids:
+            raw = collection.find_one_and_update(
+                {
+                    "_id": ObjectId(request_id),
+                    "redispatched_at": None,
+                    "status": {"$in": list(cls.CLAIMABLE_STATUSES)},
+                },
+                {"$set": {"redispatched_at": now, "status": "reject", "updated_at": now}},
+                projection=cls.FIELDS,
+            )
+            if raw is None:
+                continue
+            if raw["status"] == "await" and raw.get("user") is not None:
+                ExecutorCapacity.mark_tracked(request_id)
+                ExecutorCapacity.release(str(raw["user"]))
+                logger.info(f"Request {request_id} stayed in await too long, closed as reject")
+            claimed.append(raw)
+        return claimed
+
+    @classmethod
+    def redispatch(cls, request_ids: List[str]) -> List[str]:
+        """Создает дочерние заявки пачкой и ставит их в очередь распределения"""
+        from .tasks import enqueue_dispatch
+
+        if not request_ids:
+            return []
+
+        children = []
+        for raw in cls.claim(request_ids):
+            excluded = list(raw.get("excluded_users") or [])
+            if raw.get("user") is not None:
+                excluded.append(str(raw["user"]))
+            if len(excluded) > settings.REDISPATCH_MAX_ATTEMPTS:
+                logger.warning(f"Request {raw['_id']} exceeded redispatch attempts, leaving as is")
+                continue
+            children.append(
+                Request(
+                    parent=raw["_id"],
+                    params=raw.get("params") or {},
+                    text=raw.get("text"),
+                    priority=raw.get("priority", 0),
+                    deadline=raw.get("deadline"),
+                    excluded_users=excluded,
+                )
+            )
+
+        if not children:
+            return []
+
+        child_ids = Request.objects.insert([child.prepare() for child in children], load_bulk=False)
+        for child, child_id in zip(children, child_ids):
+            logger.info(f"Request redispatched as {child_id}, excluded users: {child.excluded_users}")
+            enqueue_dispatch(str(child_id), child.params, child.priority)
+        return [str(child_id) for child_id in child_ids]
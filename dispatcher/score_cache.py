@@ -0,0 +1,79 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+
+class StaticScores(dict):
+    """executor id -> (запись исполнителя, total_score, max_score, подходит ли по порогу)"""
+
+    def __init__(self, key: Tuple[str, float]):
+        super().__init__()
+        self.key = key
+
+
+class StaticScoreCache:
+    """
+    Память процесса для оценок соответствия исполнителей параметрам заявки.
+
+    Оценка по параметрам не зависит от нагрузки, поэтому для повторяющихся параметров заявок
+    она берется из кэша, а на каждое распределение пересчитывается только фактор нагрузки.
+    Ключ - хеш канонического JSON параметров и порог min_score_fraction. Запись исполнителя
+    действительна, пока в снимке тот же объект записи: любое изменение исполнителя (дельта
+    или перечитывание снимка) дает новый объект, и оценка считается заново.
+    Размер ограничен SCORE_CACHE_MAX_ENTRIES оценками, вытесняются давно не использованные параметры.
+    Вызывающий читает полученные через scores оценки без блокировки, а новые собирает в свой
+    словарь и передает в grew: записываются оценки только под _lock, поэтому параллельные
+    распределения не портят ни оценки, ни счетчик размера.
+    """
+    _entries: "OrderedDict[Tuple[str, float], StaticScores]" = OrderedDict()
+    _total = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.SCORE_CACHE_ENABLED
+
+    @staticmethod
+    def signature(request_params: Dict[str, Dict[str, Any]]) -> str:
+        canonical = json.dumps(request_params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    @classmethod
+    def scores(cls, request_params: Dict[str, Dict[str, Any]], min_score_fraction: float) -> Optional[StaticScores]:
+        """Оценки для параметров заявки (заполняются вызывающим); None, если кэш выключен"""
+        if not cls.enabled():
+            return None
+        key = (cls.signature(request_params), min_score_fraction)
+        with cls._lock:
+            scores = cls._entries.get(key)
+            if scores is None:
+                scores = cls._entries[key] = StaticScores(key)
+            else:
+                cls._entries.move_to_end(key)
+        return scores
+
+    @classmethod
+    def grew(cls, scores: StaticScores, fresh: Dict[str, Tuple]) -> None:
+        """Добавляет в scores новые оценки вызывающего и вытесняет лишнее"""
+        if not fresh:
+            return
+        with cls._lock:
+            if cls._entries.get(scores.key) is not scores:
+                # Уже вытеснены: оценки пригодились этому вызову, но в кэш не попадают
+                return
+            size = len(scores)
+            scores.update(fresh)
+            cls._total += len(scores) - size
+            while cls._total > settings.SCORE_CACHE_MAX_ENTRIES and cls._entries:
+                _, evicted = cls._entries.popitem(last=False)
+                cls._total -= len(evicted)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries.clear()
+            cls._total = 0
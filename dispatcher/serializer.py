@@ -1,12 +1,47 @@
+from django.core.exceptions import ValidationError
 from rest_framework import serializers
 
+from core.utils import validate_and_cast_params
+from dispatcher.strategies import STRATEGIES
+
 
 class DispatchSerializer(serializers.Serializer):
-    id = serializers.CharField(required=True)
-    parent_id = serializers.CharField(required=True, allow_null=True)
-    params = serializers.JSONField(required=True)
-    updated_at = serializers.DateTimeField(required=True)
-    created_at = serializers.DateTimeField(required=True)
+    id = serializers.CharField(required=False, help_text="ID заявки, обязателен при async=true")
+    parent_id = serializers.CharField(required=False, allow_null=True)
+    params = serializers.DictField(required=True)
+    min_score_fraction = serializers.FloatField(required=False, default=0.7, min_value=0.0, max_value=1.0)
+    updated_at = serializers.DateTimeField(required=False)
+    created_at = serializers.DateTimeField(required=False)
+
+    def validate_params(self, value):
+        """Автоматически привести типы из KeyDataTypes"""
+        try:
+            return validate_and_cast_params(value)
+        except ValidationError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class DispatchResultSerializer(serializers.Serializer):
+    user = serializers.CharField()
+    username = serializers.CharField(allow_null=True)
+    load_factor = serializers.FloatField()
+    is_fallback = serializers.BooleanField()
+    elapsed_ms = serializers.FloatField()
+
+
+class ExplainSerializer(serializers.Serializer):
+    params = serializers.DictField(required=True)
+    top_n = serializers.IntegerField(required=False, default=5, min_value=1, max_value=100)
+    min_score_fraction = serializers.FloatField(required=False, default=0.7, min_value=0.0, max_value=1.0)
+    strategy = serializers.ChoiceField(required=False, choices=sorted(STRATEGIES))
+    exclude = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    def validate_params(self, value):
+        """Автоматически привести типы из KeyDataTypes"""
+        try:
+            return validate_and_cast_params(value)
+        except ValidationError as e:
+            raise serializers.ValidationError(str(e))
 
 
 class DailySummaryQuerySerializer(serializers.Serializer):
@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+FALLBACK_QUEUE = "dispatch_queue"
+
+
+def is_enabled() -> bool:
+    """Шардирование включено, если задан ключ параметра и список шардов"""
+    return bool(settings.DISPATCH_SHARD_PARAM and settings.DISPATCH_SHARDS)
+
+
+def _as_shard(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    shard = str(value)
+    return shard if shard in settings.DISPATCH_SHARDS else None
+
+
+def shard_for_request(request_params: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    """Шард заявки по значению параметра; None - кросс-шардовая очередь"""
+    if not is_enabled():
+        return None
+    condition = request_params.get(settings.DISPATCH_SHARD_PARAM)
+    if not isinstance(condition, dict) or condition.get("operator", "EQ") != "EQ":
+        return None
+    return _as_shard(condition.get("value"))
+
+
+def shard_for_executor(params: Dict[str, Any]) -> Optional[str]:
+    """Шард исполнителя по значению его параметра"""
+    if not is_enabled():
+        return None
+    return _as_shard(params.get(settings.DISPATCH_SHARD_PARAM))
+
+
+def queue_for_shard(shard: Optional[str]) -> str:
+    """Очередь шарда: dispatch_queue.<shard>, либо общая dispatch_queue"""
+    return f"{FALLBACK_QUEUE}.{shard}" if shard else FALLBACK_QUEUE
+
+
+def executor_filter(shard: str) -> Dict[str, Any]:
+    """
+    Raw-фильтр исполнителей шарда.
+    Значение параметра может храниться числом, поэтому проверяются и числовые варианты.
+    """
+    values: List[Any] = [shard]
+    for cast in (int, float):
+        try:
+            values.append(cast(shard))
+        except ValueError:
+            pass
+    return {f"params.{settings.DISPATCH_SHARD_PARAM}": {"$in": values}}
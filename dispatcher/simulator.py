@@ -0,0 +1,139 @@
+import datetime
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from core import readers
+from .archive import HistoryArchive
+from .columnar import ExecutorRecord
+from .log_buffer import DispatchLogBuffer
+from .snapshot import ExecutorSnapshot
+from .strategies import get_strategy
+
+
+@dataclass
+class SimulationReport:
+    """Результат прогона одной стратегии по истории"""
+    strategy: str
+    decisions: int = 0
+    unassigned: int = 0
+    matched_history: int = 0
+    elapsed: float = 0.0
+    assignments: Dict[str, int] = field(default_factory=dict)
+    capacities: Dict[str, Optional[int]] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """Решений в секунду"""
+        return self.decisions / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def agreement(self) -> float:
+        """Доля решений, совпавших с историческим распределением"""
+        return self.matched_history / self.decisions if self.decisions else 0.0
+
+    @property
+    def fairness(self) -> float:
+        """
+        Индекс справедливости Джейна по загрузке исполнителей (1.0 - идеально ровно).
+        Загрузка у всех считается одной мерой - назначения на единицу веса. Вес - max_daily_requests,
+        исполнители без лимита получают наибольший вес в пуле, как в least_connections.
+        """
+        max_weight = max((cap or 0 for cap in self.capacities.values()), default=0) or 1
+        loads = [
+            self.assignments.get(user_id, 0) / (cap or max_weight)
+            for user_id, cap in self.capacities.items()
+        ]
+        total = sum(loads)
+        squares = sum(x * x for x in loads)
+        if not loads or not squares:
+            return 0.0
+        return total * total / (len(loads) * squares)
+
+    def as_dict(self) -> Dict:
+        counts = [self.assignments.get(user_id, 0) for user_id in self.capacities]
+        return {
+            "strategy": self.strategy,
+            "decisions": self.decisions,
+            "unassigned": self.unassigned,
+            "throughput": round(self.throughput, 2),
+            "fairness": round(self.fairness, 4),
+            "agreement": round(self.agreement, 4),
+            "max": max(counts, default=0),
+            "min": min(counts, default=0),
+        }
+
+
+class DispatchSimulator:
+    """
+    Офлайн-симулятор: прогоняет исторические DispatchLogs и Request через стратегии.
+    Дневные счетчики обнуляются при смене дня, как и в RequestCounter.
+    """
+    CHUNK_SIZE = 1000
+
+    def __init__(self, start_date: Optional[datetime.date] = None,
+                 end_date: Optional[datetime.date] = None,
+                 min_score_fraction: float = 0.7):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.min_score_fraction = min_score_fraction
+        self.executors: List[ExecutorRecord] = []
+        self.history: List[Tuple[datetime.datetime, Dict, str]] = []
+
+    def load_history(self) -> None:
+        """Загружает исполнителей и историю распределений за период"""
+        self.executors = ExecutorSnapshot.load_from_db()
+        DispatchLogBuffer.flush()
+
+        logs = list(readers.iter_dispatch_log_rows(
+            datetime.datetime.combine(self.start_date, datetime.time.min) if self.start_date else None,
+            datetime.datetime.combine(self.end_date, datetime.time.max) if self.end_date else None,
+        ))
+
+        params_by_request: Dict[str, Dict] = {}
+        request_ids = list({ObjectId(request_id) for request_id, _, _ in logs if ObjectId.is_valid(request_id)})
+        for i in range(0, len(request_ids), self.CHUNK_SIZE):
+            chunk = request_ids[i:i + self.CHUNK_SIZE]
+            for raw in HistoryArchive.find_requests(chunk, ["params"]):
+                params_by_request[str(raw["_id"])] = raw.get("params") or {}
+
+        self.history = [
+            (created_at, params_by_request[request_id], user_id)
+            for request_id, user_id, created_at in logs
+            if request_id in params_by_request
+        ]
+
+    def run(self, strategy_name: str) -> SimulationReport:
+        """Прогоняет историю через стратегию"""
+        if not self.executors:
+            self.load_history()
+
+        strategy = get_strategy(strategy_name, min_score_fraction=self.min_score_fraction)
+        report = SimulationReport(
+            strategy=strategy_name,
+            capacities={str(e.id): e.max_daily_requests for e in self.executors},
+        )
+        usernames = {str(e.id): e.username for e in self.executors}
+
+        daily_counts: Dict[str, int] = {}
+        current_day = None
+        started = time.perf_counter()
+        for created_at, request_params, historical_user in self.history:
+            if created_at.date() != current_day:
+                current_day = created_at.date()
+                daily_counts = {}
+
+            candidate = strategy.select(self.executors, request_params, daily_counts)
+            report.decisions += 1
+            if candidate is None:
+                report.unassigned += 1
+                continue
+
+            daily_counts[candidate.user_id] = daily_counts.get(candidate.user_id, 0) + 1
+            report.assignments[candidate.user_id] = report.assignments.get(candidate.user_id, 0) + 1
+            if usernames.get(candidate.user_id) == historical_user:
+                report.matched_history += 1
+        report.elapsed = time.perf_counter() - started
+        return report
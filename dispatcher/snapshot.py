@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import msgpack
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from . import sharding
+from .columnar import ExecutorColumns, ExecutorRecord
+
+logger = logging.getLogger(__name__)
+
+Delta = Tuple[int, str, List[ExecutorRecord]]
+
+
+class ExecutorSnapshot:
+    """
+    Снимок исполнителей в памяти процесса.
+    Хранится по шардам: воркер шарда держит только своих исполнителей.
+
+    Снимок публикуется в Redis компактным колоночным msgpack-blob'ом, поэтому новый процесс
+    стартует одним GET, а не перечитыванием всех User из Mongo. Изменения исполнителей
+    публикуются дельтами с возрастающей версией; процессы применяют только недостающие дельты.
+    Дельта, совпадающая с последней опубликованной для исполнителя (API и слушатель изменений
+    сообщают об одной правке дважды), новой версии не получает.
+    Раз в EXECUTOR_SNAPSHOT_TTL снимок перечитывается из Mongo как страховка от правок в обход API.
+    """
+    VERSION_KEY = "executor_snapshot:version"
+    DELTAS_KEY = "executor_snapshot:deltas"
+    BLOB_KEY = "executor_snapshot:blob:{}"
+    FINGERPRINTS_KEY = "executor_snapshot:fingerprints"
+    MAX_DELTAS = 1000
+
+    _snapshots: Dict[Optional[str], Tuple[float, int, List[ExecutorRecord]]] = {}
+    _indexes: Dict[Optional[str], Tuple[List[ExecutorRecord], Dict[str, ExecutorRecord]]] = {}
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection("default")
+
+    @classmethod
+    def _blob_key(cls, shard: Optional[str]) -> str:
+        return cls.BLOB_KEY.format(shard or "*")
+
+    @classmethod
+    def load_from_db(cls, shard: Optional[str] = None, query: Optional[Dict] = None) -> List[ExecutorRecord]:
+        """Загружает исполнителей (шарда, подходящих под query) из базы без гидратации документов"""
+        from core.models import User
+        from core.readers import find_raw
+
+        filters = [f for f in (sharding.executor_filter(shard) if shard else None, query) if f]
+        query = {"$and": filters} if len(filters) > 1 else (filters[0] if filters else None)
+        fields = ("username", "max_daily_requests", "params", "max_hourly_requests", "max_in_flight", "shifts")
+        return [
+            ExecutorRecord(
+                str(raw["_id"]),
+                raw.get("username"),
+                raw.get("max_daily_requests"),
+                raw.get("params") or {},
+                raw.get("max_hourly_requests"),
+                raw.get("max_in_flight"),
+                raw.get("shifts") or [],
+            )
+            for raw in find_raw(User, query, fields)
+        ]
+
+    @classmethod
+    def get_version(cls) -> int:
+        return int(cls._redis().get(cls.VERSION_KEY) or 0)
+
+    @classmethod
+    def _store(cls, shard: Optional[str], version: int, executors: List[ExecutorRecord],
+               loaded_at: Optional[float] = None) -> List[ExecutorRecord]:
+        if loaded_at is None:
+            loaded_at = time.monotonic()
+        cls._snapshots[shard] = (loaded_at, version, executors)
+        return executors
+
+    @classmethod
+    def _load_blob(cls, shard: Optional[str]) -> Optional[ExecutorColumns]:
+        blob = cls._redis().get(cls._blob_key(shard))
+        if blob is None:
+            return None
+        try:
+            return ExecutorColumns.unpack(blob)
+        except Exception:
+            logger.exception("Broken executor snapshot blob, ignoring")
+            return None
+
+    @classmethod
+    def publish(cls, shard: Optional[str], version: int, executors: List[ExecutorRecord]) -> None:
+        """Публикует колоночный снимок в Redis"""
+        cls._redis().set(cls._blob_key(shard), ExecutorColumns.from_records(executors, version).pack())
+
+    @classmethod
+    def _pending_deltas(cls, since_version: int, version: int) -> Optional[List[Delta]]:
+        """Дельты с версиями (since_version, version]; None, если часть уже вытеснена или не записана"""
+        if since_version == version:
+            return []
+        deltas = []
+        for raw in cls._redis().lrange(cls.DELTAS_KEY, 0, -1):
+            data = msgpack.unpackb(raw, raw=False)
+            if since_version < data["version"] <= version:
+                columns = ExecutorColumns.unpack(data["columns"])
+                if columns is None:
+                    return None
+                deltas.append((data["version"], data["op"], columns.to_records()))
+        deltas.sort(key=lambda d: d[0])
+        if [d[0] for d in deltas] != list(range(since_version + 1, version + 1)):
+            return None
+        return deltas
+
+    @classmethod
+    def _apply_deltas(cls, shard: Optional[str], executors: List[ExecutorRecord],
+                      deltas: List[Delta]) -> List[ExecutorRecord]:
+        by_id = {e.id: e for e in executors}
+        for _, op, records in deltas:
+            for record in records:
+                by_id.pop(record.id, None)
+                if op == "upsert" and (shard is None or sharding.shard_for_executor(record.params) == shard):
+                    by_id[record.id] = record
+        return list(by_id.values())
+
+    @classmethod
+    def get(cls, shard: Optional[str] = None) -> List[ExecutorRecord]:
+        """Возвращает актуальный снимок исполнителей (шарда)"""
+        current_time = time.monotonic()
+        version = cls.get_version()
+
+        cached = cls._snapshots.get(shard)
+        if cached is not None and (current_time - cached[0]) < settings.EXECUTOR_SNAPSHOT_TTL:
+            loaded_at, cached_version, executors = cached
+            if cached_version == version:
+                return executors
+            deltas = cls._pending_deltas(cached_version, version)
+            if deltas is not None:
+                return cls._store(shard, version, cls._apply_deltas(shard, executors, deltas), loaded_at)
+
+        if cached is None:
+            columns = cls._load_blob(shard)
+            if columns is not None and columns.version <= version:
+                deltas = cls._pending_deltas(columns.version, version)
+                if deltas is not None:
+                    return cls._store(shard, version, cls._apply_deltas(shard, columns.to_records(), deltas))
+
+        executors = cls.load_from_db(shard)
+        cls.publish(shard, version, executors)
+        return cls._store(shard, version, executors)
+
+    @classmethod
+    def index(cls, shard: Optional[str] = None) -> Dict[str, ExecutorRecord]:
+        """Записи текущего снимка по id (строится один раз на версию снимка)"""
+        executors = cls.get(shard)
+        cached = cls._indexes.get(shard)
+        if cached is None or cached[0] is not executors:
+            cached = (executors, {e.id: e for e in executors})
+            cls._indexes[shard] = cached
+        return cached[1]
+
+    @classmethod
+    def get_record(cls, user_id: str, shard: Optional[str] = None) -> Optional[ExecutorRecord]:
+        """Запись исполнителя по id из текущего снимка"""
+        return cls.index(shard).get(user_id)
+
+    @classmethod
+    def publish_delta(cls, user, deleted: bool = False) -> None:
+        """Публикует изменение (или удаление) исполнителя следующей версией снимка, если оно новое"""
+        record = ExecutorRecord(
+            str(user.id), user.username, user.max_daily_requests, user.params or {},
+            user.max_hourly_requests, user.max_in_flight, [dict(shift) for shift in user.shifts or []],
+        )
+        op = "delete" if deleted else "upsert"
+        fingerprint = hashlib.md5(op.encode() + ExecutorColumns.from_records([record], 0).pack()).hexdigest()
+        client = cls._redis()
+        published = client.hget(cls.FINGERPRINTS_KEY, record.id)
+        if published is not None and published.decode() == fingerprint:
+            return
+
+        version = client.incr(cls.VERSION_KEY)
+        payload = msgpack.packb(
+            {
+                "version": version,
+                "op": op,
+                "columns": ExecutorColumns.from_records([record], version).pack(),
+            },
+            use_bin_type=True,
+        )
+        pipe = client.pipeline(transaction=False)
+        pipe.rpush(cls.DELTAS_KEY, payload)
+        pipe.ltrim(cls.DELTAS_KEY, -cls.MAX_DELTAS, -1)
+        pipe.hset(cls.FINGERPRINTS_KEY, record.id, fingerprint)
+        pipe.execute()
+
+    @classmethod
+    def warm(cls, shard: Optional[str] = None) -> None:
+        """Прогревает снимок при старте процесса"""
+        try:
+            executors = cls.get(shard)
+            logger.info(f"Executor snapshot for shard {shard or '*'} warmed: {len(executors)} executors")
+        except Exception:
+            logger.exception("Failed to warm executor snapshot")
@@ -0,0 +1,241 @@
+import bisect
+import hashlib
+import random
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from django.conf import settings
+
+from .candidate_info import CandidateInfo
+from .score_cache import StaticScoreCache, StaticScores
+from .scoring import UserScorer
+
+STRATEGIES: Dict[str, Type["BalancingStrategy"]] = {}
+
+
+def register_strategy(cls: Type["BalancingStrategy"]) -> Type["BalancingStrategy"]:
+    """Регистрирует стратегию в реестре под её именем"""
+    STRATEGIES[cls.name] = cls
+    return cls
+
+
+def get_strategy(name: Optional[str] = None, **options) -> "BalancingStrategy":
+    """Создает стратегию по имени (по умолчанию - из настроек)"""
+    name = name or settings.BALANCING_STRATEGY
+    try:
+        strategy_cls = STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Неизвестная стратегия балансировки: {name}")
+    return strategy_cls(**options)
+
+
+def resolve_strategy_name(request_params: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Определяет стратегию для заявки по её типу.
+    Тип берется из параметра BALANCING_TYPE_PARAM и ищется в BALANCING_STRATEGY_BY_TYPE.
+    """
+    condition = request_params.get(settings.BALANCING_TYPE_PARAM)
+    if isinstance(condition, dict):
+        name = settings.BALANCING_STRATEGY_BY_TYPE.get(str(condition.get("value")))
+        if name:
+            return name
+    return settings.BALANCING_STRATEGY
+
+
+class BalancingStrategy:
+    """
+    Базовая стратегия балансировки.
+    Исполнители - любые объекты с атрибутами id, params и max_daily_requests.
+    """
+    name = ""
+    # Выбор среди подходящих кандидатов не зависит от остальных исполнителей,
+    # поэтому стратегию можно применять к предварительно отфильтрованному в Mongo списку
+    prefilter_safe = False
+
+    def __init__(self, min_score_fraction: float = 0.7):
+        self.scorer = UserScorer(min_score_fraction=min_score_fraction)
+
+    @staticmethod
+    def has_capacity(executor, daily_counts: Dict[str, int]) -> bool:
+        """Проверяет, не исчерпан ли дневной лимит исполнителя"""
+        if not executor.max_daily_requests:
+            return True
+        return daily_counts.get(str(executor.id), 0) < executor.max_daily_requests
+
+    def score(
+        self,
+        executor,
+        request_params: Dict[str, Dict[str, Any]],
+        daily_counts: Dict[str, int],
+        static: Optional[StaticScores] = None,
+        fresh: Optional[Dict[str, Tuple]] = None,
+    ) -> CandidateInfo:
+        """
+        Оценивает одного исполнителя. static - оценки соответствия из StaticScoreCache:
+        если там есть оценка этой записи исполнителя, пересчитывается только нагрузка.
+        Новая оценка записывается в fresh, откуда её переносит в кэш StaticScoreCache.grew.
+        """
+        executor_id = str(executor.id)
+        cached = static.get(executor_id) if static is not None else None
+        if cached is not None and cached[0] is executor:
+            _, total_score, max_possible_score, suitable = cached
+        else:
+            parameter_scores = self.scorer.calculate_parameter_scores(
+                executor.params or {}, request_params
+            )
+            total_score, max_possible_score = self.scorer.calculate_total_score(parameter_scores)
+            suitable = self.scorer.is_suitable_candidate(total_score, max_possible_score)
+            if fresh is not None:
+                fresh[executor_id] = (executor, total_score, max_possible_score, suitable)
+        return CandidateInfo(
+            executor_id,
+            total_score,
+            max_possible_score,
+            daily_counts.get(executor_id, 0),
+            executor.max_daily_requests,
+            is_fallback=not suitable,
+            username=getattr(executor, "username", None),
+        )
+
+    def score_all(
+        self, executors: Iterable, request_params: Dict[str, Dict[str, Any]], daily_counts: Dict[str, int]
+    ) -> List[CandidateInfo]:
+        """Оценивает всех исполнителей, у которых остался лимит (оценки соответствия - через кэш)"""
+        static = StaticScoreCache.scores(request_params, self.scorer.min_score_threshold)
+        fresh = {} if static is not None else None
+        candidates = [
+            self.score(executor, request_params, daily_counts, static, fresh)
+            for executor in executors
+            if self.has_capacity(executor, daily_counts)
+        ]
+        if static is not None:
+            StaticScoreCache.grew(static, fresh)
+        return candidates
+
+    @staticmethod
+    def pick_best(candidates: Sequence[CandidateInfo]) -> Optional[CandidateInfo]:
+        """Лучший кандидат: сначала подходящие по параметрам, затем запасные"""
+        if not candidates:
+            return None
+        return min(candidates)
+
+    def select(
+        self, executors: Sequence, request_params: Dict[str, Dict[str, Any]], daily_counts: Dict[str, int]
+    ) -> Optional[CandidateInfo]:
+        raise NotImplementedError
+
+
+@register_strategy
+class WeightedScoreStrategy(BalancingStrategy):
+    """Текущая формула: 0.8 * нагрузка + 0.2 * (1 - соответствие)"""
+    name = "weighted_score"
+    prefilter_safe = True
+
+    def select(self, executors, request_params, daily_counts):
+        return self.pick_best(self.score_all(executors, request_params, daily_counts))
+
+
+@register_strategy
+class PowerOfTwoStrategy(BalancingStrategy):
+    """
+    Power-of-two-choices: оценивает только двух случайных исполнителей с лимитом
+    и выбирает лучшего из них.
+    """
+    name = "power_of_two"
+
+    def __init__(self, min_score_fraction: float = 0.7, seed: Optional[int] = None):
+        super().__init__(min_score_fraction)
+        self.random = random.Random(seed)
+
+    def select(self, executors, request_params, daily_counts):
+        available = [e for e in executors if self.has_capacity(e, daily_counts)]
+        if not available:
+            return None
+        sample = self.random.sample(available, min(2, len(available)))
+        return self.pick_best(
+            [self.score(executor, request_params, daily_counts) for executor in sample]
+        )
+
+
+@register_strategy
+class WeightedLeastConnectionsStrategy(BalancingStrategy):
+    """
+    Weighted least-connections: минимальное отношение заявок за день к весу исполнителя.
+    Вес - max_daily_requests; исполнители без лимита получают наибольший вес в пуле.
+    """
+    name = "least_connections"
+    prefilter_safe = True
+
+    def select(self, executors, request_params, daily_counts):
+        candidates = self.score_all(executors, request_params, daily_counts)
+        pool = [c for c in candidates if not c.is_fallback] or candidates
+        if not pool:
+            return None
+
+        max_weight = max((c.max_daily_requests or 0 for c in pool), default=0) or 1
+        return min(
+            pool,
+            key=lambda c: (c.daily_requests / (c.max_daily_requests or max_weight), c.load_factor),
+        )
+
+
+@register_strategy
+class ConsistentHashStrategy(BalancingStrategy):
+    """
+    Консистентное хеширование по значению параметра заявки (BALANCING_HASH_PARAM).
+    Заявки с одинаковым значением попадают к одному исполнителю, пока у него есть лимит:
+    берется первый по кольцу подходящий по параметрам исполнитель, иначе первый с лимитом.
+    Без параметра в заявке работает как weighted_score.
+    """
+    name = "consistent_hash"
+    VIRTUAL_NODES = 64
+    _ring_cache: Dict[Tuple[str, ...], Tuple[List[int], List[str]]] = {}
+
+    def __init__(self, min_score_fraction: float = 0.7, hash_param: Optional[str] = None):
+        super().__init__(min_score_fraction)
+        self.hash_param = hash_param or settings.BALANCING_HASH_PARAM
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    @classmethod
+    def build_ring(cls, executor_ids: Tuple[str, ...]) -> Tuple[List[int], List[str]]:
+        """Строит кольцо с виртуальными узлами; кэширует последнее построенное"""
+        ring = cls._ring_cache.get(executor_ids)
+        if ring is None:
+            points = sorted(
+                (cls._hash(f"{executor_id}#{i}"), executor_id)
+                for executor_id in executor_ids
+                for i in range(cls.VIRTUAL_NODES)
+            )
+            ring = ([p[0] for p in points], [p[1] for p in points])
+            cls._ring_cache = {executor_ids: ring}
+        return ring
+
+    def select(self, executors, request_params, daily_counts):
+        condition = request_params.get(self.hash_param)
+        if not isinstance(condition, dict) or condition.get("value") is None:
+            return self.pick_best(self.score_all(executors, request_params, daily_counts))
+
+        by_id = {str(e.id): e for e in executors}
+        if not by_id:
+            return None
+        hashes, owners = self.build_ring(tuple(sorted(by_id)))
+
+        start = bisect.bisect(hashes, self._hash(str(condition["value"])))
+        seen = set()
+        first_available = None
+        for i in range(len(owners)):
+            executor_id = owners[(start + i) % len(owners)]
+            if executor_id in seen:
+                continue
+            seen.add(executor_id)
+            executor = by_id[executor_id]
+            if self.has_capacity(executor, daily_counts):
+                candidate = self.score(executor, request_params, daily_counts)
+                if not candidate.is_fallback:
+                    return candidate
+                first_available = first_available or candidate
+            if len(seen) == len(by_id):
+                break
+        return first_available
@@ -1,95 +1,192 @@
 import datetime
 import uuid
 import logging
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from asgiref.sync import async_to_sync
+from bson import ObjectId
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django_redis import get_redis_connection
 
-from core.models import Request, User
-from dispatcher.models import DispatchLogs
-from .scoring import UserScorer
+from core.models import Request
+from core.response_cache import ResponseCache, DAILY_SUMMARY
+from .affinity import ExecutorAffinity
+from .archive import HistoryArchive
+from .autoscale import DispatchAutoscaler
 from .candidate_info import CandidateInfo
+from .capacity import ExecutorCapacity
+from .strategies import WeightedScoreStrategy, get_strategy, resolve_strategy_name
+from .explain import explain_dispatch
+from .idempotency import DispatchDeduplicator
+from .log_buffer import DispatchLogBuffer
 from .locks import RequestCounter
+from .metrics import QueueWaitHistogram
+from .parallel import ParallelScorer
+from . import prefilter
+from .redispatch import RedispatchEngine
+from .sharding import queue_for_shard, shard_for_request
+from .snapshot import ExecutorSnapshot
 
 logger = logging.getLogger(__name__)
 
 
 def find_available_users(request_params: Dict, min_score_fraction: float = 0.7) -> List[CandidateInfo]:
-    """Находит доступных пользователей с учетом параметров и нагрузки"""
-    scorer = UserScorer(min_score_fraction=min_score_fraction)
-    daily_counts = RequestCounter.get_request_counts()
-    candidates: List[CandidateInfo] = []
-    
-    for user in User.objects.only('id', 'max_daily_requests', 'params').all():
-        daily_requests = daily_counts.get(str(user.id), 0)
-        if user.max_daily_requests and daily_requests >= user.max_daily_requests:
-            continue
-
-        parameter_scores = scorer.calculate_parameter_scores(
-            user.params or {}, request_params
-        )
-        total_score, max_possible_score = scorer.calculate_total_score(parameter_scores)
-        is_fallback = not scorer.is_suitable_candidate(total_score, max_possible_score)
-        
-        candidates.append(
-            CandidateInfo(
-                str(user.id),
-                total_score,
-                max_possible_score,
-                daily_requests,
-                user.max_daily_requests,
-                is_fallback=is_fallback
-            )
-        )
-    return candidates
+    """Находит доступных пользователей с учетом параметров, нагрузки, лимитов и смен"""
+    strategy = get_strategy(WeightedScoreStrategy.name, min_score_fraction=min_score_fraction)
+    state = ExecutorCapacity.fetch()
+    unavailable = ExecutorCapacity.unavailable(state)
+    executors = [e for e in ExecutorSnapshot.get() if e.id not in unavailable]
+    return strategy.score_all(executors, request_params, state.daily)
 
 
-@shared_task(bind=True)
-def dispatch_request(
-    self, request_id: str, min_score_fraction: float = 0.7
-) -> Optional[str]:
-    """Распределяет заявку между пользователями с учетом их параметров и нагрузки"""
-    try:
-        request = Request.objects.get(id=request_id)
-    except Request.DoesNotExist:
-        logger.error(f"Request {request_id} not found")
+def send_task(task, *args):
+    """
+    task.delay(*args); в режиме DISPATCH_MODE=local брокера нет, и задача выполняется в цикле
+    LocalDispatchQueue, не блокируя вызывающего (None)
+    """
+    if settings.DISPATCH_MODE == "local":
+        from .local_queue import LocalDispatchQueue
+
+        LocalDispatchQueue.submit(task, *args)
         return None
+    return task.delay(*args)
 
-    request_params = request.params or {}
-    candidates = find_available_users(request_params, min_score_fraction)
 
-    if not candidates:
-        logger.error(f"No available users found for request {request_id}")
+def enqueue_dispatch(request_id: str, request_params: Dict, priority: int = 0):
+    """
+    Ставит заявку в очередь её шарда (или в общую очередь) с приоритетом заявки.
+    В пакетном режиме автомасштабирования задача не публикуется: заявку разберет dispatch_pending,
+    возвращается None. В режиме DISPATCH_MODE=local заявка уходит в очередь процесса (None).
+    """
+    if settings.DISPATCH_MODE == "local":
+        from .local_queue import LocalDispatchQueue
+
+        LocalDispatchQueue.put(request_id, priority)
         return None
+    if DispatchAutoscaler.batch_mode():
+        logger.debug(f"Batch mode is on, request {request_id} is left for dispatch_pending")
+        return None
+    shard = shard_for_request(request_params)
+    return dispatch_request.apply_async(
+        args=[request_id], kwargs={"shard": shard}, queue=queue_for_shard(shard), priority=priority
+    )
 
-    primary_candidates = sorted([c for c in candidates if not c.is_fallback])
-    fallback_candidates = sorted([c for c in candidates if c.is_fallback])
-    best_candidate = primary_candidates[0] if primary_candidates else fallback_candidates[0]
-    best_user_id = best_candidate.user_id
 
-    try:
-        best_user = User.objects.only('id', 'username').get(id=best_user_id)
-    except User.DoesNotExist:
-        logger.error(f"User {best_user_id} not found")
-        return None
+def choose_executor(
+    request_params: Dict,
+    min_score_fraction: float = 0.7,
+    shard: Optional[str] = None,
+    exclude: Iterable[str] = (),
+    parent_id: Optional[str] = None,
+    dry_run: bool = False,
+) -> Optional[CandidateInfo]:
+    """
+    Выбирает исполнителя для заявки стратегией, соответствующей её типу.
+    Исполнители из exclude (уже отклонившие заявку), исполнители с исчерпанным дневным, часовым
+    лимитом или лимитом заявок в работе и исполнители вне смены не рассматриваются.
+    Дочерняя заявка (parent_id) при AFFINITY_ENABLED отдается исполнителю родителя без скоринга,
+    если он доступен.
+
+    В режиме PARAMS_ATTRIBUTE_PATTERN стратегии, допускающие предфильтрацию, сначала получают
+    из Mongo только исполнителей, способных пройти порог; если подходящего среди них нет,
+    выбор повторяется по полному снимку (запасные кандидаты считаются по всем).
+    Большой снимок weighted_score оценивается параллельно в пуле процессов (PARALLEL_SCORING).
+
+    dry_run - выбор без побочных эффектов (синхронный ответ API): счетчики читаются из Redis
+    без пересчета по Mongo, исполнитель родителя проверяется без учета в статистике привязки,
+    предфильтрация в Mongo не выполняется - оценка идет только по снимку.
+    """
+    strategy = get_strategy(
+        resolve_strategy_name(request_params), min_score_fraction=min_score_fraction
+    )
+    state = ExecutorCapacity.peek() if dry_run else ExecutorCapacity.fetch()
+    daily_counts = state.daily
+    excluded = set(exclude) | ExecutorCapacity.unavailable(state, shard)
 
-    request.user = best_user
-    request.updated_at = datetime.datetime.now(datetime.UTC)
-    request.save()
+    if parent_id is not None and ExecutorAffinity.enabled():
+        lookup = ExecutorAffinity.peek if dry_run else ExecutorAffinity.lookup
+        candidate = lookup(parent_id, excluded, daily_counts, shard)
+        if candidate is not None:
+            return candidate
 
-    RequestCounter.increment_count(str(best_user_id))
+    if not dry_run and prefilter.is_enabled() and strategy.prefilter_safe:
+        query = prefilter.build_prefilter(request_params, min_score_fraction)
+        if query is not None and query is not prefilter.NO_MATCH:
+            executors = [e for e in ExecutorSnapshot.load_from_db(shard, query) if e.id not in excluded]
+            candidate = strategy.select(executors, request_params, daily_counts)
+            if candidate is not None and not candidate.is_fallback:
+                return candidate
 
-    parent_id = str(request.parent.id) if request.parent else None
-    DispatchLogs.objects.create(
+    executors = ExecutorSnapshot.get(shard)
+    if ParallelScorer.applies(strategy, executors):
+        return ParallelScorer.select(executors, request_params, daily_counts, min_score_fraction, excluded, shard)
+    if excluded:
+        executors = [e for e in executors if e.id not in excluded]
+    return strategy.select(executors, request_params, daily_counts)
+
+
+def commit_assignment(request: Request, candidate: CandidateInfo, task_id: uuid.UUID) -> Optional[str]:
+    """
+    Закрепляет заявку за выбранным исполнителем, пишет лог и оповещает клиентов.
+    Обновление условное (только пока user=None): если заявку уже распределила другая доставка
+    задачи, счетчики и лог не трогаются, возвращается уже назначенный исполнитель.
+
+    Фиксация стоит одну запись в Mongo ($set user/updated_at) и один MULTI-pipeline в Redis:
+    счетчики исполнителя (дневной, часовой, в работе), ключ дедупликации, гистограмма ожидания,
+    привязка к исполнителю для дочерних заявок и лог в буфер применяются вместе.
+    username берется из снимка исполнителей, через который кандидат был выбран.
+    """
+    best_user_id = candidate.user_id
+    username = candidate.username
+    if username is None:
+        record = ExecutorSnapshot.get_record(best_user_id)
+        if record is None:
+            logger.error(f"User {best_user_id} not found")
+            return None
+        username = record.username
+
+    now = datetime.datetime.now(datetime.UTC)
+    updated = Request.objects(id=request.id, user=None).update_one(
+        set__user=ObjectId(best_user_id), set__updated_at=now
+    )
+    if not updated:
+        assigned = Request.objects(id=request.id).only('user').as_pymongo().first()
+        assigned_user_id = str(assigned["user"]) if assigned and assigned.get("user") else None
+        logger.info(f"Request {request.id} is already dispatched to {assigned_user_id}")
+        if assigned_user_id:
+            DispatchDeduplicator.remember(str(request.id), assigned_user_id)
+        return assigned_user_id
+
+    created_at = request.created_at.replace(tzinfo=datetime.UTC)
+    parent_id = ExecutorAffinity.parent_of(request)
+
+    pipe = get_redis_connection("default").pipeline()
+    RequestCounter.increment_count(str(best_user_id), pipe)
+    DispatchDeduplicator.remember(str(request.id), str(best_user_id), pipe)
+    QueueWaitHistogram.observe(request.priority, (now - created_at).total_seconds(), pipe)
+    ExecutorCapacity.reserve(str(best_user_id), pipe)
+    affinity_size_at = None
+    if ExecutorAffinity.enabled():
+        ExecutorAffinity.remember(str(request.id), str(best_user_id), pipe)
+        affinity_size_at = len(pipe) - 1
+    buffered = DispatchLogBuffer.append(
         request_id=str(request.id),
-        user_id=str(best_user.username),
-        task_id=uuid.UUID(self.request.id),
+        user_id=str(username),
+        task_id=task_id,
         parent_id=parent_id,
         request_created_at=request.created_at,
-        request_updated_at=request.updated_at,
+        pipe=pipe,
     )
+    results = pipe.execute()
+    if buffered:
+        DispatchLogBuffer.schedule_flush(results[-1])
+    if affinity_size_at is not None:
+        ExecutorAffinity.trim(results[affinity_size_at])
+    ResponseCache.bump(DAILY_SUMMARY)
 
     async_to_sync(get_channel_layer().group_send)(
         "dispatched",
@@ -101,4 +198,183 @@ def dispatch_request(
         },
     )
 
-    return str(best_user_id)
\ No newline at end of file
+    return str(best_user_id)
+
+
+def load_for_dispatch(request_id: str) -> Tuple[Optional[Request], Optional[str]]:
+    """
+    Заявка, которую нужно распределить, либо (None, исполнитель), если она уже распределена
+    (None, None - заявка не найдена).
+    """
+    dispatched_to = DispatchDeduplicator.get_result(request_id)
+    if dispatched_to is not None:
+        logger.info(f"Request {request_id} is already dispatched to {dispatched_to}")
+        return None, dispatched_to
+
+    try:
+        request = Request.objects.get(id=request_id)
+    except Request.DoesNotExist:
+        logger.error(f"Request {request_id} not found")
+        return None, None
+
+    assigned = request._data.get("user")
+    if assigned is not None:
+        assigned_user_id = str(getattr(assigned, "id", assigned))
+        logger.info(f"Request {request_id} is already dispatched")
+        DispatchDeduplicator.remember(request_id, assigned_user_id)
+        return None, assigned_user_id
+    return request, None
+
+
+@shared_task(bind=True, ignore_result=True)
+def dispatch_request(
+    self, request_id: str, min_score_fraction: float = 0.7, shard: Optional[str] = None
+) -> Optional[str]:
+    """
+    Распределяет заявку между пользователями с учетом их параметров и нагрузки.
+    Воркер шарда рассматривает только исполнителей шарда; если подходящих нет,
+    заявка перекладывается в общую очередь.
+    """
+    request, dispatched_to = load_for_dispatch(request_id)
+    if request is None:
+        return dispatched_to
+
+    best_candidate = choose_executor(
+        request.params or {}, min_score_fraction, shard, request.excluded_users,
+        ExecutorAffinity.parent_of(request),
+    )
+
+    if best_candidate is None and shard is not None:
+        logger.info(f"No available users in shard {shard} for request {request_id}, using cross-shard queue")
+        dispatch_request.apply_async(
+            args=[request_id, min_score_fraction],
+            queue=queue_for_shard(None),
+            priority=request.priority,
+        )
+        return None
+
+    if best_candidate is None:
+        logger.error(f"No available users found for request {request_id}")
+        return None
+
+    return commit_assignment(request, best_candidate, uuid.UUID(self.request.id))
+
+
+def get_pending_requests(batch_size: int, older_than: datetime.datetime) -> List[Request]:
+    """
+    Нераспределенные заявки в порядке срочности:
+    сначала по ближайшему дедлайну, затем заявки без дедлайна по приоритету.
+    """
+    pending = Request.objects(user=None, status="processed", created_at__lt=older_than)
+    batch = list(pending(deadline__ne=None).order_by("deadline", "-priority").limit(batch_size))
+    if len(batch) < batch_size:
+        batch += list(
+            pending(deadline=None).order_by("-priority", "created_at").limit(batch_size - len(batch))
+        )
+    return batch
+
+
+# Доля DISPATCH_PENDING_TIME_LIMIT, после которой dispatch_pending не берет новые заявки
+DISPATCH_PENDING_BUDGET = 0.8
+
+
+@shared_task(ignore_result=True, soft_time_limit=settings.DISPATCH_PENDING_TIME_LIMIT)
+def dispatch_pending(batch_size: Optional[int] = None, min_age: Optional[int] = None) -> int:
+    """
+    Пакетно распределяет зависшие заявки в порядке дедлайнов.
+    Пачка в пакетном режиме не укладывается в общий task_soft_time_limit, поэтому у задачи свой лимит
+    DISPATCH_PENDING_TIME_LIMIT; израсходовав DISPATCH_PENDING_BUDGET его доли, задача останавливается
+    между заявками, а не посреди commit_assignment. Оставшиеся заявки разберет следующий запуск.
+    """
+    stop_at = time.monotonic() + settings.DISPATCH_PENDING_TIME_LIMIT * DISPATCH_PENDING_BUDGET
+    older_than = datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+        seconds=settings.DISPATCH_PENDING_MIN_AGE if min_age is None else min_age
+    )
+    dispatched = 0
+    try:
+        for request in get_pending_requests(batch_size or settings.DISPATCH_BATCH_SIZE, older_than):
+            if time.monotonic() >= stop_at:
+                logger.warning(f"Pending dispatch ran out of time after {dispatched} requests")
+                break
+            candidate = choose_executor(
+                request.params or {}, exclude=request.excluded_users, parent_id=ExecutorAffinity.parent_of(request)
+            )
+            if candidate is None:
+                logger.error(f"No available users found for request {request.id}")
+                continue
+            if commit_assignment(request, candidate, uuid.uuid4()):
+                dispatched += 1
+    except SoftTimeLimitExceeded:
+        logger.error(f"Pending dispatch hit the soft time limit after {dispatched} requests")
+    return dispatched
+
+
+@shared_task(ignore_result=True)
+def escalate_overdue_requests() -> int:
+    """Поднимает до максимума приоритет нераспределенных заявок с пропущенным дедлайном"""
+    now = datetime.datetime.now(datetime.UTC)
+    overdue = list(
+        Request.objects(user=None, status="processed", deadline__lt=now, escalated_at=None)
+        .only('id', 'params')
+        .limit(settings.DISPATCH_BATCH_SIZE)
+    )
+    if not overdue:
+        return 0
+
+    Request.objects(id__in=[r.id for r in overdue]).update(
+        set__priority=Request.MAX_PRIORITY, set__escalated_at=now
+    )
+    for request in overdue:
+        logger.warning(f"Request {request.id} missed its deadline, escalating")
+        enqueue_dispatch(str(request.id), request.params or {}, Request.MAX_PRIORITY)
+    return len(overdue)
+
+
+@shared_task(ignore_result=True)
+def redispatch_requests(request_ids: List[str]) -> List[str]:
+    """Переназначает указанные заявки, исключая исполнителей, которые их уже получали"""
+    return RedispatchEngine.redispatch(request_ids)
+
+
+@shared_task(ignore_result=True)
+def sweep_redispatch() -> int:
+    """Периодический обход отклоненных и зависших заявок"""
+    return len(RedispatchEngine.redispatch(RedispatchEngine.find_stale(settings.DISPATCH_BATCH_SIZE)))
+
+
+@shared_task(ignore_result=True)
+def flush_dispatch_logs() -> int:
+    """Переносит буфер логов распределения из Redis stream в Mongo"""
+    return DispatchLogBuffer.flush()
+
+
+@shared_task(ignore_result=True)
+def archive_history() -> Dict[str, int]:
+    """Периодический перенос старых логов и закрытых заявок в архив"""
+    DispatchLogBuffer.flush()
+    return HistoryArchive.run()
+
+
+@shared_task(ignore_result=True)
+def autoscale_dispatch() -> Optional[Dict]:
+    """Тик автомасштабирования пула воркеров распределения"""
+    if not settings.AUTOSCALE_ENABLED:
+        return None
+    return DispatchAutoscaler.run()
+
+
+@shared_task
+def explain_request(request_id: str, top_n: int = 5, min_score_fraction: float = 0.7) -> Optional[Dict]:
+    """Dry-run распределения существующей заявки: объяснение выбора без назначения"""
+    request = Request.objects(id=request_id).only('params', 'excluded_users').first()
+    if request is None:
+        logger.error(f"Request {request_id} not found")
+        return None
+    request_params = request.params or {}
+    return explain_dispatch(
+        request_params,
+        top_n=top_n,
+        min_score_fraction=min_score_fraction,
+        shard=shard_for_request(request_params),
+        exclude=request.excluded_users,
+    )
@@ -0,0 +1,25 @@
+from core.models import User
+from core.tests.base import ServicesTestCase
+from dispatcher.capacity import ExecutorCapacity
+from dispatcher.columnar import ExecutorRecord
+from dispatcher.score_cache import StaticScoreCache
+from dispatcher.snapshot import ExecutorSnapshot
+
+
+def record(executor_id, **kwargs):
+    return ExecutorRecord(executor_id, f"user-{executor_id}", **kwargs)
+
+
+class DispatcherTestCase(ServicesTestCase):
+    """Тест распределения: кэши процесса (снимок исполнителей, смены, оценки) сбрасываются перед каждым тестом"""
+
+    def setUp(self):
+        super().setUp()
+        ExecutorSnapshot._snapshots.clear()
+        ExecutorSnapshot._indexes.clear()
+        ExecutorCapacity._scheduled.clear()
+        StaticScoreCache.clear()
+
+    @staticmethod
+    def make_user(username, **kwargs):
+        return User(username=username, password="x", **kwargs).save()
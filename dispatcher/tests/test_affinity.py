@@ -0,0 +1,60 @@
+from unittest import mock
+
+from dispatcher.affinity import ExecutorAffinity
+from .base import DispatcherTestCase
+
+
+class ExecutorAffinityTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = str(self.make_user("alice", max_daily_requests=5).id)
+
+    def remember(self, request_id, user_id):
+        pipe = self.redis.pipeline()
+        ExecutorAffinity.remember(request_id, user_id, pipe)
+        return pipe.execute()[-1]
+
+    def test_lookup_outcomes(self):
+        self.remember("parent", self.executor)
+        self.remember("orphan", "000000000000000000000000")
+
+        candidate = ExecutorAffinity.lookup("parent", set(), {self.executor: 2})
+        self.assertEqual((candidate.user_id, candidate.username), (self.executor, "alice"))
+        self.assertEqual((candidate.daily_requests, candidate.max_daily_requests), (2, 5))
+        self.assertIsNone(ExecutorAffinity.lookup("unknown", set(), {}))
+        self.assertIsNone(ExecutorAffinity.lookup("parent", {self.executor}, {}))
+        self.assertIsNone(ExecutorAffinity.lookup("orphan", set(), {}))
+
+        stats = ExecutorAffinity.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["unavailable"]), (1, 1, 2))
+        self.assertEqual((stats["hit_rate"], stats["entries"]), (0.25, 2))
+
+    def test_lookup_does_not_recreate_evicted_entries(self):
+        ExecutorAffinity.lookup("unknown", set(), {})
+        self.assertEqual(self.redis.zcard(ExecutorAffinity.LRU_KEY), 0)
+
+    def test_trim_evicts_least_recently_used(self):
+        with mock.patch("dispatcher.affinity.time.time", side_effect=range(100)):
+            for i in range(12):
+                size = self.remember(f"r{i}", self.executor)
+            # r0 использована последней и остается
+            ExecutorAffinity.lookup("r0", set(), {})
+            with self.settings(AFFINITY_MAX_ENTRIES=10):
+                ExecutorAffinity.trim(11)
+                self.assertEqual(self.redis.zcard(ExecutorAffinity.LRU_KEY), 12)
+                ExecutorAffinity.trim(size)
+
+        mapping = self.redis.hgetall(ExecutorAffinity.MAP_KEY)
+        self.assertEqual(len(mapping), 10)
+        self.assertNotIn(b"r1", mapping)
+        self.assertNotIn(b"r2", mapping)
+        self.assertIn(b"r0", mapping)
+        self.assertIsNone(self.redis.get(ExecutorAffinity.TRIM_LOCK_KEY))
+
+    def test_trim_skipped_while_locked(self):
+        for i in range(12):
+            size = self.remember(f"r{i}", self.executor)
+        self.redis.set(ExecutorAffinity.TRIM_LOCK_KEY, 1)
+        with self.settings(AFFINITY_MAX_ENTRIES=10):
+            ExecutorAffinity.trim(size)
+        self.assertEqual(self.redis.zcard(ExecutorAffinity.LRU_KEY), 12)
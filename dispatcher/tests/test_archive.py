@@ -0,0 +1,105 @@
+import datetime
+
+from rest_framework.test import APIClient
+
+from core import readers
+from core.models import Request
+from dispatcher.archive import HistoryArchive
+from dispatcher.models import DispatchLogs
+from .base import DispatcherTestCase
+
+
+class ArchiveLogsTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hot = DispatchLogs._get_collection()
+        self.db = HistoryArchive._db()
+
+    def log(self, request_id, created_at):
+        DispatchLogs(request_id=request_id, user_id="alice", request_created_at=created_at).save()
+
+    def test_whole_days_move_to_month_archives(self):
+        self.log("r1", datetime.datetime(2026, 8, 31, 23))
+        self.log("r2", datetime.datetime(2026, 9, 1, 8))
+        self.log("r3", datetime.datetime(2026, 9, 2, 10))
+        self.log("r4", datetime.datetime(2026, 9, 3, 9))
+
+        moved = HistoryArchive.archive_logs(datetime.datetime(2026, 9, 3, 12), batch_size=2)
+        self.assertEqual(moved, 3)
+        self.assertEqual([raw["request_id"] for raw in self.hot.find()], ["r4"])
+        self.assertEqual(self.db["dispatch_logs_archive_2026_08"].count_documents({}), 1)
+        self.assertEqual(self.db["dispatch_logs_archive_2026_09"].count_documents({}), 2)
+        self.assertEqual(
+            HistoryArchive.daily_rollups(),
+            {"2026-08-31": 1, "2026-09-01": 1, "2026-09-02": 1},
+        )
+        self.assertEqual(
+            HistoryArchive.daily_rollups(datetime.date(2026, 9, 1), datetime.date(2026, 9, 1)),
+            {"2026-09-01": 1},
+        )
+
+        # Чтение истории видит горячую коллекцию и архивы одним потоком по времени
+        rows = list(readers.iter_dispatch_log_rows())
+        self.assertEqual([row[0] for row in rows], ["r1", "r2", "r3", "r4"])
+        rows = list(readers.iter_dispatch_log_rows(datetime.datetime(2026, 9, 1), datetime.datetime(2026, 9, 2, 23)))
+        self.assertEqual([row[0] for row in rows], ["r2", "r3"])
+
+    def test_interrupted_run_is_repeated_safely(self):
+        self.log("r1", datetime.datetime(2026, 9, 1, 8))
+        # Пачка уже вставлена в архив, но не удалена из горячей коллекции
+        self.db["dispatch_logs_archive_2026_09"].insert_many(list(self.hot.find()))
+
+        self.assertEqual(HistoryArchive.archive_logs(datetime.datetime(2026, 9, 3), batch_size=10), 1)
+        self.assertEqual(self.db["dispatch_logs_archive_2026_09"].count_documents({}), 1)
+        self.assertEqual(HistoryArchive.daily_rollups(), {"2026-09-01": 1})
+        self.assertEqual(self.hot.count_documents({}), 0)
+
+
+class ArchiveRequestsTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=60)
+        self.cutoff = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=31)
+        self.user = self.make_user("alice")
+
+    def request(self, status, **kwargs):
+        request = Request(user=self.user, status=status, **kwargs).save()
+        Request.objects(id=request.id).update_one(set__updated_at=self.old)
+        return request
+
+    def archived_ids(self):
+        names = HistoryArchive._archive_names(HistoryArchive.REQUESTS_ARCHIVE, None, None)
+        return {raw["_id"] for name in names for raw in HistoryArchive._db()[name].find()}
+
+    def test_only_closed_requests_move(self):
+        accepted = self.request("accept")
+        redispatched = self.request("reject", redispatched_at=self.old)
+        rejected = self.request("reject")
+        waiting = self.request("await")
+        fresh = Request(user=self.user, status="accept").save()
+
+        self.assertEqual(HistoryArchive.archive_requests(self.cutoff, batch_size=1), 2)
+        self.assertEqual(self.archived_ids(), {accepted.id, redispatched.id})
+        self.assertEqual(
+            set(Request.objects.values_list("id")), {rejected.id, waiting.id, fresh.id}
+        )
+
+    def test_parent_with_hot_child_stays(self):
+        parent = self.request("reject", redispatched_at=self.old)
+        child = Request(parent=parent, status="await").save()
+
+        self.assertEqual(HistoryArchive.archive_requests(self.cutoff, batch_size=10), 0)
+        Request.objects(id=child.id).update_one(set__status="accept", set__updated_at=self.old)
+        self.assertEqual(HistoryArchive.archive_requests(self.cutoff, batch_size=10), 2)
+        self.assertEqual(self.archived_ids(), {parent.id, child.id})
+
+    def test_archived_request_is_still_readable(self):
+        accepted = self.request("accept", text="done")
+        HistoryArchive.archive_requests(self.cutoff, batch_size=10)
+
+        self.assertEqual(
+            [raw["_id"] for raw in HistoryArchive.find_requests([accepted.id], ["text"])], [accepted.id]
+        )
+        response = APIClient().get(f"/api/requests/{accepted.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["text"], response.data["user"]), ("done", "alice"))
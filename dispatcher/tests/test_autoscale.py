@@ -0,0 +1,80 @@
+from unittest import mock
+
+from celery.exceptions import SoftTimeLimitExceeded
+from django.test import SimpleTestCase, override_settings
+
+from dispatcher import tasks
+from dispatcher.autoscale import DispatchAutoscaler
+from executor_balancer.celery import app
+from .base import DispatcherTestCase
+
+
+@override_settings(
+    AUTOSCALE_MIN_CONCURRENCY=1, AUTOSCALE_MAX_CONCURRENCY=4, AUTOSCALE_DEPTH_PER_PROCESS=10,
+    AUTOSCALE_LATENCY_TARGET=5.0, AUTOSCALE_MAX_LOAD=0.9,
+)
+class DecideTests(SimpleTestCase):
+    def test_grows_on_backlog_or_latency(self):
+        self.assertEqual(DispatchAutoscaler.decide(21, 0.0, 0.1, 2), 1)
+        self.assertEqual(DispatchAutoscaler.decide(0, 6.0, 0.1, 2), 1)
+
+    def test_does_not_grow_past_max(self):
+        self.assertEqual(DispatchAutoscaler.decide(1000, 60.0, 0.1, 4), 0)
+
+    def test_shrinks_when_idle(self):
+        self.assertEqual(DispatchAutoscaler.decide(0, 1.0, 0.1, 2), -1)
+        self.assertEqual(DispatchAutoscaler.decide(0, 1.0, 0.1, 1), 0)
+
+    def test_shrinks_under_cpu_pressure_even_with_backlog(self):
+        self.assertEqual(DispatchAutoscaler.decide(1000, 60.0, 0.95, 2), -1)
+        self.assertEqual(DispatchAutoscaler.decide(1000, 60.0, 0.95, 1), 0)
+
+    def test_holds_between_thresholds(self):
+        # Очередь есть, но укладывается в норму на процесс, и ожидание не выше цели
+        self.assertEqual(DispatchAutoscaler.decide(15, 3.0, 0.5, 2), 0)
+
+
+@override_settings(AUTOSCALE_ENABLED=True, AUTOSCALE_BATCH_DEPTH=100)
+class BatchModeTests(DispatcherTestCase):
+    def test_hysteresis(self):
+        self.assertFalse(DispatchAutoscaler.update_batch_mode(99))
+        self.assertTrue(DispatchAutoscaler.update_batch_mode(100))
+        self.assertTrue(DispatchAutoscaler.batch_mode())
+        # Ниже порога, но не ниже половины - режим остается
+        self.assertTrue(DispatchAutoscaler.update_batch_mode(50))
+        self.assertFalse(DispatchAutoscaler.update_batch_mode(49))
+        self.assertFalse(DispatchAutoscaler.batch_mode())
+        # Выключенный режим половина порога не включает
+        self.assertFalse(DispatchAutoscaler.update_batch_mode(60))
+
+    def test_mode_expires_without_controller(self):
+        with self.settings(AUTOSCALE_INTERVAL=15):
+            DispatchAutoscaler.update_batch_mode(100)
+        self.assertEqual(self.redis.ttl(DispatchAutoscaler.BATCH_MODE_KEY), 45)
+
+
+class DispatchPendingLimitTests(SimpleTestCase):
+    def test_has_own_soft_time_limit(self):
+        self.assertEqual(tasks.dispatch_pending.soft_time_limit, tasks.settings.DISPATCH_PENDING_TIME_LIMIT)
+        self.assertGreater(tasks.dispatch_pending.soft_time_limit, app.conf.task_soft_time_limit)
+
+
+@override_settings(DISPATCH_PENDING_TIME_LIMIT=100)
+@mock.patch.object(tasks, "choose_executor", return_value=object())
+@mock.patch.object(tasks.ExecutorAffinity, "parent_of", return_value=None)
+@mock.patch.object(tasks, "get_pending_requests")
+class DispatchPendingTests(SimpleTestCase):
+    def requests(self, count):
+        return [mock.Mock(id=i, params={}, excluded_users=[]) for i in range(count)]
+
+    def test_stops_between_requests_when_budget_is_spent(self, pending, *_):
+        pending.return_value = self.requests(3)
+        with mock.patch.object(tasks, "commit_assignment", return_value="u") as commit, \
+                mock.patch.object(tasks.time, "monotonic", side_effect=[0, 10, 79, 80]):
+            self.assertEqual(tasks.dispatch_pending(), 2)
+        self.assertEqual(commit.call_count, 2)
+
+    def test_soft_time_limit_returns_dispatched_count(self, pending, *_):
+        pending.return_value = self.requests(3)
+        with mock.patch.object(tasks, "commit_assignment", side_effect=["u", SoftTimeLimitExceeded()]):
+            self.assertEqual(tasks.dispatch_pending(), 1)
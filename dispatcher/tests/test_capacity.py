@@ -0,0 +1,131 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.models import Request, User
+from dispatcher.capacity import CapacityState, ExecutorCapacity, in_shift
+from dispatcher.locks import RequestCounter
+from .base import DispatcherTestCase
+
+
+class InShiftTests(SimpleTestCase):
+    # 2026-10-19 - понедельник (weekday 0)
+    MONDAY = datetime.datetime(2026, 10, 19)
+
+    def at(self, days, hours, minutes=0):
+        return self.MONDAY + datetime.timedelta(days=days, hours=hours, minutes=minutes)
+
+    def test_no_shifts_means_always_available(self):
+        self.assertTrue(in_shift([], self.at(0, 3)))
+
+    def test_day_shift_bounds(self):
+        shifts = [{"days": [0], "start": "09:00", "end": "18:00"}]
+        self.assertFalse(in_shift(shifts, self.at(0, 8, 59)))
+        self.assertTrue(in_shift(shifts, self.at(0, 9)))
+        self.assertTrue(in_shift(shifts, self.at(0, 17, 59)))
+        self.assertFalse(in_shift(shifts, self.at(0, 18)))
+        self.assertFalse(in_shift(shifts, self.at(1, 10)))
+
+    def test_empty_days_means_every_day(self):
+        shifts = [{"days": [], "start": "09:00", "end": "18:00"}]
+        for day in range(7):
+            self.assertTrue(in_shift(shifts, self.at(day, 12)))
+
+    def test_overnight_shift_continues_into_next_day(self):
+        shifts = [{"days": [0], "start": "22:00", "end": "06:00"}]
+        self.assertTrue(in_shift(shifts, self.at(0, 23, 30)))
+        self.assertTrue(in_shift(shifts, self.at(1, 5, 59)))
+        self.assertFalse(in_shift(shifts, self.at(1, 6)))
+        # Ночь на понедельник начинается в воскресенье, которого в смене нет
+        self.assertFalse(in_shift(shifts, self.at(0, 2)))
+
+    def test_overnight_shift_wraps_from_sunday_to_monday(self):
+        shifts = [{"days": [6], "start": "20:00", "end": "02:00"}]
+        self.assertTrue(in_shift(shifts, self.at(0, 1)))
+        self.assertFalse(in_shift(shifts, self.at(0, 3)))
+        self.assertTrue(in_shift(shifts, self.at(6, 21)))
+
+    def test_shift_until_midnight(self):
+        shifts = [{"days": [0], "start": "18:00", "end": "24:00"}]
+        self.assertTrue(in_shift(shifts, self.at(0, 23, 59)))
+        self.assertFalse(in_shift(shifts, self.at(1, 0)))
+
+
+@mock.patch.object(ExecutorCapacity, "_now", return_value=datetime.datetime(2026, 10, 19, 12, tzinfo=datetime.UTC))
+class ExecutorCapacityTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.daily = str(self.make_user("daily", max_daily_requests=5).id)
+        self.hourly = str(self.make_user("hourly", max_hourly_requests=2).id)
+        self.in_flight = str(self.make_user("in-flight", max_in_flight=1).id)
+        self.shift = str(self.make_user(
+            "shift", shifts=[{"days": [0], "start": "09:00", "end": "18:00"}]
+        ).id)
+        self.free = str(self.make_user("free").id)
+
+    def test_exhausted_caps(self, _now):
+        state = CapacityState(
+            daily={self.daily: 5, self.free: 100}, hourly={self.hourly: 2}, in_flight={self.in_flight: 1}
+        )
+        with self.settings(CAPACITY_TIMEZONE="UTC"):
+            self.assertEqual(ExecutorCapacity.unavailable(state), {self.daily, self.hourly, self.in_flight})
+
+    def test_below_caps(self, _now):
+        state = CapacityState(daily={self.daily: 4}, hourly={self.hourly: 1}, in_flight={self.in_flight: 0})
+        with self.settings(CAPACITY_TIMEZONE="UTC"):
+            self.assertEqual(ExecutorCapacity.unavailable(state), set())
+
+    def test_off_shift(self, now):
+        now.return_value = datetime.datetime(2026, 10, 19, 22, tzinfo=datetime.UTC)
+        with self.settings(CAPACITY_TIMEZONE="UTC"):
+            self.assertEqual(ExecutorCapacity.unavailable(CapacityState()), {self.shift})
+
+    def test_shift_uses_capacity_timezone(self, now):
+        # 07:00 UTC - 10:00 в Москве, смена 09:00-18:00 уже идет
+        now.return_value = datetime.datetime(2026, 10, 19, 7, tzinfo=datetime.UTC)
+        with self.settings(CAPACITY_TIMEZONE="Europe/Moscow"):
+            self.assertNotIn(self.shift, ExecutorCapacity.off_shift())
+        with self.settings(CAPACITY_TIMEZONE="UTC"):
+            self.assertIn(self.shift, ExecutorCapacity.off_shift())
+
+    def test_counters_of_unknown_executors_are_ignored(self, _now):
+        with self.settings(CAPACITY_TIMEZONE="UTC"):
+            self.assertEqual(ExecutorCapacity.unavailable(CapacityState(daily={"gone": 10 ** 6})), set())
+
+    def test_reserve_release_and_peek(self, _now):
+        ExecutorCapacity.reserve(self.in_flight)
+        state = ExecutorCapacity.peek()
+        self.assertEqual((state.hourly, state.in_flight), ({self.in_flight: 1}, {self.in_flight: 1}))
+
+        ExecutorCapacity.release(self.in_flight)
+        ExecutorCapacity.release(self.in_flight)
+        self.assertEqual(ExecutorCapacity.peek().in_flight, {self.in_flight: 0})
+
+    def test_hourly_window_rolls_over(self, now):
+        ExecutorCapacity.reserve(self.hourly)
+        ExecutorCapacity.reserve(self.hourly)
+        self.assertEqual(ExecutorCapacity.peek().hourly, {self.hourly: 2})
+        now.return_value = datetime.datetime(2026, 10, 19, 13, tzinfo=datetime.UTC)
+        self.assertEqual(ExecutorCapacity.peek().hourly, {})
+
+    def test_fetch_resyncs_in_flight_from_mongo(self, _now):
+        user = User.objects.get(id=self.in_flight)
+        Request(user=user, status="await").save()
+        Request(user=user, status="accept").save()
+        self.redis.hset(ExecutorCapacity.IN_FLIGHT_KEY, self.in_flight, 5)
+
+        state = ExecutorCapacity.fetch()
+        self.assertEqual(state.in_flight, {self.in_flight: 1})
+        # Следующее чтение в пределах UPDATE_INTERVAL идет из Redis
+        self.redis.hincrby(ExecutorCapacity.IN_FLIGHT_KEY, self.in_flight, 1)
+        self.assertEqual(ExecutorCapacity.fetch().in_flight, {self.in_flight: 2})
+
+    def test_peek_does_not_touch_mongo(self, _now):
+        self.redis.hset(RequestCounter.COUNTS_CACHE_KEY, mapping={RequestCounter.SENTINEL: 0, self.daily: 3})
+        with mock.patch.object(RequestCounter, "get_counts_from_db") as counts_from_db, \
+                mock.patch.object(ExecutorCapacity, "resync_in_flight") as resync:
+            state = ExecutorCapacity.peek()
+        counts_from_db.assert_not_called()
+        resync.assert_not_called()
+        self.assertEqual(state.daily, {self.daily: 3})
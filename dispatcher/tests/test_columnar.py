@@ -0,0 +1,32 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dispatcher.columnar import ExecutorColumns, ExecutorRecord
+from .base import record
+
+
+class ExecutorColumnsTests(SimpleTestCase):
+    def test_pack_unpack_roundtrip(self):
+        records = [
+            ExecutorRecord(
+                "a", "alice", 10, {"region": "r1", "level": 3, "rate": 1.5, "active": True,
+                                   "since": datetime.datetime(2026, 1, 2, 3, 4, 5)},
+                4, 2, [{"days": [0, 1], "start": "09:00", "end": "18:00"}],
+            ),
+            ExecutorRecord("b", "bob", None, {"region": "r2", "level": 2.5, "mixed": 1}),
+            ExecutorRecord("c", "carol", 0, {"mixed": "x"}),
+        ]
+        columns = ExecutorColumns.unpack(ExecutorColumns.from_records(records, 7).pack())
+        self.assertEqual(columns.version, 7)
+        self.assertEqual(columns.to_records(), records)
+
+    def test_empty_snapshot(self):
+        columns = ExecutorColumns.unpack(ExecutorColumns.from_records([], 3).pack())
+        self.assertEqual((columns.version, columns.to_records()), (3, []))
+
+    def test_unknown_format_is_rejected(self):
+        blob = ExecutorColumns.from_records([record("a")], 1).pack()
+        with mock.patch.object(ExecutorColumns, "FORMAT_VERSION", ExecutorColumns.FORMAT_VERSION + 1):
+            self.assertIsNone(ExecutorColumns.unpack(blob))
@@ -0,0 +1,96 @@
+import datetime
+import uuid
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from redis.client import Pipeline
+
+from core.models import Request
+from core.response_cache import DAILY_SUMMARY, ResponseCache
+from dispatcher.affinity import ExecutorAffinity
+from dispatcher.candidate_info import CandidateInfo
+from dispatcher.capacity import ExecutorCapacity
+from dispatcher.idempotency import DispatchDeduplicator
+from dispatcher.locks import RequestCounter
+from dispatcher.log_buffer import DispatchLogBuffer
+from dispatcher.metrics import QueueWaitHistogram
+from dispatcher.tasks import commit_assignment
+from .base import DispatcherTestCase
+
+
+class CommitAssignmentTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        # INCR версии кэша django-redis делает Lua-скриптом, которого fakeredis без lupa не исполняет
+        patcher = mock.patch.object(ResponseCache, "bump")
+        self.bump = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = self.make_user("alice")
+        self.alice_id = str(self.alice.id)
+        self.parent = Request(status="accept").save()
+        self.request = Request(
+            parent=self.parent, priority=8,
+            created_at=datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=2),
+        ).save()
+
+    def candidate(self, user_id=None, username="alice"):
+        return CandidateInfo(user_id or self.alice_id, 1.0, 1.0, 0, None, username=username)
+
+    def listen(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)("dispatched", channel)
+        return lambda: async_to_sync(layer.receive)(channel)
+
+    def test_assignment_is_committed_in_one_redis_round_trip(self):
+        receive = self.listen()
+        executions = []
+        execute = Pipeline.execute
+
+        def record(pipe, *args, **kwargs):
+            executions.append((pipe.transaction, len(pipe)))
+            return execute(pipe, *args, **kwargs)
+
+        task_id = uuid.uuid4()
+        with mock.patch.object(Pipeline, "execute", record):
+            self.assertEqual(commit_assignment(self.request, self.candidate(), task_id), self.alice_id)
+        self.assertEqual(len(executions), 1)
+        self.assertTrue(executions[0][0])
+        self.bump.assert_called_once_with(DAILY_SUMMARY)
+
+        self.assertEqual(Request.objects.get(id=self.request.id).user.id, self.alice.id)
+        self.assertEqual(self.redis.hget(RequestCounter.COUNTS_CACHE_KEY, self.alice_id), b"1")
+        self.assertEqual(DispatchDeduplicator.get_result(str(self.request.id)), self.alice_id)
+        state = ExecutorCapacity.peek()
+        self.assertEqual((state.hourly, state.in_flight), ({self.alice_id: 1}, {self.alice_id: 1}))
+        self.assertEqual(QueueWaitHistogram.snapshot()["high"]["buckets"]["5"], 1)
+        self.assertEqual(self.redis.hget(ExecutorAffinity.MAP_KEY, str(self.request.id)), self.alice_id.encode())
+
+        [(_, fields)] = self.redis.xrange(DispatchLogBuffer.STREAM_KEY)
+        self.assertEqual(fields[b"user_id"], b"alice")
+        self.assertEqual(fields[b"task_id"], str(task_id).encode())
+        self.assertEqual(fields[b"parent_id"], str(self.parent.id).encode())
+
+        message = receive()
+        self.assertEqual((message["request_id"], message["user"]), (str(self.request.id), self.alice_id))
+
+    def test_username_is_taken_from_snapshot(self):
+        commit_assignment(self.request, self.candidate(username=None), uuid.uuid4())
+        [(_, fields)] = self.redis.xrange(DispatchLogBuffer.STREAM_KEY)
+        self.assertEqual(fields[b"user_id"], b"alice")
+
+    def test_unknown_executor_is_not_assigned(self):
+        self.assertIsNone(commit_assignment(self.request, self.candidate("0" * 24, None), uuid.uuid4()))
+        self.assertIsNone(Request.objects.get(id=self.request.id).user)
+
+    def test_second_delivery_keeps_first_assignment(self):
+        bob = self.make_user("bob")
+        commit_assignment(self.request, self.candidate(), uuid.uuid4())
+
+        assigned = commit_assignment(self.request, self.candidate(str(bob.id), "bob"), uuid.uuid4())
+        self.assertEqual(assigned, self.alice_id)
+        self.assertEqual(Request.objects.get(id=self.request.id).user.id, self.alice.id)
+        self.assertEqual(self.redis.hgetall(RequestCounter.COUNTS_CACHE_KEY), {self.alice_id.encode(): b"1"})
+        self.assertEqual(ExecutorCapacity.peek().in_flight, {self.alice_id: 1})
+        self.assertEqual(self.redis.xlen(DispatchLogBuffer.STREAM_KEY), 1)
@@ -0,0 +1,65 @@
+import datetime
+from unittest import mock
+
+from core.models import Request
+from dispatcher.metrics import QueueWaitHistogram
+from dispatcher.tasks import escalate_overdue_requests, get_pending_requests
+from .base import DispatcherTestCase
+
+
+class PendingOrderTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime.datetime.now(datetime.UTC)
+        self.created = self.now - datetime.timedelta(minutes=10)
+
+    def pending(self, name, **kwargs):
+        kwargs.setdefault("created_at", self.created)
+        return Request(text=name, **kwargs).save()
+
+    def test_deadlines_first_then_priority(self):
+        self.pending("late", deadline=self.now + datetime.timedelta(hours=2))
+        self.pending("soon", deadline=self.now + datetime.timedelta(hours=1), priority=0)
+        self.pending("low", priority=1)
+        self.pending("high-new", priority=5, created_at=self.created + datetime.timedelta(seconds=1))
+        self.pending("high-old", priority=5)
+        self.pending("fresh", priority=9, created_at=self.now)
+        self.pending("taken", status="await", priority=9)
+
+        batch = get_pending_requests(10, self.now - datetime.timedelta(minutes=1))
+        self.assertEqual([r.text for r in batch], ["soon", "late", "high-old", "high-new", "low"])
+        self.assertEqual([r.text for r in get_pending_requests(3, self.now)], ["soon", "late", "high-old"])
+
+
+class EscalationTests(DispatcherTestCase):
+    def test_overdue_requests_are_escalated_once(self):
+        now = datetime.datetime.now(datetime.UTC)
+        overdue = Request(params={"a": {"value": 1}}, priority=1, deadline=now - datetime.timedelta(minutes=1)).save()
+        Request(priority=1, deadline=now + datetime.timedelta(hours=1)).save()
+
+        with mock.patch("dispatcher.tasks.enqueue_dispatch") as enqueue:
+            self.assertEqual(escalate_overdue_requests(), 1)
+            self.assertEqual(escalate_overdue_requests(), 0)
+        enqueue.assert_called_once_with(str(overdue.id), {"a": {"value": 1}}, Request.MAX_PRIORITY)
+
+        overdue.reload()
+        self.assertEqual(overdue.priority, Request.MAX_PRIORITY)
+        self.assertIsNotNone(overdue.escalated_at)
+
+
+class QueueWaitHistogramTests(DispatcherTestCase):
+    def test_snapshot_is_cumulative_per_priority_class(self):
+        QueueWaitHistogram.observe(9, 0.05)
+        QueueWaitHistogram.observe(8, 2)
+        pipe = self.redis.pipeline()
+        QueueWaitHistogram.observe(None, 7200, pipe)
+        pipe.execute()
+
+        snapshot = QueueWaitHistogram.snapshot()
+        high = snapshot["high"]
+        self.assertEqual((high["count"], high["avg_seconds"]), (2, 1.025))
+        self.assertEqual((high["buckets"]["0.1"], high["buckets"]["1"], high["buckets"]["5"]), (1, 1, 2))
+        self.assertEqual(high["buckets"]["+Inf"], 2)
+        self.assertEqual(snapshot["low"]["buckets"]["3600"], 0)
+        self.assertEqual(snapshot["low"]["buckets"]["+Inf"], 1)
+        self.assertEqual(snapshot["normal"]["count"], 0)
@@ -0,0 +1,27 @@
+from unittest import mock
+
+from core.models import Request
+from dispatcher.idempotency import DispatchDeduplicator
+from dispatcher.tasks import load_for_dispatch
+from .base import DispatcherTestCase
+
+
+class DispatchDeduplicatorTests(DispatcherTestCase):
+    def test_pending_request_is_loaded(self):
+        request = Request(text="work").save()
+        loaded, dispatched_to = load_for_dispatch(str(request.id))
+        self.assertEqual((loaded.id, dispatched_to), (request.id, None))
+
+    def test_assigned_request_is_remembered(self):
+        user = self.make_user("executor")
+        request = Request(user=user, status="await").save()
+
+        self.assertEqual(load_for_dispatch(str(request.id)), (None, str(user.id)))
+        self.assertEqual(DispatchDeduplicator.get_result(str(request.id)), str(user.id))
+        # Повторная доставка отвечает из Redis, не читая заявку из Mongo
+        with mock.patch.object(Request, "objects") as objects:
+            self.assertEqual(load_for_dispatch(str(request.id)), (None, str(user.id)))
+        objects.get.assert_not_called()
+
+    def test_missing_request(self):
+        self.assertEqual(load_for_dispatch("0" * 24), (None, None))
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dispatcher import tasks
+from dispatcher.local_queue import LocalDispatchQueue
+
+
+class LocalDispatchQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.queue = self.loop.run_until_complete(self.make_queue())
+        for name, value in (("_loop", self.loop), ("_queue", self.queue), ("_queued", set())):
+            patcher = mock.patch.object(LocalDispatchQueue, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    async def make_queue():
+        return asyncio.PriorityQueue()
+
+    def run_pending_callbacks(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def drain(self):
+        return [self.queue.get_nowait()[2] for _ in range(self.queue.qsize())]
+
+    def test_put_orders_by_priority_then_arrival(self):
+        LocalDispatchQueue.put("low", 0)
+        LocalDispatchQueue.put("high", 9)
+        LocalDispatchQueue.put("low-2", None)
+        LocalDispatchQueue.put("mid", 5)
+        self.run_pending_callbacks()
+        self.assertEqual(self.drain(), ["high", "mid", "low", "low-2"])
+
+    def test_put_is_thread_safe_and_deduplicated(self):
+        threads = [threading.Thread(target=LocalDispatchQueue.put, args=("r1", 1)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.run_pending_callbacks()
+        self.assertEqual(LocalDispatchQueue.size(), 1)
+
+    def test_put_without_loop_is_left_for_recovery(self):
+        with mock.patch.object(LocalDispatchQueue, "_loop", None):
+            LocalDispatchQueue.put("r1", 1)
+        self.run_pending_callbacks()
+        self.assertEqual(LocalDispatchQueue.size(), 0)
+
+    def test_worker_dispatches_and_allows_requeue(self):
+        dispatched = []
+
+        async def work():
+            worker = asyncio.ensure_future(LocalDispatchQueue._worker())
+            await self.queue.join()
+            worker.cancel()
+
+        with mock.patch.object(LocalDispatchQueue, "dispatch", side_effect=dispatched.append), \
+                mock.patch.object(LocalDispatchQueue, "_executor", None):
+            LocalDispatchQueue.put("r1", 1)
+            LocalDispatchQueue.put("r2", 2)
+            self.run_pending_callbacks()
+            self.loop.run_until_complete(work())
+        self.assertEqual(dispatched, ["r2", "r1"])
+        self.assertEqual(LocalDispatchQueue._queued, set())
+
+    def test_submit_runs_in_loop_and_logs_failures(self):
+        calls = []
+
+        def job(value):
+            calls.append(value)
+            raise RuntimeError("boom")
+
+        LocalDispatchQueue.submit(job, 1)
+        self.assertEqual(calls, [])
+        with self.assertLogs("dispatcher.local_queue", "ERROR"):
+            self.run_pending_callbacks()
+            self.loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self.loop)))
+        self.assertEqual(calls, [1])
+
+    def test_submit_without_loop_runs_inline(self):
+        job = mock.Mock()
+        with mock.patch.object(LocalDispatchQueue, "_loop", None):
+            LocalDispatchQueue.submit(job, 1, 2)
+        job.assert_called_once_with(1, 2)
+
+    def test_recover_requeues_pending_requests(self):
+        pending = [mock.Mock(id="r1", priority=0), mock.Mock(id="r2", priority=7)]
+        with mock.patch.object(tasks, "get_pending_requests", return_value=pending):
+            LocalDispatchQueue.recover(0)
+        self.run_pending_callbacks()
+        self.assertEqual(self.drain(), ["r2", "r1"])
+
+
+@mock.patch.object(tasks, "commit_assignment", return_value="u1")
+@mock.patch.object(tasks, "choose_executor")
+@mock.patch.object(tasks, "load_for_dispatch")
+class LocalDispatchTests(SimpleTestCase):
+    def setUp(self):
+        self.request = mock.Mock(params={"region": "r1"}, excluded_users=[], parent=None)
+
+    def test_falls_back_from_shard_to_all_executors(self, load, choose, commit):
+        load.return_value = (self.request, None)
+        candidate = mock.Mock()
+        choose.side_effect = [None, candidate]
+        with mock.patch("dispatcher.local_queue.shard_for_request", return_value="r1"):
+            self.assertEqual(LocalDispatchQueue.dispatch("r1"), "u1")
+        self.assertEqual(choose.call_args_list[0].kwargs["shard"], "r1")
+        self.assertNotIn("shard", choose.call_args_list[1].kwargs)
+        self.assertIs(commit.call_args.args[1], candidate)
+
+    def test_already_dispatched_request_is_skipped(self, load, choose, commit):
+        load.return_value = (None, "u2")
+        self.assertEqual(LocalDispatchQueue.dispatch("r1"), "u2")
+        choose.assert_not_called()
+        commit.assert_not_called()
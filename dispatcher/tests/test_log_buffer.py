@@ -0,0 +1,73 @@
+import datetime
+import uuid
+from unittest import mock
+
+from dispatcher.log_buffer import DispatchLogBuffer
+from dispatcher.models import DispatchLogs
+from .base import DispatcherTestCase
+
+
+class DispatchLogBufferTests(DispatcherTestCase):
+    CREATED_AT = datetime.datetime(2026, 10, 19, 9, 30)
+
+    def append(self, request_id, task_id=None, **kwargs):
+        return DispatchLogBuffer.append(
+            request_id, "alice", task_id or uuid.uuid4(), kwargs.get("parent_id"), self.CREATED_AT
+        )
+
+    def stored(self):
+        return sorted((log.request_id, log.parent_id) for log in DispatchLogs.objects)
+
+    def crash_reading(self):
+        """Другой процесс прочитал записи через consumer group и упал до XACK"""
+        self.redis.xreadgroup(DispatchLogBuffer.GROUP, "dead", {DispatchLogBuffer.STREAM_KEY: ">"})
+
+    def test_flush_moves_buffer_to_mongo(self):
+        self.assertTrue(self.append("r1"))
+        self.append("r2", parent_id="r1")
+        self.assertEqual(DispatchLogs.objects.count(), 0)
+
+        self.assertEqual(DispatchLogBuffer.flush(), 2)
+        self.assertEqual(self.stored(), [("r1", None), ("r2", "r1")])
+        self.assertEqual(DispatchLogs.objects.get(request_id="r1").request_created_at, self.CREATED_AT)
+        self.assertEqual(self.redis.xlen(DispatchLogBuffer.STREAM_KEY), 0)
+        self.assertEqual(DispatchLogBuffer.flush(), 0)
+
+    def test_entries_of_crashed_consumer_are_claimed(self):
+        DispatchLogBuffer.flush()  # создает consumer group
+        self.append("r1")
+        self.crash_reading()
+
+        self.assertEqual(DispatchLogBuffer.flush(), 0)
+        with mock.patch.object(DispatchLogBuffer, "CLAIM_IDLE_MS", 0):
+            self.assertEqual(DispatchLogBuffer.flush(), 1)
+        self.assertEqual(self.stored(), [("r1", None)])
+        self.assertEqual(self.redis.xpending(DispatchLogBuffer.STREAM_KEY, DispatchLogBuffer.GROUP)["pending"], 0)
+
+    def test_redelivered_entries_are_not_duplicated(self):
+        task_id = uuid.uuid4()
+        self.append("r1", task_id)
+        self.append("r1", task_id)
+        self.assertEqual(DispatchLogBuffer.flush(), 1)
+
+        # Вставка прошла, а XACK нет: запись доставляется повторно
+        self.append("r1", task_id)
+        self.assertEqual(DispatchLogBuffer.flush(), 0)
+        self.assertEqual(self.stored(), [("r1", None)])
+
+    def test_unbuffered_mode_writes_directly(self):
+        with self.settings(DISPATCH_LOG_BUFFER=False):
+            self.assertFalse(self.append("r1"))
+        self.assertEqual(self.stored(), [("r1", None)])
+        self.assertEqual(self.redis.exists(DispatchLogBuffer.STREAM_KEY), 0)
+
+    def test_flush_is_scheduled_once_per_interval(self):
+        with self.settings(DISPATCH_LOG_FLUSH_SIZE=2), mock.patch("dispatcher.tasks.send_task") as send_task:
+            DispatchLogBuffer.schedule_flush(1)
+            send_task.assert_not_called()
+            DispatchLogBuffer.schedule_flush(2)
+            DispatchLogBuffer.schedule_flush(3)
+            send_task.assert_called_once()
+            DispatchLogBuffer.flush()
+            DispatchLogBuffer.schedule_flush(2)
+        self.assertEqual(send_task.call_count, 2)
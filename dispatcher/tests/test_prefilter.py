@@ -0,0 +1,64 @@
+import datetime
+
+from django.test import SimpleTestCase
+
+from dispatcher.prefilter import NO_MATCH, build_prefilter, condition_filter
+from dispatcher.snapshot import ExecutorSnapshot
+from .base import DispatcherTestCase
+
+
+class BuildPrefilterTests(SimpleTestCase):
+    def test_heavy_conditions_are_mandatory(self):
+        params = {
+            "region": {"value": "r1", "height": 5},
+            "level": {"value": 3, "operator": "GTE", "height": 1},
+        }
+        self.assertEqual(build_prefilter(params, 0.7), {"$and": [
+            {"params_kv": {"$elemMatch": {"k": "region", "v": {"$in": ["r1"]}}}},
+        ]})
+
+    def test_any_match_is_enough_without_mandatory_conditions(self):
+        params = {
+            "region": {"value": "r1"},
+            "level": {"value": 3, "operator": "GTE"},
+            "active": {"value": True},
+            "ignored": {"value": "x", "height": 0},
+        }
+        self.assertEqual(build_prefilter(params, 0.3), {"$or": [
+            {"params_kv": {"$elemMatch": {"k": "region", "v": {"$in": ["r1"]}}}},
+            {"params_kv": {"$elemMatch": {"k": "level", "v": {"$gte": 3}}}},
+            {"params_kv": {"$elemMatch": {"k": "active", "v": {"$in": [True, 1]}}}},
+        ]})
+
+    def test_no_match(self):
+        # Обязательное условие не выражается фильтром Mongo
+        self.assertIs(build_prefilter({"name": {"value": "x", "operator": "ICONTAINS"}}, 0.7), NO_MATCH)
+        # Ни одно условие не может совпасть
+        params = {"a": {"value": None}, "b": {"value": "x", "operator": "ICONTAINS"}}
+        self.assertIs(build_prefilter(params, 0.3), NO_MATCH)
+
+    def test_filter_not_needed(self):
+        self.assertIsNone(build_prefilter({}, 0.7))
+        self.assertIsNone(build_prefilter({"region": {"value": "r1"}}, 0))
+        self.assertIsNone(build_prefilter({"region": {"value": "r1", "height": 0}}, 0.7))
+
+    def test_numbers_match_bools_like_python(self):
+        self.assertEqual(
+            condition_filter("flag", {"value": 1})["params_kv"]["$elemMatch"]["v"], {"$in": [1, True]}
+        )
+        self.assertEqual(
+            condition_filter("since", {"value": "2026-01-02T03:04:05Z", "operator": "GT"})
+            ["params_kv"]["$elemMatch"]["v"],
+            {"$gt": datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)},
+        )
+
+
+class PrefilterQueryTests(DispatcherTestCase):
+    def test_query_selects_only_possible_candidates(self):
+        with self.settings(PARAMS_ATTRIBUTE_PATTERN=True):
+            self.make_user("north", params={"region": "r1", "level": 1})
+            self.make_user("south", params={"region": "r2", "level": 5})
+            self.make_user("none", params={})
+            params = {"region": {"value": "r1"}, "level": {"value": 3, "operator": "GTE"}}
+            records = ExecutorSnapshot.load_from_db(query=build_prefilter(params, 0.3))
+        self.assertEqual(sorted(r.username for r in records), ["north", "south"])
@@ -0,0 +1,105 @@
+import datetime
+from unittest import mock
+
+from rest_framework.test import APIClient
+
+from core.models import Request
+from dispatcher.capacity import ExecutorCapacity
+from dispatcher.redispatch import RedispatchEngine
+from .base import DispatcherTestCase
+
+
+@mock.patch("dispatcher.tasks.enqueue_dispatch")
+class RedispatchEngineTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = self.make_user("old")
+        self.old_id = str(self.old.id)
+        self.stale_at = datetime.datetime.now(datetime.UTC) - datetime.timedelta(hours=1)
+
+    def assigned(self, status, **kwargs):
+        request = Request(user=self.old, status=status, params={"a": {"value": 1}}, priority=5, **kwargs).save()
+        Request.objects(id=request.id).update_one(set__updated_at=self.stale_at)
+        return str(request.id)
+
+    def child_of(self, request_id):
+        return Request.objects.get(parent=request_id)
+
+    def test_rejected_request_gets_a_child(self, enqueue):
+        request_id = self.assigned("reject", excluded_users=["first"])
+
+        self.assertEqual(RedispatchEngine.find_stale(10), [request_id])
+        child_ids = RedispatchEngine.redispatch([request_id])
+        child = self.child_of(request_id)
+        self.assertEqual(child_ids, [str(child.id)])
+        self.assertEqual(child.excluded_users, ["first", self.old_id])
+        self.assertEqual((child.params, child.priority, child.status), ({"a": {"value": 1}}, 5, "processed"))
+        enqueue.assert_called_once_with(str(child.id), {"a": {"value": 1}}, 5)
+
+        # Повторный обход заявку уже не видит, повторный захват ничего не создает
+        self.assertEqual(RedispatchEngine.find_stale(10), [])
+        self.assertEqual(RedispatchEngine.redispatch([request_id]), [])
+
+    def test_stale_await_is_closed_and_releases_in_flight(self, enqueue):
+        request_id = self.assigned("await")
+        fresh_id = str(Request(user=self.old, status="await").save().id)
+        ExecutorCapacity.reserve(self.old_id)
+        ExecutorCapacity.reserve(self.old_id)
+
+        with self.settings(REDISPATCH_AWAIT_TIMEOUT=60):
+            self.assertEqual(RedispatchEngine.find_stale(10), [request_id])
+        RedispatchEngine.redispatch([request_id])
+
+        original = Request.objects.get(id=request_id)
+        self.assertEqual(original.status, "reject")
+        self.assertIsNotNone(original.redispatched_at)
+        self.assertEqual(ExecutorCapacity.peek().in_flight, {self.old_id: 1})
+        self.assertTrue(ExecutorCapacity.consume_tracked(request_id))
+        self.assertEqual(self.child_of(request_id).excluded_users, [self.old_id])
+        self.assertEqual(Request.objects.get(id=fresh_id).status, "await")
+
+    def test_accepted_in_the_meantime_is_not_claimed(self, enqueue):
+        request_id = self.assigned("await")
+        Request.objects(id=request_id).update_one(set__status="accept")
+
+        self.assertEqual(RedispatchEngine.redispatch([request_id]), [])
+        self.assertEqual(Request.objects.get(id=request_id).status, "accept")
+        enqueue.assert_not_called()
+
+    def test_attempts_are_limited(self, enqueue):
+        request_id = self.assigned("reject", excluded_users=["a", "b", "c"])
+        self.assertEqual(RedispatchEngine.redispatch([request_id]), [])
+        self.assertEqual(Request.objects(parent=request_id).count(), 0)
+        # Заявка захвачена и больше не попадает в обход
+        self.assertEqual(RedispatchEngine.find_stale(10), [])
+
+
+class StatusChangeTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user("executor")
+        self.user_id = str(self.user.id)
+        self.client = APIClient()
+
+    def patch(self, request_id, status):
+        return self.client.put(f"/api/requests/{request_id}/", {"status": status}, format="json")
+
+    def test_reject_releases_and_redispatches(self):
+        request = Request(user=self.user, status="await").save()
+        ExecutorCapacity.reserve(self.user_id)
+
+        with mock.patch("dispatcher.tasks.send_task") as send_task:
+            response = self.patch(request.id, "reject")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ExecutorCapacity.peek().in_flight, {self.user_id: 0})
+        self.assertEqual(send_task.call_args.args[1], [str(request.id)])
+
+    def test_redispatched_request_cannot_be_accepted(self):
+        request = Request(user=self.user, status="await").save()
+        RedispatchEngine.claim([str(request.id)])
+
+        with mock.patch("dispatcher.tasks.send_task") as send_task:
+            response = self.patch(request.id, "accept")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Request.objects.get(id=request.id).status, "reject")
+        send_task.assert_not_called()
@@ -0,0 +1,92 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dispatcher.score_cache import StaticScoreCache
+from dispatcher.strategies import get_strategy
+from .base import record
+
+
+class StaticScoreCacheTests(SimpleTestCase):
+    PARAMS = {"region": {"value": "r1", "operator": "EQ", "height": 1.0}}
+
+    def setUp(self):
+        StaticScoreCache.clear()
+        self.addCleanup(StaticScoreCache.clear)
+        self.strategy = get_strategy("weighted_score")
+        self.executors = [record("a", params={"region": "r1"}), record("b", params={"region": "r2"})]
+
+    def score_all(self, executors, params=None):
+        with mock.patch.object(
+            self.strategy.scorer, "calculate_parameter_scores",
+            wraps=self.strategy.scorer.calculate_parameter_scores,
+        ) as calculate:
+            candidates = self.strategy.score_all(executors, params or self.PARAMS, {})
+        return candidates, calculate.call_count
+
+    def test_hit_reuses_scores(self):
+        first, computed = self.score_all(self.executors)
+        self.assertEqual(computed, 2)
+        second, computed = self.score_all(self.executors)
+        self.assertEqual(computed, 0)
+        self.assertEqual(
+            [(c.user_id, c.total_score, c.is_fallback) for c in first],
+            [(c.user_id, c.total_score, c.is_fallback) for c in second],
+        )
+        self.assertFalse(second[0].is_fallback)
+        self.assertTrue(second[1].is_fallback)
+
+    def test_changed_record_is_rescored(self):
+        self.score_all(self.executors)
+        changed = [self.executors[0], record("b", params={"region": "r1"})]
+        candidates, computed = self.score_all(changed)
+        self.assertEqual(computed, 1)
+        self.assertFalse(candidates[1].is_fallback)
+
+    def test_key_includes_params_and_threshold(self):
+        scores = StaticScoreCache.scores(self.PARAMS, 0.7)
+        self.assertIs(StaticScoreCache.scores({"region": dict(self.PARAMS["region"])}, 0.7), scores)
+        self.assertIsNot(StaticScoreCache.scores(self.PARAMS, 0.5), scores)
+
+    def test_eviction_keeps_total_under_limit(self):
+        with self.settings(SCORE_CACHE_MAX_ENTRIES=4):
+            for value in ("r1", "r2", "r3"):
+                self.score_all(self.executors, {"region": {"value": value}})
+            self.assertEqual(StaticScoreCache._total, 4)
+            self.assertEqual(len(StaticScoreCache._entries), 2)
+            # Самые старые параметры вытеснены, последние остаются в кэше
+            _, computed = self.score_all(self.executors, {"region": {"value": "r3"}})
+            self.assertEqual(computed, 0)
+            _, computed = self.score_all(self.executors, {"region": {"value": "r1"}})
+            self.assertEqual(computed, 2)
+
+    def test_concurrent_fills_are_merged_under_lock(self):
+        batches = [[record(f"{i}-{j}", params={"region": "r1"}) for j in range(50)] for i in range(8)]
+        barrier = threading.Barrier(len(batches))
+
+        def score(executors):
+            barrier.wait()
+            self.strategy.score_all(executors, self.PARAMS, {})
+
+        threads = [threading.Thread(target=score, args=(executors,)) for executors in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        [scores] = StaticScoreCache._entries.values()
+        self.assertEqual(len(scores), 400)
+        self.assertEqual(StaticScoreCache._total, 400)
+
+    def test_fresh_scores_of_evicted_entry_are_dropped(self):
+        scores = StaticScoreCache.scores(self.PARAMS, 0.7)
+        StaticScoreCache.clear()
+        StaticScoreCache.grew(scores, {"a": (self.executors[0], 1.0, 1.0, True)})
+        self.assertEqual((len(scores), StaticScoreCache._total), (0, 0))
+
+    def test_disabled(self):
+        with self.settings(SCORE_CACHE_ENABLED=False):
+            self.assertIsNone(StaticScoreCache.scores(self.PARAMS, 0.7))
+            _, computed = self.score_all(self.executors)
+            _, computed_again = self.score_all(self.executors)
+        self.assertEqual((computed, computed_again), (2, 2))
@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core.models import Request
+from dispatcher import sharding
+from dispatcher.snapshot import ExecutorSnapshot
+from dispatcher.tasks import dispatch_request, enqueue_dispatch
+from .base import DispatcherTestCase
+
+SHARDS = override_settings(DISPATCH_SHARD_PARAM="region", DISPATCH_SHARDS=["north", "south", "7"])
+
+
+@SHARDS
+class ShardRoutingTests(SimpleTestCase):
+    def test_shard_for_request(self):
+        self.assertEqual(sharding.shard_for_request({"region": {"value": "north"}}), "north")
+        self.assertEqual(sharding.shard_for_request({"region": {"value": 7}}), "7")
+        # Неизвестный шард, не-EQ условие и заявка без параметра идут в общую очередь
+        self.assertIsNone(sharding.shard_for_request({"region": {"value": "west"}}))
+        self.assertIsNone(sharding.shard_for_request({"region": {"value": "north", "operator": "NE"}}))
+        self.assertIsNone(sharding.shard_for_request({}))
+
+    def test_shard_for_executor(self):
+        self.assertEqual(sharding.shard_for_executor({"region": "south"}), "south")
+        self.assertIsNone(sharding.shard_for_executor({"region": "west"}))
+
+    def test_queue_for_shard(self):
+        self.assertEqual(sharding.queue_for_shard("north"), "dispatch_queue.north")
+        self.assertEqual(sharding.queue_for_shard(None), "dispatch_queue")
+
+    def test_disabled_without_shards(self):
+        with self.settings(DISPATCH_SHARDS=[]):
+            self.assertFalse(sharding.is_enabled())
+            self.assertIsNone(sharding.shard_for_request({"region": {"value": "north"}}))
+
+
+@SHARDS
+class ShardDispatchTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.north = self.make_user("north", params={"region": "north"})
+        self.south = self.make_user("south", params={"region": "south"})
+        self.numeric = self.make_user("numeric", params={"region": 7})
+
+    def test_snapshot_per_shard(self):
+        self.assertEqual([e.username for e in ExecutorSnapshot.get("north")], ["north"])
+        self.assertEqual([e.username for e in ExecutorSnapshot.get("7")], ["numeric"])
+        self.assertEqual(len(ExecutorSnapshot.get()), 3)
+
+    def test_enqueue_routes_to_shard_queue(self):
+        with mock.patch.object(dispatch_request, "apply_async") as apply_async:
+            enqueue_dispatch("r1", {"region": {"value": "south"}}, priority=3)
+            enqueue_dispatch("r2", {"region": {"value": "west"}})
+        self.assertEqual(apply_async.call_args_list, [
+            mock.call(args=["r1"], kwargs={"shard": "south"}, queue="dispatch_queue.south", priority=3),
+            mock.call(args=["r2"], kwargs={"shard": None}, queue="dispatch_queue", priority=0),
+        ])
+
+    def test_empty_shard_falls_back_to_cross_shard_queue(self):
+        request = Request(
+            params={"region": {"value": "south"}}, priority=4, excluded_users=[str(self.south.id)]
+        ).save()
+        with mock.patch.object(dispatch_request, "apply_async") as apply_async:
+            self.assertIsNone(dispatch_request(str(request.id), 0.7, "south"))
+        apply_async.assert_called_once_with(args=[str(request.id), 0.7], queue="dispatch_queue", priority=4)
@@ -0,0 +1,63 @@
+import datetime
+
+from core.models import Request
+from dispatcher.models import DispatchLogs
+from dispatcher.simulator import DispatchSimulator, SimulationReport
+from .base import DispatcherTestCase
+
+
+class SimulationReportTests(DispatcherTestCase):
+    def test_fairness_uses_load_per_weight(self):
+        report = SimulationReport("x", capacities={"a": 10, "b": 20}, assignments={"a": 5, "b": 10})
+        self.assertEqual(report.fairness, 1.0)
+        # Без лимита - наибольший вес в пуле
+        report = SimulationReport("x", capacities={"a": 10, "b": None}, assignments={"a": 5, "b": 5})
+        self.assertEqual(report.fairness, 1.0)
+        report = SimulationReport("x", capacities={"a": 10, "b": 10}, assignments={"a": 10})
+        self.assertEqual(report.fairness, 0.5)
+        self.assertEqual(SimulationReport("x").fairness, 0.0)
+
+    def test_as_dict(self):
+        report = SimulationReport(
+            "x", decisions=4, unassigned=1, matched_history=2, elapsed=2.0,
+            capacities={"a": 10, "b": 10}, assignments={"a": 3},
+        )
+        self.assertEqual(report.as_dict(), {
+            "strategy": "x", "decisions": 4, "unassigned": 1, "throughput": 2.0,
+            "fairness": 0.5, "agreement": 0.5, "max": 3, "min": 0,
+        })
+
+
+class DispatchSimulatorTests(DispatcherTestCase):
+    DAY = datetime.datetime(2026, 10, 1, 9)
+
+    def setUp(self):
+        super().setUp()
+        self.north = self.make_user("north", max_daily_requests=2, params={"region": "r1"})
+        self.south = self.make_user("south", max_daily_requests=2, params={"region": "r2"})
+
+    def log(self, region, username, created_at):
+        request = Request(params={"region": {"value": region}}, created_at=created_at).save()
+        DispatchLogs(request_id=str(request.id), user_id=username, request_created_at=created_at).save()
+
+    def test_replays_history_with_daily_reset(self):
+        for hour in range(3):
+            self.log("r1", "north", self.DAY + datetime.timedelta(hours=hour))
+        self.log("r1", "north", self.DAY + datetime.timedelta(days=1))
+
+        report = DispatchSimulator(min_score_fraction=0.7).run("weighted_score")
+        self.assertEqual((report.decisions, report.unassigned), (4, 0))
+        # Третья заявка дня уходит запасному исполнителю, на следующий день лимит снова есть
+        self.assertEqual(report.assignments, {str(self.north.id): 3, str(self.south.id): 1})
+        self.assertEqual(report.matched_history, 3)
+        self.assertEqual(report.capacities, {str(self.north.id): 2, str(self.south.id): 2})
+
+    def test_period_and_unassigned(self):
+        for hour in range(5):
+            self.log("r2", "south", self.DAY + datetime.timedelta(hours=hour))
+        self.log("r2", "south", self.DAY - datetime.timedelta(days=1))
+
+        simulator = DispatchSimulator(start_date=self.DAY.date(), end_date=self.DAY.date())
+        report = simulator.run("least_connections")
+        self.assertEqual((report.decisions, report.unassigned), (5, 1))
+        self.assertEqual(report.assignments, {str(self.south.id): 2, str(self.north.id): 2})
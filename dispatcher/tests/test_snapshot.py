@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from dispatcher.snapshot import ExecutorSnapshot
+from .base import DispatcherTestCase
+
+
+class ExecutorSnapshotTests(DispatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice", max_daily_requests=5, params={"region": "r1"})
+        self.bob = self.make_user("bob", params={"region": "r2"})
+
+    def new_process(self):
+        """Снимок в памяти другого (или перезапущенного) процесса пуст"""
+        ExecutorSnapshot._snapshots.clear()
+        ExecutorSnapshot._indexes.clear()
+
+    def load_from_db(self):
+        return mock.patch.object(ExecutorSnapshot, "load_from_db", wraps=ExecutorSnapshot.load_from_db)
+
+    def usernames(self, shard=None):
+        return sorted(e.username for e in ExecutorSnapshot.get(shard))
+
+    def test_new_process_starts_from_published_blob(self):
+        self.assertEqual(self.usernames(), ["alice", "bob"])
+        self.new_process()
+        with self.load_from_db() as load:
+            executors = ExecutorSnapshot.get()
+        load.assert_not_called()
+        self.assertEqual(ExecutorSnapshot.get_record(str(self.alice.id)).max_daily_requests, 5)
+        self.assertEqual(len(executors), 2)
+
+    def test_deltas_are_applied_without_mongo(self):
+        ExecutorSnapshot.get()
+        self.alice.max_daily_requests = 7
+        ExecutorSnapshot.publish_delta(self.alice)
+        carol = self.make_user("carol")
+        ExecutorSnapshot.publish_delta(carol)
+        ExecutorSnapshot.publish_delta(self.bob, deleted=True)
+
+        with self.load_from_db() as load:
+            self.assertEqual(self.usernames(), ["alice", "carol"])
+            self.assertEqual(ExecutorSnapshot.get_record(str(self.alice.id)).max_daily_requests, 7)
+            # Процесс без снимка в памяти применяет те же дельты к blob
+            self.new_process()
+            self.assertEqual(self.usernames(), ["alice", "carol"])
+        load.assert_not_called()
+
+    def test_repeated_delta_gets_no_new_version(self):
+        ExecutorSnapshot.publish_delta(self.alice)
+        version = ExecutorSnapshot.get_version()
+        ExecutorSnapshot.publish_delta(self.alice)
+        self.assertEqual(ExecutorSnapshot.get_version(), version)
+        ExecutorSnapshot.publish_delta(self.alice, deleted=True)
+        self.assertEqual(ExecutorSnapshot.get_version(), version + 1)
+
+    def test_missing_deltas_reload_from_mongo(self):
+        ExecutorSnapshot.get()
+        self.make_user("carol")
+        # Дельта вытеснена или не записана: версия есть, дельты нет
+        self.redis.incr(ExecutorSnapshot.VERSION_KEY)
+        with self.load_from_db() as load:
+            self.assertEqual(self.usernames(), ["alice", "bob", "carol"])
+        load.assert_called_once_with(None)
+
+    def test_snapshot_is_reread_after_ttl(self):
+        with self.settings(EXECUTOR_SNAPSHOT_TTL=0):
+            ExecutorSnapshot.get()
+            self.make_user("carol")
+            self.assertEqual(self.usernames(), ["alice", "bob", "carol"])
+
+    @override_settings(DISPATCH_SHARD_PARAM="region", DISPATCH_SHARDS=["r1", "r2"])
+    def test_delta_moves_executor_between_shards(self):
+        self.assertEqual(self.usernames("r1"), ["alice"])
+        self.assertEqual(self.usernames("r2"), ["bob"])
+        self.alice.params = {"region": "r2"}
+        ExecutorSnapshot.publish_delta(self.alice)
+        self.assertEqual(self.usernames("r1"), [])
+        self.assertEqual(self.usernames("r2"), ["alice", "bob"])
@@ -0,0 +1,102 @@
+from django.test import SimpleTestCase
+
+from dispatcher.strategies import (
+    ConsistentHashStrategy,
+    PowerOfTwoStrategy,
+    get_strategy,
+    resolve_strategy_name,
+)
+from .base import record
+
+
+class StrategyTestCase(SimpleTestCase):
+    PARAMS = {"region": {"value": "r1"}}
+
+    def setUp(self):
+        self.executors = [
+            record("a", max_daily_requests=10, params={"region": "r1"}),
+            record("b", max_daily_requests=10, params={"region": "r1"}),
+            record("c", max_daily_requests=10, params={"region": "r2"}),
+        ]
+
+
+class RegistryTests(SimpleTestCase):
+    def test_get_strategy(self):
+        self.assertIsInstance(get_strategy("power_of_two", seed=1), PowerOfTwoStrategy)
+        with self.settings(BALANCING_STRATEGY="consistent_hash"):
+            self.assertIsInstance(get_strategy(), ConsistentHashStrategy)
+        with self.assertRaises(ValueError):
+            get_strategy("unknown")
+
+    def test_strategy_by_request_type(self):
+        with self.settings(BALANCING_STRATEGY_BY_TYPE={"urgent": "least_connections"}):
+            self.assertEqual(resolve_strategy_name({"type": {"value": "urgent"}}), "least_connections")
+            self.assertEqual(resolve_strategy_name({"type": {"value": "other"}}), "weighted_score")
+            self.assertEqual(resolve_strategy_name({}), "weighted_score")
+
+
+class WeightedScoreTests(StrategyTestCase):
+    def test_prefers_matching_and_less_loaded(self):
+        strategy = get_strategy("weighted_score")
+        self.assertEqual(strategy.select(self.executors, self.PARAMS, {"a": 5}).user_id, "b")
+        # Неподходящий по параметрам выбирается только запасным
+        self.assertEqual(strategy.select(self.executors, self.PARAMS, {"a": 10, "b": 10}).user_id, "c")
+        self.assertTrue(strategy.select(self.executors, self.PARAMS, {"a": 10, "b": 10}).is_fallback)
+
+    def test_no_capacity(self):
+        strategy = get_strategy("weighted_score")
+        self.assertIsNone(strategy.select(self.executors, self.PARAMS, {"a": 10, "b": 10, "c": 10}))
+
+
+class PowerOfTwoTests(StrategyTestCase):
+    def test_picks_best_of_two_random_executors(self):
+        strategy = get_strategy("power_of_two", seed=3)
+        sample = PowerOfTwoStrategy(seed=3).random.sample(self.executors, 2)
+        # При равной нагрузке выигрывает подходящий по параметрам, среди равных - первый в выборке
+        best = next((e for e in sample if e.params["region"] == "r1"), sample[0])
+        self.assertEqual(strategy.select(self.executors, self.PARAMS, {}).user_id, best.id)
+
+    def test_skips_exhausted(self):
+        strategy = get_strategy("power_of_two", seed=1)
+        for _ in range(10):
+            self.assertEqual(strategy.select(self.executors, self.PARAMS, {"a": 10, "b": 10}).user_id, "c")
+
+
+class LeastConnectionsTests(StrategyTestCase):
+    def test_lowest_load_per_weight(self):
+        executors = [
+            record("small", max_daily_requests=4, params={"region": "r1"}),
+            record("large", max_daily_requests=20, params={"region": "r1"}),
+            record("other", max_daily_requests=100, params={"region": "r2"}),
+        ]
+        strategy = get_strategy("least_connections")
+        self.assertEqual(strategy.select(executors, self.PARAMS, {"small": 1, "large": 4}).user_id, "large")
+        self.assertEqual(strategy.select(executors, self.PARAMS, {"small": 1, "large": 6}).user_id, "small")
+
+    def test_unlimited_gets_largest_weight(self):
+        executors = [
+            record("limited", max_daily_requests=10, params={"region": "r1"}),
+            record("unlimited", params={"region": "r1"}),
+        ]
+        strategy = get_strategy("least_connections")
+        self.assertEqual(strategy.select(executors, self.PARAMS, {"limited": 2, "unlimited": 3}).user_id, "limited")
+
+
+class ConsistentHashTests(StrategyTestCase):
+    def test_same_value_goes_to_same_executor(self):
+        strategy = get_strategy("consistent_hash")
+        chosen = {strategy.select(self.executors, {"region": {"value": "r1"}}, {}).user_id for _ in range(5)}
+        self.assertEqual(len(chosen), 1)
+        self.assertIn(chosen.pop(), {"a", "b"})
+
+    def test_moves_on_when_owner_is_exhausted(self):
+        strategy = get_strategy("consistent_hash")
+        owner = strategy.select(self.executors, self.PARAMS, {}).user_id
+        other = ({"a", "b"} - {owner}).pop()
+        self.assertEqual(strategy.select(self.executors, self.PARAMS, {owner: 10}).user_id, other)
+        fallback = strategy.select(self.executors, self.PARAMS, {"a": 10, "b": 10})
+        self.assertEqual((fallback.user_id, fallback.is_fallback), ("c", True))
+
+    def test_without_hash_param_behaves_like_weighted_score(self):
+        strategy = get_strategy("consistent_hash")
+        self.assertEqual(strategy.select(self.executors, {"level": {"value": 1}}, {"a": 3, "c": 1}).user_id, "b")
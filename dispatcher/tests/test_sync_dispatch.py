@@ -0,0 +1,68 @@
+import contextlib
+from unittest import mock
+
+from mongomock.collection import Collection
+from rest_framework.test import APIClient
+
+from dispatcher.affinity import ExecutorAffinity
+from dispatcher.capacity import ExecutorCapacity
+from dispatcher.locks import RequestCounter
+from .base import DispatcherTestCase
+
+MONGO_METHODS = (
+    "find", "find_one", "aggregate", "count_documents", "distinct", "insert_one", "insert_many",
+    "update_one", "update_many", "find_one_and_update", "replace_one", "delete_one", "delete_many",
+    "bulk_write",
+)
+
+
+@contextlib.contextmanager
+def no_mongo():
+    """Любое обращение к коллекциям Mongo проваливает тест"""
+    with contextlib.ExitStack() as stack:
+        for name in MONGO_METHODS:
+            stack.enter_context(
+                mock.patch.object(Collection, name, side_effect=AssertionError(f"Mongo {name}"))
+            )
+        yield
+
+
+class SyncDispatchTests(DispatcherTestCase):
+    PARAMS = {"region": {"value": "r1"}}
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.north = str(self.make_user("north", max_daily_requests=10, params={"region": "r1"}).id)
+        self.south = str(self.make_user("south", max_daily_requests=10, params={"region": "r2"}).id)
+
+    def dispatch(self, params=None, **data):
+        return self.client.post("/api/dispatch/", {"params": params or self.PARAMS, **data}, format="json")
+
+    def test_dispatch_makes_no_mongo_queries(self):
+        # Первый запрос прогревает снимок и типы ключей; пересчет счетчиков по Mongo устарел
+        self.assertEqual(self.dispatch().status_code, 200)
+        self.redis.delete(RequestCounter.SYNC_KEY, ExecutorCapacity.IN_FLIGHT_SYNC_KEY)
+
+        with self.settings(PARAMS_ATTRIBUTE_PATTERN=True), no_mongo():
+            response = self.dispatch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["user"], response.data["username"]), (self.north, "north"))
+
+    def test_dispatch_does_not_touch_counters_or_affinity(self):
+        pipe = self.redis.pipeline()
+        ExecutorAffinity.remember("parent", self.south, pipe)
+        pipe.execute()
+        lru_before = self.redis.zscore(ExecutorAffinity.LRU_KEY, "parent")
+
+        response = self.dispatch(parent_id="parent")
+        self.assertEqual(response.data["user"], self.south)
+        self.assertEqual(self.redis.hgetall(ExecutorAffinity.STATS_KEY), {})
+        self.assertEqual(self.redis.zscore(ExecutorAffinity.LRU_KEY, "parent"), lru_before)
+        state = ExecutorCapacity.peek()
+        self.assertEqual((state.daily, state.hourly, state.in_flight), ({}, {}, {}))
+
+    def test_respects_counters_in_redis(self):
+        self.redis.hset(RequestCounter.COUNTS_CACHE_KEY, mapping={RequestCounter.SENTINEL: 0, self.north: 10})
+        response = self.dispatch()
+        self.assertEqual((response.data["user"], response.data["is_fallback"]), (self.south, True))
@@ -1,7 +1,15 @@
 from django.urls import path
 
-from dispatcher.views import DailySummaryView
+from dispatcher.views import (
+    DailySummaryView,
+    DispatchMetricsView,
+    DispatcherView,
+    ExplainDispatchView,
+)
 
 urlpatterns = [
+    path('', DispatcherView.as_view(), name='dispatch'),
+    path('explain/', ExplainDispatchView.as_view(), name='dispatch-explain'),
     path('summary/', DailySummaryView.as_view(), name='summary'),
+    path('metrics/', DispatchMetricsView.as_view(), name='dispatch-metrics'),
 ]
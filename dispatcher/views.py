@@ -1,6 +1,8 @@
 import datetime
 import io
+import time
 
+from bson import ObjectId
 from django.http import HttpResponse
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from openpyxl.utils import get_column_letter
@@ -9,26 +11,127 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from dispatcher.serializer import DispatchSerializer, DailySummaryQuerySerializer
+from core import readers
+from core.models import Request
+from core.response_cache import ResponseCache, DAILY_SUMMARY
+from dispatcher.serializer import (
+    DispatchSerializer,
+    DispatchResultSerializer,
+    DailySummaryQuerySerializer,
+    ExplainSerializer,
+)
+from .affinity import ExecutorAffinity
+from .autoscale import DispatchAutoscaler
+from .explain import explain_dispatch
+from .log_buffer import DispatchLogBuffer
+from .metrics import QueueWaitHistogram
 from .models import DispatchLogs
-from .tasks import dispatch_request
+from .sharding import shard_for_request
+from .snapshot import ExecutorSnapshot
+from .tasks import choose_executor, enqueue_dispatch
 
 
 class DispatcherView(APIView):
     @extend_schema(
         tags=["Распределение"],
         summary="Распределитель",
-        description="Получает данные заявки для распределения, решает какой юзер более релевантен",
+        description="Получает данные заявки для распределения, решает какой юзер более релевантен. "
+                    "По умолчанию оценивает параметры синхронно по снимку исполнителей в памяти и сразу "
+                    "возвращает выбранного исполнителя, ничего не сохраняя и не обращаясь к MongoDB; с parent_id сначала "
+                    "проверяется исполнитель родительской заявки. С async=true ставит сохраненную заявку "
+                    "с указанным id в очередь распределения с её параметрами и приоритетом.",
         request=DispatchSerializer,
-        responses={200: {"status": "string", "message": "string"}},
+        parameters=[
+            OpenApiParameter(
+                name="async",
+                type=bool,
+                description="Поставить заявку в очередь вместо синхронного ответа",
+                required=False,
+            ),
+        ],
+        responses={
+            200: DispatchResultSerializer,
+            202: {"type": "object", "properties": {"task_id": {"type": "string", "nullable": True}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
     )
     def post(self, request):
         serializer = DispatchSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
 
-        task = dispatch_request.delay(request.data)
-        return Response({"task_id": task.id}, status=status.HTTP_202_ACCEPTED)
+        if request.query_params.get("async", "").lower() in ("true", "1", "yes"):
+            if not data.get("id"):
+                return Response(
+                    {"id": ["Обязательное поле при async=true."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            stored = (
+                Request.objects(id=data["id"]).only("params", "priority").first()
+                if ObjectId.is_valid(data["id"]) else None
+            )
+            if stored is None:
+                return Response({"error": "Заявка не найдена"}, status=status.HTTP_404_NOT_FOUND)
+            task = enqueue_dispatch(str(stored.id), stored.params or {}, stored.priority)
+            # В пакетном режиме задача не создается, заявку распределит dispatch_pending
+            return Response({"task_id": task.id if task else None}, status=status.HTTP_202_ACCEPTED)
+
+        started = time.perf_counter()
+        shard = shard_for_request(data["params"])
+        parent_id = data.get("parent_id")
+        candidate = choose_executor(
+            data["params"], data["min_score_fraction"], shard, parent_id=parent_id, dry_run=True
+        )
+        if candidate is None and shard is not None:
+            candidate = choose_executor(
+                data["params"], data["min_score_fraction"], parent_id=parent_id, dry_run=True
+            )
+        if candidate is None:
+            return Response(
+                {"error": "Нет доступных исполнителей"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        record = ExecutorSnapshot.get_record(candidate.user_id, shard) or ExecutorSnapshot.get_record(
+            candidate.user_id
+        )
+        return Response(
+            DispatchResultSerializer({
+                "user": candidate.user_id,
+                "username": record.username if record else None,
+                "load_factor": candidate.load_factor,
+                "is_fallback": candidate.is_fallback,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            }).data
+        )
+
+
+class ExplainDispatchView(APIView):
+    @extend_schema(
+        tags=["Распределение"],
+        summary="Объяснение выбора исполнителя",
+        description="Dry-run распределения по снимку исполнителей в памяти: возвращает выбор стратегии, "
+                    "top-N кандидатов с оценками по каждому параметру, фактором нагрузки, признаком "
+                    "запасного кандидата и временем каждой фазы. Ничего не сохраняет.",
+        request=ExplainSerializer,
+        responses={200: {"type": "object"}},
+    )
+    def post(self, request):
+        serializer = ExplainSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        return Response(
+            explain_dispatch(
+                data["params"],
+                top_n=data["top_n"],
+                min_score_fraction=data["min_score_fraction"],
+                strategy_name=data.get("strategy"),
+                shard=shard_for_request(data["params"]),
+                exclude=data["exclude"],
+            )
+        )
 
 
 class DailySummaryView(APIView):
@@ -84,8 +187,35 @@ class DailySummaryView(APIView):
         start_date = serializer.validated_data.get("start_date")
         end_date = serializer.validated_data.get("end_date")
 
-        summary = DispatchLogs.daily_summary(start_date=start_date, end_date=end_date)
-        return Response(summary)
+        return ResponseCache.respond(
+            request, DAILY_SUMMARY, (start_date, end_date), lambda: self._summary(start_date, end_date)
+        )
+
+    @staticmethod
+    def _summary(start_date, end_date):
+        DispatchLogBuffer.flush()
+        return Response(DispatchLogs.daily_summary(start_date=start_date, end_date=end_date))
+
+
+class DispatchMetricsView(APIView):
+    """Метрики распределения: гистограммы ожидания в очереди, автомасштабирование и привязка к исполнителю"""
+
+    @extend_schema(
+        tags=["Распределение"],
+        summary="Метрики распределения",
+        description="Возвращает кумулятивные гистограммы времени ожидания заявок "
+                    "в очереди для классов приоритета high (7-9), normal (3-6) и low (0-2) "
+                    "последний тик автомасштабирования (null, если он выключен) "
+                    "и статистику привязки дочерних заявок к исполнителю родителя "
+                    "(hits, misses, unavailable, hit_rate, entries).",
+        responses={200: {"type": "object"}},
+    )
+    def get(self, request):
+        return Response({
+            "queue_wait": QueueWaitHistogram.snapshot(),
+            "autoscale": DispatchAutoscaler.state(),
+            "affinity": ExecutorAffinity.stats(),
+        })
 
 
 def _parse_date_param(value):
@@ -135,18 +265,13 @@ class ExportDispatchSummaryExcelView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        DispatchLogBuffer.flush()
         summary = DispatchLogs.daily_summary(start_date=start_date, end_date=end_date)
 
-        logs_qs = DispatchLogs.objects
-        if start_date:
-            logs_qs = logs_qs.filter(
-                request_created_at__gte=datetime.datetime.combine(start_date, datetime.time.min)
-            )
-        if end_date:
-            logs_qs = logs_qs.filter(
-                request_created_at__lte=datetime.datetime.combine(end_date, datetime.time.max)
-            )
-        logs = list(logs_qs.order_by("request_created_at"))
+        logs = readers.iter_dispatch_log_rows(
+            datetime.datetime.combine(start_date, datetime.time.min) if start_date else None,
+            datetime.datetime.combine(end_date, datetime.time.max) if end_date else None,
+        )
 
         wb = Workbook()
         ws1 = wb.active
@@ -164,11 +289,11 @@ class ExportDispatchSummaryExcelView(APIView):
         ws2 = wb.create_sheet("Логи")
         ws2.append(["ID заявки", "ID пользователя", "Записано в"])
 
-        for log in logs:
+        for request_id, user_id, created_at in logs:
             ws2.append([
-                log.request_id,
-                log.user_id,
-                log.request_created_at.strftime("%d.%m.%Y %H:%M:%S"),
+                request_id,
+                user_id,
+                created_at.strftime("%d.%m.%Y %H:%M:%S"),
             ])
 
         for sheet in (ws1, ws2):
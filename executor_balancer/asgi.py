@@ -18,8 +18,22 @@ import executor_balancer.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'executor_balancer.settings')
 
+django_asgi_app = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from core.events import ChangeEvents  # noqa: E402
+import core.utils  # noqa: E402,F401 - регистрирует обработчики событий
+
+ChangeEvents.start_subscriber()
+
+if settings.DISPATCH_MODE == "local":
+    from dispatcher.local_queue import LocalDispatchQueue
+
+    LocalDispatchQueue.start()
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             executor_balancer.routing.websocket_urlpatterns
@@ -1,25 +1,87 @@
 import os
 import traceback
-from celery import Celery
-from celery.signals import worker_process_init
+from celery import Celery, Task
+from celery.signals import worker_process_init, worker_ready
 from django.conf import settings
+from kombu.serialization import dumps
 from mongoengine import disconnect, connect
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'executor_balancer.settings')
-app = Celery('executor_balancer')
+
+
+class PolicyTask(Task):
+    """
+    Базовая задача проекта: сообщение сжимается (TASK_COMPRESSION), только если сериализованные
+    аргументы больше TASK_COMPRESSION_MIN_BYTES; сообщения из одних id уходят без сжатия.
+    Порог задачи можно переопределить атрибутом compression_min_bytes, явный compression
+    в apply_async имеет приоритет.
+    """
+    compression_min_bytes = None
+
+    def apply_async(self, args=None, kwargs=None, **options):
+        if options.get('compression') is None and settings.TASK_COMPRESSION:
+            threshold = self.compression_min_bytes
+            if threshold is None:
+                threshold = settings.TASK_COMPRESSION_MIN_BYTES
+            _, _, body = dumps((args or (), kwargs or {}), options.get('serializer') or self.serializer)
+            if len(body) >= threshold:
+                options['compression'] = settings.TASK_COMPRESSION
+        return super().apply_async(args, kwargs, **options)
+
+
+app = Celery('executor_balancer', task_cls=PolicyTask)
 
 app.conf.update(
     task_routes={
         'dispatcher.tasks.dispatch_request': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.dispatch_pending': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.escalate_overdue_requests': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.redispatch_requests': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.sweep_redispatch': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.explain_request': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.archive_history': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.flush_dispatch_logs': {'queue': 'dispatch_queue'},
+        'dispatcher.tasks.autoscale_dispatch': {'queue': 'dispatch_queue'},
+    },
+    task_queue_max_priority=10,
+    task_default_priority=0,
+    beat_schedule={
+        'dispatch-pending': {
+            'task': 'dispatcher.tasks.dispatch_pending',
+            'schedule': 30.0,
+        },
+        'escalate-overdue-requests': {
+            'task': 'dispatcher.tasks.escalate_overdue_requests',
+            'schedule': 60.0,
+        },
+        'sweep-redispatch': {
+            'task': 'dispatcher.tasks.sweep_redispatch',
+            'schedule': 60.0,
+        },
+        'flush-dispatch-logs': {
+            'task': 'dispatcher.tasks.flush_dispatch_logs',
+            'schedule': float(settings.DISPATCH_LOG_FLUSH_INTERVAL),
+        },
+        'archive-history': {
+            'task': 'dispatcher.tasks.archive_history',
+            'schedule': 60.0 * 60,
+        },
+        'autoscale-dispatch': {
+            'task': 'dispatcher.tasks.autoscale_dispatch',
+            'schedule': float(settings.AUTOSCALE_INTERVAL),
+            # Контроллер не должен ждать в той же очереди, которую он разгружает
+            'options': {'priority': 9, 'expires': float(settings.AUTOSCALE_INTERVAL)},
+        },
     },
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     task_reject_on_worker_lost=True,
-    task_serializer='json',
-    accept_content=['json'],
+    task_serializer=settings.CELERY_TASK_SERIALIZER,
+    accept_content=settings.CELERY_ACCEPT_CONTENT,
     result_serializer='json',
     task_track_started=True,
-    task_compression='gzip',
+    # Сжатие сообщений решает PolicyTask.apply_async по размеру аргументов
+    task_compression=None,
     result_compression='gzip',
     task_soft_time_limit=30,
     worker_max_memory_per_child=150000,
@@ -40,4 +102,23 @@ def init_mongo(**kwargs):
             authentication_source="admin",
         )
     except Exception:
-        print(traceback.format_exc())
\ No newline at end of file
+        print(traceback.format_exc())
+
+
+@worker_process_init.connect
+def subscribe_change_events(**kwargs):
+    import core.utils  # noqa: F401 - регистрирует обработчики событий
+    from core.events import ChangeEvents
+    ChangeEvents.start_subscriber()
+
+
+@worker_process_init.connect
+def warm_executor_snapshot(**kwargs):
+    from dispatcher.snapshot import ExecutorSnapshot
+    ExecutorSnapshot.warm(settings.DISPATCH_WORKER_SHARD)
+
+
+@worker_ready.connect
+def check_parallel_scoring(sender=None, **kwargs):
+    from dispatcher.parallel import ParallelScorer
+    ParallelScorer.warn_if_unusable(getattr(getattr(sender, "controller", None), "pool_cls", None))
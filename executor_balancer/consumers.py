@@ -1,6 +1,7 @@
-import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from core.renderers import dumps
+
 
 class NewRequestConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -11,7 +12,7 @@ class NewRequestConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_discard("new_requests", self.channel_name)
 
     async def new_request(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=dumps(event))
 
 
 class DispatchRequestsConsumer(AsyncWebsocketConsumer):
@@ -23,4 +24,4 @@ class DispatchRequestsConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_discard("dispatched", self.channel_name)
 
     async def request_dispatched(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=dumps(event))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import json
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -79,9 +80,19 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# False - стандартные JSONRenderer/JSONParser DRF вместо orjson
+USE_ORJSON = os.getenv("USE_ORJSON", "True").lower() in ("true", "1", "yes")
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+    "DEFAULT_RENDERER_CLASSES": (
+        ("core.renderers.ORJSONRenderer",) if USE_ORJSON else ("rest_framework.renderers.JSONRenderer",)
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.renderers.ORJSONParser" if USE_ORJSON else "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 
@@ -158,6 +169,7 @@ RABBITMQ_USER = os.getenv("RABBITMQ_DEFAULT_USER")
 RABBITMQ_PASS = os.getenv("RABBITMQ_DEFAULT_PASS")
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
 RABBITMQ_PORT = os.getenv("RABBITMQ_PORT")
+RABBITMQ_MANAGEMENT_URL = os.getenv("RABBITMQ_MANAGEMENT_URL")
 RABBITMQ_URL = (
     f"amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}//"
 )
@@ -167,8 +179,9 @@ CELERY_BROKER_URL = (
     f"amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}//"
 )
 CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
-CELERY_ACCEPT_CONTENT = ["json"]
-CELERY_TASK_SERIALIZER = "json"
+# Принимаются оба формата, чтобы смена CELERY_TASK_SERIALIZER не ломала сообщения в очередях
+CELERY_ACCEPT_CONTENT = ["json", "msgpack"]
+CELERY_TASK_SERIALIZER = os.getenv("CELERY_TASK_SERIALIZER", "json")
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_ACKS_LATE = os.getenv("CELERY_TASK_ACKS_LATE", "True").lower() in (
     "true",
@@ -179,13 +192,83 @@ CELERY_TASK_TRACK_STARTED = os.getenv("CELERY_TASK_TRACK_STARTED", "True").lower
     "1",
 )
 CELERY_TIMEZONE = os.getenv("CELERY_TIMEZONE", "UTC")
-
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {"hosts": [f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CHANNELS}"]},
+TASK_COMPRESSION = os.getenv("TASK_COMPRESSION", "gzip") or None
+TASK_COMPRESSION_MIN_BYTES = int(os.getenv("TASK_COMPRESSION_MIN_BYTES", 1024))
+
+# celery - распределение через RabbitMQ и Celery; local - очередь в ASGI-процессе (один узел)
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "celery")
+LOCAL_DISPATCH_CONCURRENCY = int(os.getenv("LOCAL_DISPATCH_CONCURRENCY", 1))
+
+# memory - слой каналов внутри процесса, только для одного ASGI-процесса
+CHANNEL_LAYER = os.getenv("CHANNEL_LAYER", "redis")
+if CHANNEL_LAYER == "memory":
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CHANNELS}"]},
+        }
     }
-}
+
+BALANCING_STRATEGY = os.getenv("BALANCING_STRATEGY", "weighted_score")
+BALANCING_TYPE_PARAM = os.getenv("BALANCING_TYPE_PARAM", "type")
+BALANCING_STRATEGY_BY_TYPE = json.loads(os.getenv("BALANCING_STRATEGY_BY_TYPE", "{}"))
+BALANCING_HASH_PARAM = os.getenv("BALANCING_HASH_PARAM", "region")
+
+DISPATCH_SHARD_PARAM = os.getenv("DISPATCH_SHARD_PARAM")
+DISPATCH_SHARDS = [s for s in os.getenv("DISPATCH_SHARDS", "").split(",") if s]
+EXECUTOR_SNAPSHOT_TTL = int(os.getenv("EXECUTOR_SNAPSHOT_TTL", 300))
+DISPATCH_WORKER_SHARD = os.getenv("DISPATCH_WORKER_SHARD") or None
+
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", 100))
+DISPATCH_PENDING_MIN_AGE = int(os.getenv("DISPATCH_PENDING_MIN_AGE", 60))
+DISPATCH_PENDING_TIME_LIMIT = int(os.getenv("DISPATCH_PENDING_TIME_LIMIT", 120))
+REDISPATCH_AWAIT_TIMEOUT = int(os.getenv("REDISPATCH_AWAIT_TIMEOUT", 30 * 60))
+REDISPATCH_MAX_ATTEMPTS = int(os.getenv("REDISPATCH_MAX_ATTEMPTS", 3))
+
+AFFINITY_ENABLED = os.getenv("AFFINITY_ENABLED", "True").lower() in ("true", "1", "yes")
+AFFINITY_MAX_ENTRIES = int(os.getenv("AFFINITY_MAX_ENTRIES", 100000))
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 600))
+
+ARCHIVE_LOGS_AFTER_DAYS = int(os.getenv("ARCHIVE_LOGS_AFTER_DAYS", 0))
+ARCHIVE_REQUESTS_AFTER_DAYS = int(os.getenv("ARCHIVE_REQUESTS_AFTER_DAYS", 0))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+
+DISPATCH_LOGS_TIMESERIES = os.getenv("DISPATCH_LOGS_TIMESERIES", "False").lower() in ("true", "1", "yes")
+DISPATCH_LOGS_GRANULARITY = os.getenv("DISPATCH_LOGS_GRANULARITY", "hours")
+DISPATCH_LOG_BUFFER = os.getenv("DISPATCH_LOG_BUFFER", "True").lower() in ("true", "1", "yes")
+DISPATCH_LOG_FLUSH_SIZE = int(os.getenv("DISPATCH_LOG_FLUSH_SIZE", 500))
+DISPATCH_LOG_FLUSH_INTERVAL = int(os.getenv("DISPATCH_LOG_FLUSH_INTERVAL", 5))
+
+CHANGE_POLL_INTERVAL = int(os.getenv("CHANGE_POLL_INTERVAL", 5))
+
+PARAMS_ATTRIBUTE_PATTERN = os.getenv("PARAMS_ATTRIBUTE_PATTERN", "False").lower() in ("true", "1", "yes")
+
+PARALLEL_SCORING = os.getenv("PARALLEL_SCORING", "False").lower() in ("true", "1", "yes")
+PARALLEL_SCORING_MIN_EXECUTORS = int(os.getenv("PARALLEL_SCORING_MIN_EXECUTORS", 20000))
+PARALLEL_SCORING_WORKERS = int(os.getenv("PARALLEL_SCORING_WORKERS", 0))
+
+SCORE_CACHE_ENABLED = os.getenv("SCORE_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+SCORE_CACHE_MAX_ENTRIES = int(os.getenv("SCORE_CACHE_MAX_ENTRIES", 500000))
+
+AUTOSCALE_ENABLED = os.getenv("AUTOSCALE_ENABLED", "False").lower() in ("true", "1", "yes")
+AUTOSCALE_INTERVAL = int(os.getenv("AUTOSCALE_INTERVAL", 15))
+AUTOSCALE_MIN_CONCURRENCY = int(os.getenv("AUTOSCALE_MIN_CONCURRENCY", 1))
+AUTOSCALE_MAX_CONCURRENCY = int(os.getenv("AUTOSCALE_MAX_CONCURRENCY", 8))
+AUTOSCALE_DEPTH_PER_PROCESS = int(os.getenv("AUTOSCALE_DEPTH_PER_PROCESS", 50))
+AUTOSCALE_LATENCY_TARGET = float(os.getenv("AUTOSCALE_LATENCY_TARGET", 5.0))
+AUTOSCALE_MAX_LOAD = float(os.getenv("AUTOSCALE_MAX_LOAD", 0.9))
+AUTOSCALE_BATCH_DEPTH = int(os.getenv("AUTOSCALE_BATCH_DEPTH", 1000))
+AUTOSCALE_BATCH_SIZE = int(os.getenv("AUTOSCALE_BATCH_SIZE", 1000))
+
+INTAKE_MAX_IN_FLIGHT = int(os.getenv("INTAKE_MAX_IN_FLIGHT", 64))
+INTAKE_RETRY_AFTER = int(os.getenv("INTAKE_RETRY_AFTER", 1))
+INTAKE_SPOOL_PATH = os.getenv("INTAKE_SPOOL_PATH") or None
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = int(os.getenv("BREAKER_RESET_TIMEOUT", 10))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 2.0))
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOGGING = {
@@ -222,6 +305,9 @@ LANGUAGE_CODE = "ru-RU"
 
 TIME_ZONE = "UTC"
 
+# Часовой пояс смен исполнителей (User.shifts)
+CAPACITY_TIMEZONE = os.getenv("CAPACITY_TIMEZONE", TIME_ZONE)
+
 USE_I18N = True
 
 USE_TZ = True